@@ -1,21 +1,28 @@
 from typing import Any, Callable
 from numpy.typing import ArrayLike
-import numpy as np
+from .utils.backend import numpy_backend
 
 def get_correction(name, **kwargs):
+    backend = kwargs.get('backend', None)
     if name == 'no_correction':
-        return no_correction()
+        return no_correction(backend=backend)
     elif name == 'heavi_side':
-        return heavi_side_correction()
+        return heavi_side_correction(backend=backend)
     elif name == 'heavi_side_reg':
         eps = kwargs.get('eps', 1e-3)
-        return heavi_side_reg_correction(eps=eps)
+        return heavi_side_reg_correction(eps=eps, backend=backend)
     else:
         raise ValueError('Unknown correction ' + str(name))
 
 class correction:
-    def __init__(self):
-        pass
+    """
+    Base class for corrections.
+
+    Parameters:
+        backend: The array backend. Default: numpy.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else numpy_backend()
 
 class no_correction(correction):
     """
@@ -71,26 +78,26 @@ class heavi_side_correction(correction):
             The Heaviside correction value.
 
         .. note::
-            This function evaluates the objective function on the consensus, therfore the number of function evaluations is increased by the consensus size.
+            This function evaluates the objective function on the consensus, therfore the number of function evaluations of each 
+            active run is increased by one, unless the consensus is found in the cache of the objective.
         """
-        dyn.num_f_eval += dyn.consensus.shape[0] # update number of function evaluations
-        return self.correct(x, dyn.f, dyn.energy, dyn.consensus)
+        return self.correct(x, dyn.eval_f, dyn.energy, dyn.consensus)
 
     def correct(self, x:ArrayLike, f: Callable, energy: ArrayLike, consensus: ArrayLike) -> ArrayLike:
         z = energy - f(consensus)
-        return x * np.where(z > 0, 1,0)[...,None]
+        return x * (z > 0)[...,None]
 
 class heavi_side_reg_correction(heavi_side_correction):
     """
     Calculate the Heaviside regularized correction.
     """
 
-    def __init__(self, eps=1e-3):
-        super().__init__()
+    def __init__(self, eps=1e-3, backend=None):
+        super().__init__(backend=backend)
         self.eps = eps
 
     def correct(self, x:ArrayLike, f: Callable, energy: ArrayLike, consensus: ArrayLike) -> ArrayLike:
         z = energy - f(consensus)
-        return x * (0.5 + 0.5 * np.tanh(z/self.eps))[...,None]
+        return x * (0.5 + 0.5 * self.backend.tanh(z/self.eps))[...,None]
     
 
@@ -4,6 +4,8 @@ from .cbo_memory import CBOMemory
 from .pso import PSO
 from .cbs import CBS
 from .polarcbo import PolarCBO
+from .parallel_runs import ParallelRuns
+from .sharded import ShardedDynamic
 
 __all__ = ['ParticleDynamic', 
            'CBXDynamic', 
@@ -11,5 +13,7 @@ __all__ = ['ParticleDynamic',
            'CBOMemory', 
            'PSO', 
            'CBS',
-           'PolarCBO']
+           'PolarCBO',
+           'ParallelRuns',
+           'ShardedDynamic']
 
@@ -1,4 +1,8 @@
+import numpy as np
+
 from .pdyn import CBXDynamic
+from ..correction import no_correction
+from ..noise import anisotropic_noise
 
 #%% CBO
 class CBO(CBXDynamic):
@@ -48,6 +52,11 @@ class CBO(CBXDynamic):
         None
         
         """
+        if self.use_compiled():
+            return self.inner_step_compiled()
+        if self.workspace is not None:
+            return self.inner_step_workspace()
+        
         # update, consensus point, drift and energy
         self.consensus, energy = self.compute_consensus()
         self.energy[self.consensus_idx] = energy
@@ -61,4 +70,71 @@ class CBO(CBXDynamic):
         self.x[self.particle_idx] = (
             self.x[self.particle_idx] -
             self.correction(self.lamda * self.dt * self.drift) +
-            self.s)
\ No newline at end of file
+            self.s)
+        
+    def inner_step_workspace(self,) -> None:
+        r"""Performs one step of the CBO algorithm in the workspace mode.
+        
+        All intermediate results are computed in the preallocated buffers of ``self.workspace``, using ``out=`` arguments 
+        and in-place operations. If no batching is used and all runs are active, the particles are updated in-place and a step 
+        avoids large per-step temporaries of the size of the ensemble. Small arrays, e.g., for the gathered ``alpha``, the 
+        output of the objective function and the update of the best particles, are still allocated. Otherwise, the selected 
+        particles are gathered and scattered back.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        
+        """
+        ws = self.workspace
+        x = self.x[self.particle_idx]
+        
+        # update, consensus point, drift and energy
+        self.consensus, energy = self.compute_consensus_inplace()
+        self.energy[self.consensus_idx] = energy
+        self.drift = ws.get('drift', x.shape, x.dtype)
+        np.subtract(x, self.consensus, out=self.drift)
+        
+        # compute noise
+        self.s = self.fill_noise(ws.get('noise', x.shape, x.dtype))
+        self.s *= self.sigma
+        
+        # update particle positions
+        update = ws.get('update', x.shape, x.dtype)
+        np.multiply(self.drift, self.lamda * self.dt, out=update)
+        if not isinstance(self.correction_callable, no_correction):
+            update = self.correction(update)
+        x -= update
+        x += self.s
+        
+        if not np.may_share_memory(x, self.x): # scatter back, if x is not a view
+            self.x[self.particle_idx] = x
+
+    def inner_step_compiled(self,) -> None:
+        r"""Performs one step of the CBO algorithm with the compiled kernels, see :mod:`cbx.utils.kernels`.
+        
+        The consensus is computed in one pass over the particles and the drift, the noise and the update of the particles 
+        are computed in a second pass. The standard normal numbers are sampled before with the sampler of the noise model.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        
+        """
+        from ..utils import kernels as cbx_kernels # imports numba, only if the compiled kernels are used
+        self.energy[...] = self.eval_f(self.x)
+        self.consensus = self.compute_consensus_compiled(self.energy)
+        z = self.noise_callable.sampler(0, 1, size=self.x.shape)
+        
+        self.drift = np.empty_like(self.x)
+        self.s = np.empty_like(self.x)
+        cbx_kernels.cbo_update(self.x, self.consensus[:, 0, :], z, self.lamda * self.dt, self.sigma * np.sqrt(self.dt), 
+                               isinstance(self.noise_callable, anisotropic_noise), self.drift, self.s)
@@ -3,6 +3,7 @@ from typing import Union
 #from scipy.special import logsumexp
 
 from .pdyn import CBXDynamic
+from ..noise import anisotropic_noise
 
 #%% CBO_Memory
 class CBOMemory(CBXDynamic):
@@ -45,6 +46,8 @@ class CBOMemory(CBXDynamic):
 
     """
 
+    run_attributes = CBXDynamic.run_attributes + ('y', 'y_old', 'memory_diff', 's_memory', 'sigma_memory', 'lamda_memory')
+    
     def __init__(self,
                  f,
                  lamda_memory: float = 0.4,
@@ -63,13 +66,12 @@ class CBOMemory(CBXDynamic):
         else:
             self.sigma_memory = sigma_memory
         
-        self.energy = self.f(self.x)
-        self.num_f_eval += np.ones(self.M, dtype=int) * self.N # update number of function evaluations   
+        self.energy = self.eval_f(self.x)
         
     def pre_step(self,):
         # save old positions
-        self.x_old = self.copy(self.x) # save old positions
-        self.y_old = self.copy(self.y) # save old positions
+        self.swap_buffers('x') # save old positions
+        self.swap_buffers('y') # save old positions
         
         # set new batch indices
         self.set_batch_idx()
@@ -90,33 +92,61 @@ class CBOMemory(CBXDynamic):
             
         mind = self.consensus_idx
         ind = self.particle_idx
-        # first update
-        self.consensus = self.compute_consensus(self.y[mind], self.energy[mind])        
-        self.drift = self.x[ind] - self.consensus
-        self.memory_diff = self.x[ind] - self.y[ind]
-        
-        # inter step
-        self.s = self.sigma * self.noise()
-        self.s_memory = self.sigma_memory * self.noise()
-
-        # dynamcis update
-        # momentaneous positions of particles
-        self.x[ind] = (
-            self.x[ind] -
-            self.correction(self.lamda * self.dt * self.drift) -
-            self.lamda_memory * self.dt * self.memory_diff +
-            self.s + 
-            self.s_memory)
+        if self.use_compiled():
+            self.update_compiled()
+        else:
+            # first update
+            self.consensus = self.compute_consensus(self.y[mind], self.energy[mind])        
+            self.drift = self.x[ind] - self.consensus
+            self.memory_diff = self.x[ind] - self.y[ind]
+            
+            # inter step
+            self.s = self.sigma * self.noise()
+            self.s_memory = self.sigma_memory * self.noise()
+    
+            # dynamcis update
+            # momentaneous positions of particles
+            self.x[ind] = (
+                self.x[ind] -
+                self.correction(self.lamda * self.dt * self.drift) -
+                self.lamda_memory * self.dt * self.memory_diff +
+                self.s + 
+                self.s_memory)
         
         # evaluation of objective function on all particles
-        energy_new = self.f(self.x[ind])    
-        self.num_f_eval += np.ones(self.M, dtype=int) * self.x[ind].shape[-2] # update number of function evaluations   
+        energy_new = self.eval_f(self.x[ind])
         
         # historical best positions of particles
         energy_expand = tuple([Ellipsis] + [None for _ in range(self.x.ndim-2)]) 
-        self.y[ind] = self.y[ind] + ((self.energy>energy_new)[energy_expand]) * (self.x[ind] - self.y[ind])
-        self.energy = np.minimum(self.energy, energy_new)
+        self.y[ind] = self.y[ind] + ((self.energy[ind]>energy_new)[energy_expand]) * (self.x[ind] - self.y[ind])
+        self.energy[ind] = self.backend.minimum(self.energy[ind], energy_new)
+
+        
+    compiled_scalars = CBXDynamic.compiled_scalars + ('lamda_memory', 'sigma_memory')
+        
+    def update_compiled(self,) -> None:
+        r"""Computes the consensus and updates the particles with the compiled kernels, see :mod:`cbx.utils.kernels`.
+
+        Parameters
+        ----------
+        None
 
+        Returns
+        -------
+        None
+        
+        """
+        from ..utils import kernels as cbx_kernels # imports numba, only if the compiled kernels are used
+        self.consensus = self.compute_consensus_compiled(self.energy)
+        z = self.noise_callable.sampler(0, 1, size=self.x.shape)
+        z_memory = self.noise_callable.sampler(0, 1, size=self.x.shape)
+        
+        self.drift, self.memory_diff, self.s, self.s_memory = (np.empty_like(self.x) for _ in range(4))
+        sqrt_dt = np.sqrt(self.dt)
+        cbx_kernels.memory_update(self.x, self.y, None, self.consensus[:, 0, :], z, z_memory, 
+                                  self.lamda * self.dt, self.lamda_memory * self.dt, self.sigma * sqrt_dt, self.sigma_memory * sqrt_dt, 
+                                  isinstance(self.noise_callable, anisotropic_noise), 0., 1., self.dt, 
+                                  self.drift, self.memory_diff, self.s, self.s_memory)
         
     def compute_consensus(self, x_batch, energy) -> None:
         r"""Updates the weighted mean of the particles.
@@ -134,9 +164,10 @@ class CBOMemory(CBXDynamic):
         return c
     
     def update_best_cur_particle(self,) -> None:
-        self.f_min = self.energy.min(axis=-1)
-        self.f_min_idx = self.energy.argmin(axis=-1)
+        self.f_min = self.backend.min(self.energy, axis=-1)
+        self.f_min_idx = self.backend.argmin(self.energy, axis=-1)
+        run_idx = self.backend.arange(self.M, like=self.f_min_idx)
         
-        self.best_cur_particle = self.x[np.arange(self.M), self.f_min_idx, :]
-        self.best_cur_energy = self.energy[np.arange(self.M), self.f_min_idx]
+        self.best_cur_particle = self.x[run_idx, self.f_min_idx, :]
+        self.best_cur_energy = self.energy[run_idx, self.f_min_idx]
         
\ No newline at end of file
@@ -25,16 +25,16 @@ class CBS(CBXDynamic):
         else:
             raise NotImplementedError("Invalid mode")
         
-        if noise not in ['covariance', 'sampling']:
+        if noise not in ['covariance', 'sampling', 'low_rank_covariance']:
             raise warnings.warn('For CBS usually covariance or sampling noise is used!', stacklevel=2)
         
         
     def inner_step(self,):
         self.consensus, energy = self.compute_consensus()
-        self.energy = energy
-        self.drift = self.x - self.consensus
+        self.energy[self.consensus_idx] = energy
+        self.drift = self.x[self.particle_idx] - self.consensus
         self.update_covariance()
-        self.x = self.consensus + self.exp_dt * self.drift + self.noise()
+        self.x[self.particle_idx] = self.consensus + self.exp_dt * self.drift + self.noise()
         
     def run(self, sched = 'default'):
             if self.verbosity > 0:
@@ -0,0 +1,148 @@
+import numpy as np
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from numpy.random import SeedSequence
+from typing import Callable, Union
+
+from ..utils.rng import run_generators
+
+def _optimize_runs(dynamic, f, run_ids, seed, kwargs, opt_kwargs) -> dict:
+    """Performs the runs ``run_ids`` in one dynamic and returns the results as ``numpy`` arrays."""
+    dyn = dynamic(f, M=len(run_ids), seed=run_generators(seed, run_ids=run_ids), **kwargs)
+    dyn.optimize(**opt_kwargs)
+    to_numpy = dyn.backend.to_numpy
+    return {'best_particle': np.asarray(to_numpy(dyn.best_particle)),
+            'best_energy': np.asarray(to_numpy(dyn.best_energy)),
+            'num_f_eval': np.asarray(to_numpy(dyn.num_f_eval)),
+            'x': np.asarray(to_numpy(dyn.x)),
+            'term_reason': dyn.term_reason,
+            'it': dyn.it,
+            'history': {key: [to_numpy(h) if hasattr(h, 'shape') else h for h in entries]
+                        for key, entries in dyn.history.items()}}
+
+class ParallelRuns:
+    r"""Distributes the independent runs of a dynamic over a pool of processes
+
+    The :math:`M` runs of a dynamic are independent, as long as no scheduler or termination criterion couples them.
+    This class splits the runs into contiguous chunks, where each chunk is performed by a separate dynamic in a worker
+    process. Each worker owns the slice of the initial positions ``x`` and of the run-indexed parameters, e.g.,
+    ``alpha``, its copy of the termination criteria and the scheduler, and the random number streams of its runs, see
+    :class:`cbx.utils.rng.run_generators`. Therefore, the results do not depend on the number of workers, and equal the
+    results of a single dynamic with the same ``seed``.
+
+    After :meth:`optimize`, the results of all runs are gathered in the original order in the attributes
+    ``best_particle``, ``best_energy``, ``num_f_eval``, ``term_reason``, ``x`` and ``history``. Entries of the history,
+    whose leading axis indexes the runs, are concatenated along this axis. If the chunks performed a different number of
+    iterations, the shorter histories are padded with their last entry, which is what a single dynamic stores for
+    terminated runs, e.g., for ``'x'`` and ``'energy'``.
+
+    Parameters
+    ----------
+    dynamic : type
+        The class of the dynamic, e.g., :class:`CBO`.
+    f : Callable
+        The objective function. It must be picklable, if the start method is not ``'fork'``.
+    M : int, optional
+        The total number of runs. If None, it is inferred from ``x``. The default is None.
+    workers : int, optional
+        The number of worker processes. The default is the number of CPUs.
+    num_chunks : int, optional
+        The number of chunks of runs. More chunks than workers balance the load, if the runs terminate at different
+        iterations. The default is ``workers``.
+    seed : int or SeedSequence, optional
+        The root seed of the random number streams of the runs. The default is None, i.e., fresh entropy is used.
+    start_method : str, optional
+        The start method of the processes, see :mod:`multiprocessing`. The default is the default of the platform.
+    **kwargs
+        The keyword arguments of the dynamic. The initial particles ``x`` of shape (M, N, ...) and the parameters of the keys 
+        ``run_kwargs`` of shape (M, 1, ...) are split along with the runs. Initial particles of shape (N, d) or (d,) are 
+        used for every run.
+
+    Examples
+    --------
+    >>> from cbx.dynamics import CBO, ParallelRuns
+    >>> runs = ParallelRuns(CBO, f, M=64, d=10, workers=8, seed=0, max_it=1000)
+    >>> runs.optimize()
+    >>> runs.best_energy.shape
+    (64,)
+    """
+    run_kwargs = ('x', 'alpha', 'sigma', 'lamda')
+
+    def __init__(self,
+                 dynamic: type,
+                 f: Callable,
+                 M: Union[int, None] = None,
+                 workers: Union[int, None] = None,
+                 num_chunks: Union[int, None] = None,
+                 seed = None,
+                 start_method: Union[str, None] = None,
+                 **kwargs):
+        self.dynamic = dynamic
+        self.f = f
+        x = kwargs.get('x', None)
+        if M is None:
+            M = x.shape[0] if x is not None and x.ndim >= 3 else 1
+        self.M = M
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        num_chunks = num_chunks if num_chunks is not None else self.workers
+        self.chunks = [c for c in np.array_split(np.arange(M), min(num_chunks, M)) if len(c) > 0]
+        self.seed = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+        self.start_method = start_method
+        self.kwargs = kwargs
+
+    def chunk_kwargs(self, run_ids) -> dict:
+        """Returns the keyword arguments of the dynamic of the runs ``run_ids``."""
+        kwargs = dict(self.kwargs)
+        for name in self.run_kwargs:
+            a = kwargs.get(name, None)
+            # only x of shape (M, N, ...) and parameters of shape (M, 1, ...) have a run axis
+            if getattr(a, 'ndim', 0) >= (3 if name == 'x' else 2) and a.shape[0] == self.M:
+                kwargs[name] = a[run_ids, ...]
+            elif name == 'x' and a is not None: # particles of a single run are the initial particles of every run
+                a = a[None, ...] if a.ndim == 2 else a[None, None, ...]
+                kwargs[name] = np.repeat(a, len(run_ids), axis=0)
+        return kwargs
+
+    def optimize(self, **opt_kwargs) -> np.ndarray:
+        """
+        Performs all runs on the process pool and gathers the results.
+
+        Parameters:
+            **opt_kwargs: The keyword arguments of :meth:`ParticleDynamic.optimize`, e.g., ``sched``.
+
+        Returns:
+            np.ndarray: The best particles of all runs, of shape (M, ...).
+        """
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context(self.start_method)) as pool:
+            futures = [pool.submit(_optimize_runs, self.dynamic, self.f, run_ids, self.seed,
+                                   self.chunk_kwargs(run_ids), opt_kwargs) for run_ids in self.chunks]
+            results = [future.result() for future in futures]
+        self.gather(results)
+        return self.best_particle
+
+    def gather(self, results: list) -> None:
+        """
+        Gathers the results of the chunks in the original order of the runs.
+
+        Parameters:
+            results (list): The results of the chunks, as returned by the workers.
+
+        Returns:
+            None
+        """
+        for name in ['best_particle', 'best_energy', 'num_f_eval', 'x']:
+            setattr(self, name, np.concatenate([r[name] for r in results], axis=0))
+        self.term_reason = [reason for r in results for reason in r['term_reason']]
+        self.it = np.concatenate([np.full((len(self.chunks[i]),), r['it']) for i, r in enumerate(results)])
+
+        self.history = {}
+        for key in results[0]['history']:
+            entries = [r['history'][key] for r in results]
+            run_indexed = all(len(e) > 0 and all(getattr(h, 'ndim', 0) > 0 and h.shape[0] == len(self.chunks[i]) for h in e)
+                              for i, e in enumerate(entries))
+            if run_indexed:
+                length = max(len(e) for e in entries)
+                self.history[key] = [np.concatenate([e[min(i, len(e) - 1)] for e in entries], axis=0) for i in range(length)]
+            else: # e.g. entries that are not indexed by the runs, these are kept per chunk
+                self.history[key] = entries
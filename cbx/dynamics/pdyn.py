@@ -1,19 +1,29 @@
 #%%
-from ..noise import get_noise
-from ..correction import get_correction
+from ..noise import get_noise, isotropic_noise, anisotropic_noise
+from ..correction import get_correction, no_correction
 from ..scheduler import scheduler, multiply
 from ..utils.termination import max_it_term
 from ..utils.history import track_x, track_energy, track_update_norm, track_consensus, track_drift, track_drift_mean
+from ..utils.history import array_history, memmap_history, ring_history
 from ..utils.particle_init import init_particles
-from cbx.utils.objective_handling import _promote_objective
+from ..utils.workspace import workspace as cbx_workspace
+from ..utils.rng import run_generators
+from ..utils.backend import get_backend, numpy_backend
+from ..utils.timing import timer as cbx_timer, timed as cbx_timed
+from ..utils import checkpoint as cbx_checkpoint
+from cbx.utils.objective_handling import _promote_objective, cbx_objective, cbx_objective_fh
 
 #%%
 from typing import Callable, Union, List
 from numpy.typing import ArrayLike
 import numpy as np
+import asyncio
+import functools
+import os
+import tempfile
+import warnings
 from numpy.lib.stride_tricks import as_strided
 from numpy.random import Generator, MT19937
-from scipy.special import logsumexp as logsumexp_scp
 
         
 class post_process_default:
@@ -32,8 +42,13 @@ class post_process_default:
         self.max_thresh = max_thresh
     
     def __call__(self, dyn):
-        np.nan_to_num(dyn.x, copy=False, nan=self.max_thresh)
-        dyn.x = np.clip(dyn.x, -self.max_thresh, self.max_thresh)
+        if dyn.backend.name == 'numpy':
+            # fmin maps nan and inf to max_thresh, without allocating a mask as nan_to_num
+            np.fmin(dyn.x, self.max_thresh, out=dyn.x)
+            np.maximum(dyn.x, -self.max_thresh, out=dyn.x)
+        else:
+            dyn.backend.nan_to_num(dyn.x, copy=False, nan=self.max_thresh)
+            dyn.backend.clip(dyn.x, -self.max_thresh, self.max_thresh, out=dyn.x)
 
 class ParticleDynamic:
     r"""The base particle dynamic class
@@ -44,7 +59,10 @@ class ParticleDynamic:
     is assumed to be a function :math:`f:\mathbb{R}^{d}\to\mathbb{R}`. If the objective can handle 
     arrays of shape :math:`(N, d)`, i.e., it can be applied to multiple particles, then you can use the 
     argument ``f_dim=2D``, or analogously ``f_dim=3D``, if it can handle arrays of shape :math:`(M, N, d)`. 
-    You can also directly provide the objective function as a :class:`cbx_objective` instance.
+    For expensive objectives acting on single particles, ``f_dim='1D-threads'`` evaluates the particles 
+    concurrently on a thread pool, see :class:`cbx_objective_f1D_threads`, and ``f_dim='1D-processes'`` on a pool of 
+    processes, see :class:`cbx_objective_f1D_processes`. Objectives defined with ``async def`` are evaluated concurrently 
+    on an event loop, see :class:`cbx_objective_f1D_async` and :meth:`optimize_async`. You can also directly provide the objective function as a :class:`cbx_objective` instance.
     
     During the initialization of the class, the dimension of the output is checked using the :meth:`check_f_dims` method. 
     If the check fails, an error is raised. This check can be turned off by setting the ``check_f_dims`` parameter to ``False``.
@@ -77,7 +95,16 @@ class ParticleDynamic:
     f : Callable
         The objective function :math:`f` of the system.
     f_dim : str, optional
-        The dimensionality of the objective function. The default is '1D'.
+        The dimensionality of the objective function. One of ``'1D'``, ``'2D'``, ``'3D'``, ``'auto'``, ``'1D-threads'``, ``'1D-processes'`` or ``'1D-async'``. 
+        For ``async def`` objectives, ``'1D'`` selects ``'1D-async'``. For ``'auto'``, an objective given for single particles is 
+        evaluated vectorized if possible, see :class:`cbx_objective_auto`. The default is '1D'.
+    f_args : dict, optional
+        Keyword arguments for the objective wrapper, that is selected by ``f_dim``, e.g., ``{'workers': 8}`` for 
+        ``f_dim='1D-threads'``. The default is None.
+    cache_args : dict, optional
+        If not None, the evaluations of the objective are memoized in a least-recently-used cache, such that repeated 
+        evaluations at the same point are not performed again and are not counted in ``num_f_eval``. The keys ``'size'`` 
+        and ``'decimals'`` are passed to :meth:`cbx_objective.set_cache`, e.g., ``{'size': 10000}``. The default is None.
     check_f_dims : bool, optional
         If ``True``, the dimension of the objective function is checked. The default is ``True``.
     x : array_like, shape (M, N, d) or None, optional
@@ -96,6 +123,11 @@ class ParticleDynamic:
     term_criteria : list[Callable], optional
         A list of callables that determine the termination of the optimization. Each callable in the list should accept a single argument (the dynamic object) 
         and return a numpy array of size (M,), where term(dyn)[i] specifies, whether the optimization should be terminated for the i-th run.
+    compact_runs : bool, optional
+        If ``True``, the runs are physically reordered, whenever some of them terminate, such that the active runs form the 
+        leading block ``[:num_active_runs]`` of all run-indexed arrays. The update then acts on views of the arrays instead of 
+        gathering and scattering the active runs in every step. The original order of the runs is stored in ``run_ids`` 
+        and is restored at the end of :meth:`optimize`, the history is always stored in the original order. The default is ``False``.
     track_args : dict
         The arguments for the tracking certain objects in the history. The following keys are possible:
         
@@ -105,15 +137,62 @@ class ParticleDynamic:
             The frequency of the saving of the data. The default is 1.
         * 'extra_tracks' : list
             A list of extra tracks that should be performed. Each object in this list must have init_history and an update method.
+        * 'storage' : str
+            Either ``'list'``, where the entries are kept in lists in memory, or ``'memmap'``, where the entries are written to 
+            preallocated ``.npy`` files, see :class:`cbx.utils.history.memmap_history`. The default is ``'list'``.
+        * 'path' : str
+            The directory of the files for ``storage='memmap'``. The default is a temporary directory, which is deleted 
+            together with the dynamic.
+        * 'save_schedule' : str or list
+            The iterations, at which the tracks are updated. If ``'log'``, the iterations are spaced geometrically, where the 
+            iteration after ``i`` is ``max(i + 1, ceil(save_factor * i))``, e.g., 0, 1, 2, 4, 8, ... for the default factor 2. 
+            If a list is given, the tracks are updated at the given iterations. The default is None, i.e., every ``save_int`` iterations.
+        * 'save_factor' : float
+            The growth factor of the ``'log'`` schedule. The default is 2.
+        * 'capacity' : int or dict
+            If given, only the last ``capacity`` entries are kept in a ring buffer, see :class:`cbx.utils.history.ring_history`, 
+            such that the memory is constant, however long the dynamic runs. A dict specifies the capacity for each key, 
+            keys that are not contained are stored without limit. The default is None.
+        * 'dtype' : dtype or dict
+            The dtype, in which floating point entries are stored, e.g., ``'float16'`` or ``{'x': 'float32'}`` to reduce the memory 
+            of large entries like ``'x'``, ``'drift'`` and ``'consensus'``. If a dtype is given, the entries are stored as ``numpy`` 
+            arrays. The default is None, i.e., the entries are stored in the precision of the dynamic.
+        
+        If ``'storage'``, ``'capacity'`` or ``'dtype'`` are given, all entries of a key are stored in one array. Then, the 
+        entries of ``'consensus'`` and ``'drift'`` have a slot for each of the ``M`` runs, which is NaN for the runs that 
+        terminated already. Otherwise, only the active runs are stored.
 
     post_process : Callable
         A callbale acting on the dynamic that should be performed after each optimization step.
+    backend : str or backend, optional
+        The array backend, that is used for all array operations of the dynamic, see :mod:`cbx.utils.backend`. 
+        Can be ``'numpy'``, ``'torch'`` or a backend instance. If ``None``, the backend is inferred from the initial 
+        positions ``x``, where ``numpy`` is used by default.
+    dtype : optional
+        The floating point dtype of the particles and all derived arrays, e.g., ``'float32'`` or ``np.float32``. 
+        This affects the initialization, the noise sampling, the consensus computation and the history. The numerically 
+        sensitive reductions, namely the ``logsumexp`` in the consensus computation and the effective sample size 
+        scheduler, are always accumulated in double precision. If ``None``, the dtype of the initial positions ``x`` 
+        or the default dtype of the backend is used.
+    timing : bool, optional
+        If ``True``, the wall time and the number of calls of the phases of each step, e.g., the evaluation of the objective 
+        and the computation of the consensus, are recorded in the :class:`cbx.utils.timing.timer` ``timer``, see 
+        ``timed_phases``. A summary is printed at the end of :meth:`optimize`. If ``False``, no timing wrappers are 
+        installed, such that there is no overhead. The default is ``False``.
     copy : Callable
-        A callable that copies an array. The default is ``np.copy``.
+        A callable that copies an array. The default is the ``copy`` function of the backend, e.g., ``np.copy``.
     norm : Callable
-        A callable that computes the norm of an array. The default is ``np.linalg.norm``.
+        A callable that computes the norm of an array. The default is the ``norm`` function of the backend, e.g., ``np.linalg.norm``.
     normal : Callable
-        A callable that generates an array of random numbers that are distributed according to a normal distribution. The default is ``np.random.normal``.
+        A callable that generates an array of random numbers that are distributed according to a normal distribution. 
+        The default is the ``normal`` function of the backend, e.g., ``np.random.normal``. To avoid the per-step sampling 
+        overhead for small ensembles, :class:`cbx.utils.rng.normal_buffer` pregenerates the numbers for many steps at once.
+    seed : int, SeedSequence or run_generators, optional
+        If not None, each run draws its random numbers for the initialization, the noise, the batching and the resampling 
+        from its own generators, see :class:`cbx.utils.rng.run_generators`. Then, the results of a run only depend on 
+        the seed and its run id, such that runs can be split over several dynamics or processes reproducibly. The noise is 
+        sampled with :meth:`run_normal`, which replaces ``normal``. In this case, the workspace mode samples the noise 
+        with :meth:`run_normal` as well. The default is None, i.e., the random numbers are drawn from the backend.
 
     verbosity : int, optional
         The verbosity level. The default is 1.
@@ -130,40 +209,131 @@ class ParticleDynamic:
             M: int = 1, N: int = 20, d: int = None,
             max_it: int = 1000,
             term_criteria: List[Callable] = None,
+            compact_runs: bool = False,
             track_args: list = None,
             verbosity: int = 1,
             copy: Callable = None,
             norm: Callable = None,
             normal: Callable = None,
             post_process: Callable = None,
+            backend = None,
+            dtype = None,
+            timing: bool = False,
+            f_args: dict = None,
+            cache_args: dict = None,
+            seed = None,
             ) -> None:
         
         self.verbosity = verbosity
         
         # set utilities
-        self.copy = copy if copy is not None else np.copy 
-        self.norm = norm if norm is not None else np.linalg.norm
-        self.normal = normal if normal is not None else np.random.normal
+        if dtype is None and isinstance(x, np.ndarray) and x.dtype.kind == 'f':
+            dtype = x.dtype # keep the precision of the given particles
+        self.backend = get_backend(backend, x, dtype=dtype)
+        self.copy = copy if copy is not None else self.backend.copy
+        self.norm = norm if norm is not None else self.backend.norm
+        self.normal = normal if normal is not None else self.backend.normal
+        self.init_rng(seed, M if x is None or x.ndim < 3 else x.shape[0])
         
         # init particles    
         self.init_x(x, M, N, d, x_min, x_max)
         
         # set and promote objective function
-        self.init_f(f, f_dim, check_f_dims)
+        self.init_f(f, f_dim, check_f_dims, f_args=f_args, cache_args=cache_args)
 
-        self.energy = float('inf') * np.ones((self.M,self.N)) # energy of the particles
-        self.best_energy = float('inf') * np.ones(self.M,)
+        self.energy = self.backend.full((self.M, self.N), float('inf'), like=self.x) # energy of the particles
+        self.best_energy = self.backend.full((self.M,), float('inf'), like=self.x)
         self.best_particle = self.copy(self.x[:, 0, :])
-        self.update_diff = float('inf') * np.ones((self.M,))
+        self.update_diff = self.backend.full((self.M,), float('inf'), like=self.x)
 
 
         # termination parameters and checks
+        self.compact_runs = compact_runs
         self.init_term(term_criteria, max_it)
         self.it = 0
         self.init_history(track_args)
         
         # post processing
-        self.post_process = post_process if post_process is not None else post_process_default
+        self.post_process = post_process if post_process is not None else post_process_default()
+        
+        # timing of the phases
+        self.init_timing(timing)
+        
+    # maps the names of the attributes, that are timed if timing is enabled, to the names of the phases
+    timed_phases = {
+        'f': 'eval_f', 
+        'step': 'step', 
+        'compute_update_diff': 'update_diff',
+        'update_best_cur_particle': 'best_particle',
+        'update_best_particle': 'best_particle',
+        'terminate': 'terminate', 
+        'track': 'track', 
+        'post_process': 'post_process'
+    }
+    
+    def init_timing(self, timing: bool) -> None:
+        """
+        Initializes the timing of the phases. If enabled, the attributes listed in ``timed_phases`` are replaced by 
+        wrappers, that record their wall time in ``self.timer``. Since methods are wrapped as bound methods, 
+        attributes that are set later, e.g., the noise model, are still timed correctly.
+
+        Parameters:
+            timing (bool): Whether to enable the timing.
+
+        Returns:
+            None
+        """
+        if not timing:
+            self.timer = None
+            return
+        
+        self.timer = cbx_timer()
+        for attr, phase in self.timed_phases.items():
+            fun = getattr(self, attr, None)
+            if fun is not None:
+                setattr(self, attr, self.timer.wrap(phase, fun))
+
+    def init_rng(self, seed, M: int) -> None:
+        """
+        Initializes the random number generators of the runs, if a seed is given.
+
+        Parameters:
+            seed: The seed, see the class documentation.
+            M (int): The number of runs.
+
+        Returns:
+            None
+        """
+        if seed is None:
+            self.run_rng = None
+            return
+        self.run_rng = seed if isinstance(seed, run_generators) else run_generators(seed, M)
+        if self.run_rng.M != M:
+            raise ValueError('The generators of ' + str(self.run_rng.M) + ' runs can not be used for ' + str(M) + ' runs!')
+        self.normal = self.run_normal
+        
+    def run_normal(self, loc = 0., scale = 1., size = None):
+        """
+        Samples normally distributed numbers from the noise streams of the runs. The leading axis of ``size`` must either 
+        correspond to all runs or to the active runs.
+
+        Parameters:
+            loc (float): The mean. Default: 0.
+            scale (float): The standard deviation. Default: 1.
+            size (tuple): The shape of the sample.
+
+        Returns:
+            The sample as an array of the backend.
+        """
+        if size[0] == self.num_active_runs:
+            runs = self.run_ids[self.active_runs_idx]
+        elif size[0] == self.M:
+            runs = self.run_ids
+        else:
+            raise ValueError('The leading axis of the size ' + str(size) + ' does not correspond to the runs!')
+        # sample directly in single precision, if the numpy backend uses it
+        dtype = np.float32 if self.backend.name == 'numpy' and self.backend.dtype == np.float32 else np.float64
+        return self.backend.asarray(self.run_rng.normal(runs, 'noise', size[1:], loc=loc, scale=scale, dtype=dtype))
 
     def init_x(self, x, M, N, d, x_min, x_max):
         """
@@ -184,15 +354,19 @@ class ParticleDynamic:
         if x is None:
             if d is None:
                 raise RuntimeError('If the inital partical system is not given, the dimension d must be specified!')
-            x = init_particles(
-                    shape=(M, N, d), 
-                    x_min = x_min, x_max = x_max
-                )
+            if self.run_rng is not None:
+                x = self.run_rng.uniform(range(M), 'init', (N, d), low=x_min, high=x_max)
+            else:
+                x = init_particles(
+                        shape=(M, N, d), 
+                        x_min = x_min, x_max = x_max
+                    )
         else: # if x is given correct shape
             if len(x.shape) == 1:
                 x = x[None, None, :]
             elif len(x.shape) == 2:
                 x = x[None, :]
+        x = self.backend.asarray(x) # cast to the dtype of the backend
         
         self.M = x.shape[0]
         self.N = x.shape[1]
@@ -201,11 +375,15 @@ class ParticleDynamic:
         self.x = self.copy(x)
         
 
-    def init_f(self, f, f_dim, check_f_dims):
-        self.f = _promote_objective(f, f_dim)
+    def init_f(self, f, f_dim, check_f_dims, f_args = None, cache_args = None):
+        self.f = _promote_objective(f, f_dim, f_args=f_args)
+        if cache_args is not None:
+            if not isinstance(self.f, cbx_objective):
+                self.f = cbx_objective_fh(self.f)
+            self.f.set_cache(**cache_args)
                 
         self.num_f_eval = 0 * np.ones((self.M,), dtype=int) # number of function evaluations  
-        self.f_min = float('inf') * np.ones((self.M,)) # minimum function value
+        self.f_min = self.backend.full((self.M,), float('inf'), like=self.x) # minimum function value
         self.check_f_dims(check=check_f_dims) # check the dimension of the objective function
 
     def check_f_dims(self, check=True) -> None:
@@ -219,10 +397,36 @@ class ParticleDynamic:
             None
         """
         if check: # check if f returns correct shape
-            x = self.normal(0., 1., self.x.shape)
-            if self.f(x).shape != (self.M,self.N):
+            if self.run_rng is not None: # probe with the init streams, which are not used after the initialization
+                x = self.backend.asarray(self.run_rng.normal(np.arange(self.M), 'init', self.x.shape[1:]))
+            else:
+                x = self.normal(0., 1., self.x.shape)
+            if self.eval_f(x, runs=Ellipsis).shape != (self.M,self.N):
                 raise ValueError("The given objective function does not return the correct shape!")
-            self.num_f_eval += self.N * np.ones((self.M,), dtype=int) # number of function evaluations
+                
+    def eval_f(self, x, runs = None):
+        """
+        Evaluates the objective function and updates the number of function evaluations ``num_f_eval``. If the objective 
+        uses a cache, see :meth:`cbx_objective.set_cache`, only the actual evaluations are counted. Evaluations of the 
+        probe of :class:`cbx_objective_auto` are counted for the first run of ``x``.
+
+        Parameters:
+            x : array_like, shape (num_runs, n, ...)
+                The particles, where the first axis corresponds to the runs ``runs``.
+            runs : optional
+                The index of the runs of ``x``. Defaults to None, i.e., the active runs ``active_runs_idx``.
+
+        Returns:
+            The energies of shape (num_runs, n).
+        """
+        energy = self.f(x)
+        num_eval = getattr(getattr(self.f, 'cache', None), 'last_num_eval', None)
+        runs = np.arange(self.M)[self.active_runs_idx if runs is None else runs]
+        self.num_f_eval[runs] += num_eval if num_eval is not None else x.shape[1]
+        num_probe_eval = getattr(self.f, 'last_num_probe_eval', 0)
+        if num_probe_eval > 0 and len(runs) > 0:
+            self.num_f_eval[runs[0]] += num_probe_eval
+        return energy
     
     def pre_step(self,):
         """
@@ -236,7 +440,34 @@ class ParticleDynamic:
             None
         """
         # save old positions
-        self.x_old = self.copy(self.x)
+        self.swap_buffers('x')
+        
+    def swap_buffers(self, name: str = 'x') -> None:
+        r"""
+        Save the current value of the attribute ``name`` in the attribute ``name + '_old'``.
+
+        Instead of copying the current array in every step, two preallocated buffers are used, which swap their roles 
+        (ping-pong). After calling this function, ``name + '_old'`` refers to the array that was previously stored in ``name``, 
+        while ``name`` refers to the second buffer, which is overwritten in-place with the current values. Therefore, 
+        the update in :meth:`inner_step` can be performed in-place on ``name``, while ``name + '_old'`` still holds the previous state.
+        
+        A new buffer is only allocated in the first step, or if the shape or type of the attribute changed.
+
+        Parameters:
+            name (str): The name of the attribute. Default: 'x'.
+
+        Returns:
+            None
+        """
+        cur = getattr(self, name)
+        buf = getattr(self, name + '_old', None)
+        if (buf is None or buf is cur or type(buf) is not type(cur) or 
+            buf.shape != cur.shape or buf.dtype != cur.dtype):
+            buf = self.copy(cur)
+        else:
+            buf[...] = cur
+        setattr(self, name + '_old', cur)
+        setattr(self, name, buf)
         
     def inner_step(self,):
         """
@@ -273,15 +504,27 @@ class ParticleDynamic:
         Return:
             None
         """
-        if hasattr(self, 'x_old'):
-            self.update_diff = self.norm(self.x - self.x_old, axis=(-2,-1))/self.N
-        
+        self.compute_update_diff()
         self.update_best_cur_particle()
         self.update_best_particle()
         self.track()
         self.post_process(self)
         self.it+=1
         
+    def compute_update_diff(self,) -> None:
+        """
+        Computes the difference between the current and the previous positions of the particles, 
+        if the attribute ``x_old`` exists, and stores it in ``update_diff``.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if hasattr(self, 'x_old'):
+            self.update_diff = self.norm(self.x - self.x_old, axis=(-2,-1))/self.N
+        
     def step(self,) -> None:
         """
         Execute a step in the dynamic.
@@ -314,7 +557,9 @@ class ParticleDynamic:
 
     def optimize(self,
                  print_int: Union[int, None] = None,
-                 sched = 'default'):
+                 sched = 'default',
+                 checkpoint_int: Union[int, None] = None,
+                 checkpoint_path: Union[str, None] = None):
         """
         Optimize the function using the dynmaic. This function perfoms the iterations as specified by step method and the update in :meth:`inner_step`.
 
@@ -324,10 +569,17 @@ class ParticleDynamic:
             sched : str
                 The scheduler to use for the optimization. If set to 'default', the default scheduler is used. 
                 If set to None, a scheduler is created based on the current optimization parameters. Defaults to 'default'.
+            checkpoint_int : int, optional
+                If not None, a checkpoint is written to ``checkpoint_path`` every ``checkpoint_int`` iterations, 
+                see :meth:`save_checkpoint`. Defaults to None.
+            checkpoint_path : str, optional
+                The directory of the periodic checkpoints. Defaults to None.
 
         Returns:
             best_particle: The best particle found during the optimization process.
         """
+        if checkpoint_int is not None and checkpoint_path is None:
+            raise ValueError('A checkpoint_path must be specified for periodic checkpoints!')
         
         print_int = print_int if print_int is not None else self.save_int
         
@@ -340,17 +592,302 @@ class ParticleDynamic:
             sched = scheduler([])
         elif sched == 'default':
             sched = self.default_sched()
-        else:
-            self.sched = sched
+        self.sched = sched
 
         while not self.terminate():
             self.step()
             sched.update(self)
             if (self.it % print_int == 0):
                 self.print_cur_state()
+            if checkpoint_int is not None and self.it % checkpoint_int == 0:
+                self.save_checkpoint(checkpoint_path)
 
+        if self.compact_runs:
+            self.restore_run_order()
         self.print_post_opt()
         return self.best_particle
+
+    def iterate(self,
+                every: int = 1,
+                fields: Union[List[str], None] = None,
+                copy: bool = False,
+                sched = 'default'):
+        """
+        Lazily advances the dynamic and yields a snapshot of the chosen fields every ``every`` iterations, until the dynamic 
+        terminates. This allows to process the progress incrementally, e.g., for logging or custom early stopping, without 
+        storing a history. The iterations are the same as in :meth:`optimize`, breaking out of the loop stops the dynamic.
+
+        By default, the snapshots contain read-only views of the arrays of the dynamic, which are only valid until the next 
+        step. For example, ``x`` is overwritten in-place in the following steps. Use ``copy=True`` to keep the snapshots.
+        Run-indexed arrays are always given in the original order of the runs, see :meth:`in_run_order`.
+
+        Parameters:
+            every : int, optional
+                The number of iterations between two snapshots. Defaults to 1.
+            fields : list of str, optional
+                The names of the attributes in the snapshots. Defaults to ``['x', 'energy', 'best_particle', 'best_energy']``.
+            copy : bool, optional
+                If ``True``, the snapshots contain copies instead of views. Defaults to False.
+            sched : optional
+                The scheduler, see :meth:`optimize`. Defaults to 'default'.
+
+        Yields:
+            dict: The snapshot, containing the iteration ``'it'`` and the chosen fields.
+
+        Example:
+            >>> for snap in dyn.iterate(every=10, fields=['best_energy']):
+            ...     if snap['best_energy'].min() < 1e-6:
+            ...         break
+        """
+        fields = fields if fields is not None else ['x', 'energy', 'best_particle', 'best_energy']
+        if sched is None:
+            sched = scheduler([])
+        elif sched == 'default':
+            sched = self.default_sched()
+        self.sched = sched
+        
+        try:
+            while not self.terminate():
+                self.step()
+                sched.update(self)
+                if self.it % every == 0:
+                    yield self.snapshot(fields, copy=copy)
+        finally:
+            if self.compact_runs:
+                self.restore_run_order()
+                
+    def snapshot(self, fields: List[str], copy: bool = False) -> dict:
+        """
+        Returns the current values of the attributes ``fields``, see :meth:`iterate`.
+
+        Parameters:
+            fields (list of str): The names of the attributes.
+            copy (bool): If ``True``, copies of the arrays are returned, otherwise read-only views. Default: False.
+
+        Returns:
+            dict: The snapshot, containing the iteration ``'it'`` and the chosen fields.
+        """
+        snap = {'it': self.it}
+        for name in fields:
+            a = getattr(self, name)
+            if getattr(a, 'ndim', 0) > 0:
+                if name in self.run_attributes and a.shape[0] == self.M:
+                    a = self.in_run_order(a, copy=copy)
+                elif copy:
+                    a = self.copy(a)
+                if isinstance(a, np.ndarray) and not copy:
+                    a = a.view()
+                    a.flags.writeable = False
+            snap[name] = a
+        return snap
+    
+    async def optimize_async(self,
+                             print_int: Union[int, None] = None,
+                             sched = 'default'):
+        """
+        Asynchronous variant of :meth:`optimize`. The iterations are performed in a worker thread, while the evaluations of 
+        an asynchronous objective, see :class:`cbx_objective_f1D_async`, are scheduled on the running event loop of the caller. 
+        Therefore, other tasks of the event loop, e.g., a server that answers the queries of the objective, keep running 
+        during the optimization.
+
+        Parameters:
+            print_int : int, optional 
+                The interval at which to print the current state of the optimization, see :meth:`optimize`.
+            sched : str
+                The scheduler to use for the optimization, see :meth:`optimize`.
+
+        Returns:
+            best_particle: The best particle found during the optimization process.
+        """
+        set_loop = getattr(self.f, 'set_loop', None)
+        if set_loop is not None:
+            set_loop(asyncio.get_running_loop())
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.optimize, print_int=print_int, sched=sched)
+            )
+        finally:
+            if set_loop is not None:
+                set_loop(None)
+    
+    def run_steps(self, 
+                  k: int, 
+                  check_int: int = 1,
+                  print_int: Union[int, None] = None,
+                  sched = 'default') -> int:
+        """
+        Performs at most ``k`` steps of the dynamic, where the termination criteria and the scheduler are only evaluated every 
+        ``check_int`` steps. For small ensembles, this avoids the overhead of :meth:`terminate` in each iteration.
+
+        Between two checks, no run overshoots the budget of a termination criterion, that implements a ``steps_left`` method, 
+        namely :class:`max_it_term`, :class:`max_eval_term` and :class:`max_time_term`. Therefore, with respect to these 
+        criteria, each run performs exactly the same number of steps as in :meth:`optimize`. For :class:`max_eval_term`, 
+        each step is assumed to perform as many evaluations as the most expensive step so far, but at least one evaluation 
+        of all ``N`` particles, such that the budget is not exceeded, if fewer evaluations are needed in some steps, e.g., 
+        due to the cache of the objective. Other 
+        criteria, e.g., :class:`energy_tol_term`, are only checked every ``check_int`` steps.
+
+        Parameters:
+            k : int
+                The maximum number of steps.
+            check_int : int, optional
+                The interval at which the termination criteria are checked and the scheduler is updated. Defaults to 1.
+            print_int : int, optional
+                The interval at which to print the current state of the optimization. If not provided, ``save_int`` is used.
+            sched : optional
+                The scheduler, that is updated every ``check_int`` steps, see :meth:`optimize`. Defaults to 'default'.
+
+        Returns:
+            int: The number of steps that were performed.
+        """
+        print_int = print_int if print_int is not None else self.save_int
+        if sched is None:
+            sched = scheduler([])
+        elif sched == 'default':
+            sched = self.default_sched()
+            
+        self.sched = sched
+            
+        steps = 0
+        while steps < k and not self.terminate():
+            n = int(min(k - steps, check_int, self.steps_left()))
+            it, num_f_eval = self.it, self.num_f_eval.copy()
+            for _ in range(n):
+                self.step()
+            # the maximal number of evaluations per step, rounded up, but at least one evaluation of all particles
+            evals_per_step = np.maximum(-((num_f_eval - self.num_f_eval) // n), self.N)
+            old = getattr(self, 'evals_per_step', None)
+            self.evals_per_step = evals_per_step if old is None or old.shape != evals_per_step.shape else np.maximum(old, evals_per_step)
+            sched.update(self)
+            if self.it // print_int > it // print_int:
+                self.print_cur_state()
+            steps += n
+            
+        if self.compact_runs:
+            self.restore_run_order()
+        return steps
+    
+    def steps_left(self,):
+        """
+        Returns the number of steps, that can be performed before a termination criterion with a fixed budget is met.
+        Criteria without a ``steps_left`` method are ignored.
+
+        Parameters:
+            None
+
+        Returns:
+            The number of steps, ``inf`` if no criterion has a budget.
+        """
+        return min([term.steps_left(self) for term in self.term_criteria if hasattr(term, 'steps_left')], default=float('inf'))
+    
+    # attributes, that are stored in a checkpoint in addition to the ``run_attributes``, see :meth:`save_checkpoint`
+    checkpoint_attributes = ('it', 'track_it', 'next_save_it', 'active_runs_idx', 'num_active_runs', 'term_reason', 'run_ids', 'run_order', 
+                             'sched')
+    
+    def get_checkpoint_state(self,) -> dict:
+        """
+        Returns the state of the dynamic, that is stored in a checkpoint. This consists of the attributes listed in 
+        ``run_attributes`` and ``checkpoint_attributes``, the state of the random number generator of the backend, 
+        the state of the ``normal`` callable, if it provides ``get_state``, e.g., :class:`cbx.utils.rng.normal_buffer`, 
+        the number of evaluations of the objective and the history.
+
+        Parameters:
+            None
+
+        Returns:
+            dict: The state.
+        """
+        state = {name: getattr(self, name) for name in self.run_attributes + self.checkpoint_attributes if hasattr(self, name)}
+        state['rng_state'] = self.backend.get_rng_state()
+        if self.run_rng is not None:
+            state['run_rng_state'] = self.run_rng.get_state()
+        elif hasattr(self.normal, 'get_state'):
+            state['normal_state'] = self.normal.get_state()
+        state['num_eval'] = getattr(self.f, 'num_eval', None)
+        state['history'] = self.history
+        return state
+    
+    def set_checkpoint_state(self, state: dict) -> None:
+        """
+        Restores the state of the dynamic, that was returned by :meth:`get_checkpoint_state`.
+
+        Parameters:
+            state (dict): The state.
+
+        Returns:
+            None
+        """
+        for name in self.run_attributes + self.checkpoint_attributes:
+            if name in state:
+                setattr(self, name, state[name])
+        self.backend.set_rng_state(state['rng_state'])
+        if 'run_rng_state' in state:
+            self.run_rng.set_state(state['run_rng_state'])
+        if 'normal_state' in state:
+            self.normal.set_state(state['normal_state'])
+        if state['num_eval'] is not None:
+            f = self.f.fun if isinstance(self.f, cbx_timed) else self.f
+            f.num_eval = state['num_eval']
+        for key, entries in state['history'].items():
+            store = self.history.get(key, None)
+            if store is not None and not isinstance(store, list): # keep the storage of the history, e.g., memory maps
+                store.clear()
+                for entry in entries:
+                    store.append(entry)
+            else:
+                self.history[key] = entries
+    
+    def save_checkpoint(self, path: str) -> None:
+        """
+        Saves the current state of the dynamic to the directory ``path``, see :mod:`cbx.utils.checkpoint` for the format. 
+        Together with :meth:`load_checkpoint`, this allows to resume an optimization, e.g., after a crash, where the resumed 
+        run continues bit-identically.
+
+        The configuration of the dynamic, e.g., the objective, the termination criteria and the noise model, is not stored. 
+        Therefore, the checkpoint must be loaded into a dynamic, that was created with the same arguments. Random numbers are 
+        only restored, if they are drawn from the backend or from a custom ``normal`` callable with the methods ``get_state`` 
+        and ``set_state``, e.g., :class:`cbx.utils.rng.normal_buffer`.
+        
+        Note that the random state of the backend is the global random state for the ``numpy`` backend in double 
+        precision (``np.random``) and for the ``torch`` backend. Loading such a checkpoint resets this global state, 
+        which also affects all other code, that draws from it. The per-run generators, see the parameter ``seed``, 
+        are owned by the dynamic and avoid this side effect.
+
+        Parameters:
+            path (str): The directory of the checkpoint.
+
+        Returns:
+            None
+        """
+        cbx_checkpoint.save_checkpoint(path, self.get_checkpoint_state(), to_numpy=self.backend.to_numpy)
+        
+    def load_checkpoint(self, path: str) -> None:
+        """
+        Loads the state of the dynamic from a checkpoint written by :meth:`save_checkpoint`. The particles and all other 
+        arrays of the state are loaded into memory, while the entries of the history are memory mapped. To continue with 
+        the scheduler of the checkpoint, call ``optimize(sched=dyn.sched)``.
+        
+        Loading restores the random state of the backend, which may be the global random state, see :meth:`save_checkpoint`.
+        On Windows, the memory mapped history prevents, that the checkpoint is replaced by a later save to the same 
+        ``path``, see :mod:`cbx.utils.checkpoint`.
+
+        Parameters:
+            path (str): The directory of the checkpoint.
+
+        Returns:
+            None
+        """
+        state = cbx_checkpoint.load_checkpoint(path, mmap_mode='r')
+        for name in self.run_attributes + self.checkpoint_attributes:
+            if isinstance(state.get(name, None), np.ndarray):
+                a = np.array(state[name]) # copy from the memory map
+                if name in state['converted']:
+                    like = getattr(self, name, None)
+                    a = self.backend.asarray(a, like=None if isinstance(like, np.ndarray) else like)
+                state[name] = a
+        for key in state['history_converted']:
+            state['history'][key] = [self.backend.asarray(np.array(h)) for h in state['history'][key]]
+        self.set_checkpoint_state(state)
     
     def print_cur_state(self,):
         """
@@ -381,6 +918,9 @@ class ParticleDynamic:
             print('Finished solver.')
             print('Best energy: ' + str(self.best_energy))
             print('-'*20)
+            if self.timer is not None:
+                self.timer.print_summary()
+                print('-'*20)
 
             
     def reset(self,):
@@ -413,6 +953,8 @@ class ParticleDynamic:
         self.term_reason = [None for i in range((self.M))]
         self.active_runs_idx = np.arange(self.M)
         self.num_active_runs = self.M
+        self.run_ids = np.arange(self.M)
+        self.run_order = None
     
     def terminate(self,):
         self.select_active_runs()
@@ -431,37 +973,161 @@ class ParticleDynamic:
 
         loc_term = np.zeros((self.M, len(self.term_criteria)), dtype=bool)
         for i, term in enumerate(self.term_criteria):
-            loc_term[:, i] = term(self)
+            loc_term[:, i] = self.backend.to_numpy(term(self))
             
         terms = np.sum(loc_term, axis=1)
         self.active_runs_idx = np.where(terms==0)[0]
         self.num_active_runs = self.active_runs_idx.shape[0]
             
-        for j in range(self.M):
-            if terms[j]:
-                self.term_reason[j] = np.where(loc_term[j,:])[0]
+        for j in np.where(terms)[0]:
+            self.term_reason[j] = np.where(loc_term[j,:])[0]
+                
+        if self.compact_runs and 0 < self.num_active_runs < self.M:
+            self.compact()
+            
+    # attributes, whose leading axis indexes the runs, these are reordered in :meth:`permute_runs`
+    run_attributes = ('x', 'x_old', 'energy', 'best_energy', 'best_particle', 'best_cur_particle', 'best_cur_energy', 
+                      'f_min', 'f_min_idx', 'update_diff', 'num_f_eval', 'evals_per_step')
+    
+    def compact(self,) -> None:
+        """
+        Reorders the runs, such that the active runs form the leading block of all run-indexed arrays. 
+        The relative order of the active and of the terminated runs is kept.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        k = self.num_active_runs
+        if self.active_runs_idx[-1] == k - 1: # active runs are already the leading block
+            return
+        inactive = np.ones((self.M,), dtype=bool)
+        inactive[self.active_runs_idx] = False
+        self.permute_runs(np.concatenate((self.active_runs_idx, np.where(inactive)[0])))
+        self.active_runs_idx = np.arange(k)
+        
+    def restore_run_order(self,) -> None:
+        """
+        Restores the original order of the runs, after they have been reordered by :meth:`compact`.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.run_order is None:
+            return
+        active_ids = np.sort(self.run_ids[self.active_runs_idx])
+        self.permute_runs(self.run_order)
+        self.active_runs_idx = active_ids
+        
+    def permute_runs(self, perm) -> None:
+        """
+        Reorders all run-indexed attributes, listed in ``run_attributes``, along their leading axis, 
+        such that the run at position ``perm[i]`` is moved to position ``i``.
+
+        Parameters:
+            perm (np.ndarray): The permutation of the runs, of shape (M,).
+
+        Returns:
+            None
+        """
+        for name in self.run_attributes:
+            a = getattr(self, name, None)
+            if getattr(a, 'ndim', 0) > 0 and a.shape[0] == self.M:
+                setattr(self, name, a[perm, ...])
+        self.term_reason = [self.term_reason[j] for j in perm]
+        self.run_ids = self.run_ids[perm]
+        self.run_order = None if np.all(self.run_ids == np.arange(self.M)) else np.argsort(self.run_ids)
+        
+    def in_run_order(self, a, copy: bool = False):
+        """
+        Returns the array ``a``, whose leading axis indexes all runs, in the original order of the runs.
+
+        Parameters:
+            a (Array): The array of shape (M, ...).
+            copy (bool): If ``True``, a copy is returned in any case. Default: False.
+
+        Returns:
+            The array in the original order of the runs.
+        """
+        if self.run_order is not None:
+            return a[self.run_order, ...]
+        return self.copy(a) if copy else a
+    
+    def active_in_run_order(self, a, copy: bool = False, full: bool = False):
+        """
+        Returns the array ``a``, whose leading axis indexes either all runs or the active runs, e.g., the consensus, 
+        with the runs in their original order.
+
+        Parameters:
+            a (Array): The array of shape (M, ...) or (num_active_runs, ...).
+            copy (bool): If ``True``, a copy is returned in any case. Default: False.
+            full (bool): If ``True``, the result always has the shape (M, ...), where the entries of the inactive runs 
+                are NaN. Default: False.
+
+        Returns:
+            The array in the original order of the runs.
+        """
+        if full and a.shape[0] != self.M:
+            out = self.backend.full((self.M,) + tuple(a.shape[1:]), float('nan'), like=a)
+            out[self.run_ids[self.active_runs_idx], ...] = a
+            return out
+        if self.run_order is None or a.shape[0] == self.M:
+            return self.in_run_order(a, copy=copy)
+        return a[np.argsort(self.run_ids[self.active_runs_idx]), ...]
+    
+    def run_idx_in_run_order(self, idx):
+        """
+        Maps an index of the form ``(run_idx, ...)``, that refers to the current positions of the runs, 
+        to the original run ids.
+
+        Parameters:
+            idx: The index, e.g., :attr:`particle_idx`.
+
+        Returns:
+            The index with respect to the original order of the runs.
+        """
+        if self.run_order is None or idx is Ellipsis:
+            return idx
+        return (self.run_ids[idx[0]],) + tuple(idx[1:])
     
     known_tracks = {
         'update_norm': track_update_norm,
         'energy': track_energy,
         'x': track_x
     }
-    def init_history(self, track_args: dict):
+    def init_history(self, track_args: dict = None):
         """
         Initialize the history dictionary and initialize the specified tracking keys.
 
         Parameters:
-            None
+            track_args (dict): The tracking arguments, see the class documentation. If None, the arguments of the 
+            previous call are used.
 
         Returns:
             None
         """
+        track_args = track_args if track_args is not None else getattr(self, 'track_args', None)
+        self.track_args = track_args
         track_args = track_args if track_args else {}  
         track_names = track_args.get('names', ['update_norm', 'energy'])
         extra_tracks = track_args.get('extra_tracks', [])
         self.save_int = track_args.get('save_int', 1)
+        self.save_schedule = track_args.get('save_schedule', None)
+        self.save_factor = track_args.get('save_factor', 2)
+        if isinstance(self.save_schedule, str) and self.save_schedule != 'log':
+            raise ValueError('Unknown save schedule ' + self.save_schedule + '. Choose "log" or a list of iterations.')
+        elif self.save_schedule is not None and not isinstance(self.save_schedule, str):
+            self.save_schedule = sorted(self.save_schedule)
+        self.next_save_it = None
+        if self.save_schedule is not None:
+            self.set_next_save_it()
         self.history = {}
-        self.tracks = extra_tracks
+        self.tracks = list(extra_tracks)
         self.track_it = 0
         for key in track_names:
             if key in self.known_tracks.keys():
@@ -473,6 +1139,52 @@ class ParticleDynamic:
             
         for track in self.tracks:
             track.init_history(self)
+        self.init_history_storage(track_args)
+            
+    def init_history_storage(self, track_args: dict) -> None:
+        """
+        Replaces the lists of the history by the storage specified by the keys ``'storage'``, ``'capacity'`` 
+        and ``'dtype'`` of ``track_args``.
+
+        Parameters:
+            track_args (dict): The tracking arguments.
+
+        Returns:
+            None
+        """
+        storage = track_args.get('storage', 'list')
+        capacity = track_args.get('capacity', None)
+        dtype = track_args.get('dtype', None)
+        if storage not in ['list', 'memmap']:
+            raise ValueError('Unknown history storage ' + str(storage) + '. Choose from "list" or "memmap".')
+        if storage == 'list' and capacity is None and dtype is None:
+            return
+        
+        path = track_args.get('path', None)
+        if storage == 'memmap':
+            if path is None:
+                self._history_dir = tempfile.TemporaryDirectory(prefix='cbx_history_')
+                path = self._history_dir.name
+            os.makedirs(path, exist_ok=True)
+        
+        # the arrays are sized for the number of iterations, they grow if the dynamic runs longer
+        max_its = [term.max_it for term in self.term_criteria if isinstance(term, max_it_term)]
+        num_entries = min(max_its) // self.save_int + 2 if max_its and self.save_schedule is None else 64
+        for key, entries in self.history.items():
+            key_capacity = capacity.get(key, None) if isinstance(capacity, dict) else capacity
+            key_dtype = dtype.get(key, None) if isinstance(dtype, dict) else dtype
+            file = os.path.join(path, key + '.npy') if storage == 'memmap' else None
+            if key_capacity is not None:
+                store = ring_history(key_capacity, path=file, to_numpy=self.backend.to_numpy, dtype=key_dtype)
+            elif storage == 'memmap':
+                store = memmap_history(file, capacity=num_entries, to_numpy=self.backend.to_numpy, dtype=key_dtype)
+            elif key_dtype is not None:
+                store = array_history(num_entries, to_numpy=self.backend.to_numpy, dtype=key_dtype)
+            else:
+                continue
+            for entry in entries:
+                store.append(entry)
+            self.history[key] = store
 
     def track(self,):
         """
@@ -484,10 +1196,31 @@ class ParticleDynamic:
         Returns:
             None
         """
-        if self.it % self.save_int == 0:
+        if self.save_schedule is None:
+            save = self.it % self.save_int == 0
+        else:
+            save = self.it == self.next_save_it
+            if save:
+                self.set_next_save_it()
+        if save:
             for track in self.tracks:
                 track.update(self)
             self.track_it += 1
+            
+    def set_next_save_it(self,) -> None:
+        """
+        Sets the iteration ``next_save_it``, at which the tracks are updated next, according to the ``save_schedule``.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        if self.save_schedule == 'log':
+            self.next_save_it = max(self.it + 1, int(np.ceil(self.save_factor * self.it))) if self.next_save_it is not None else 0
+        else:
+            self.next_save_it = next((i for i in self.save_schedule if i > self.it or self.next_save_it is None), float('inf'))
 
     def update_best_cur_particle(self,) -> None:
         """
@@ -499,14 +1232,15 @@ class ParticleDynamic:
         Returns:
             None
         """
-        self.f_min = self.energy.min(axis=-1)
-        self.f_min_idx = self.energy.argmin(axis=-1)
+        self.f_min = self.backend.min(self.energy, axis=-1)
+        self.f_min_idx = self.backend.argmin(self.energy, axis=-1)
+        run_idx = self.backend.arange(self.M, like=self.f_min_idx)
         
         if hasattr(self, 'x_old'):
-            self.best_cur_particle = self.x_old[np.arange(self.M), self.f_min_idx, :]
+            self.best_cur_particle = self.x_old[run_idx, self.f_min_idx, :]
         else:
-            self.best_cur_particle = self.x[np.arange(self.M), self.f_min_idx, :]
-        self.best_cur_energy = self.energy[np.arange(self.M), self.f_min_idx]
+            self.best_cur_particle = self.x[run_idx, self.f_min_idx, :]
+        self.best_cur_energy = self.energy[run_idx, self.f_min_idx]
     
     def update_best_particle(self,):
         """
@@ -518,48 +1252,219 @@ class ParticleDynamic:
         Returns:
             None
         """
-        idx = np.where(self.best_energy > self.best_cur_energy)[0]
-        if len(idx) > 0:
-            self.best_energy[idx] = self.best_cur_energy[idx]
-            self.best_particle[idx, :] = self.copy(self.best_cur_particle[idx, :])
+        idx = self.best_energy > self.best_cur_energy
+        self.best_energy[idx] = self.best_cur_energy[idx]
+        self.best_particle[idx, :] = self.best_cur_particle[idx, :]
               
-def compute_mat_sqrt(A):
+def compute_mat_sqrt(A, backend = None):
     """
     Compute the square root of a matrix.
 
     Parameters:
         A (np.ndarray): The input matrix.
+        backend (backend, optional): The array backend. Default: numpy.
 
     Returns:
         np.ndarray: The square root of the matrix.
     """
-    B, V = np.linalg.eigh(A)
-    B = np.maximum(B,0.)
-    return V@(np.sqrt(B)[...,None]*V.transpose(0,2,1))
+    backend = backend if backend is not None else numpy_backend()
+    B, V = backend.eigh(A)
+    B = backend.clip(B, 0., None)
+    return V@(backend.sqrt(B)[...,None]*backend.matrix_transpose(V))
 
 class compute_consensus_default:
-    def __init__(self, check_coeffs = False):
+    """
+    Default consensus computation.
+
+    Parameters:
+        check_coeffs (bool): If ``True``, it is checked whether the weights sum up to one. Default: False.
+        backend (backend, optional): The array backend. Default: numpy.
+    """
+    def __init__(self, check_coeffs = False, backend = None):
+        self.backend = backend if backend is not None else numpy_backend()
         if check_coeffs:
             self.check_coeffs = self._check_coeffs
         else:
             self.check_coeffs = self._no_check_coeffs
     
     def __call__(self, energy, x, alpha):
-        weights = - alpha * energy
+        # the weights are normalized in double precision, only the weighted sum uses the precision of x
+        weights = self.backend.astype(- alpha * energy, self.backend.float64)
         coeff_expan = tuple([Ellipsis] + [None for i in range(x.ndim-2)])
-        coeffs = np.exp(weights - logsumexp_scp(weights, axis=-1, keepdims=True))[coeff_expan]
+        coeffs = self.backend.exp(weights - self.backend.logsumexp(weights, axis=-1, keepdims=True))
+        coeffs = self.backend.astype(coeffs, x.dtype)[coeff_expan]
         self.check_coeffs(coeffs)
         return (x * coeffs).sum(axis=1, keepdims=True), energy
     
+    def inplace(self, energy, x, alpha, out, ws):
+        """
+        Computes the consensus point without allocating memory. The weights are computed in the 
+        scratch buffers of the workspace ``ws`` and the consensus is written to ``out``.
+
+        Parameters:
+            energy (np.ndarray): The energies of the particles, of shape (M, N).
+            x (np.ndarray): The particles, of shape (M, N, ...).
+            alpha (np.ndarray): The alpha parameter, of shape (M, 1).
+            out (np.ndarray): The output array, of shape (M, 1, ...).
+            ws (workspace): The workspace providing the scratch buffers.
+
+        Returns:
+            out, energy
+        """
+        dtype = np.result_type(alpha, energy, np.float64)
+        coeffs = ws.get('consensus_coeffs', energy.shape, dtype)
+        norm = ws.get('consensus_norm', energy.shape[:-1] + (1,), dtype)
+        np.multiply(alpha, energy, out=coeffs)
+        np.negative(coeffs, out=coeffs)
+        np.max(coeffs, axis=-1, keepdims=True, out=norm)
+        coeffs -= norm
+        np.exp(coeffs, out=coeffs)
+        np.sum(coeffs, axis=-1, keepdims=True, out=norm)
+        coeffs /= norm
+        self.check_coeffs(coeffs[..., None])
+        if coeffs.dtype != x.dtype:
+            coeffs_x = ws.get('consensus_coeffs_x', energy.shape, x.dtype)
+            np.copyto(coeffs_x, coeffs, casting='same_kind')
+            coeffs = coeffs_x
+        
+        M, N = x.shape[:2]
+        np.matmul(coeffs[:, None, :], x.reshape(M, N, -1), out=out.reshape(M, 1, -1))
+        return out, energy
+    
     def _check_coeffs(self, coeffs):
-        problem_idx = np.where(np.abs(coeffs.sum(axis=1)-1) > 0.1)[0]
-        if len(problem_idx) > 0:
+        if (abs(self.backend.sum(coeffs, axis=1) - 1) > 0.1).any():
             raise RuntimeError('Problematic consensus computation!')
     
     def _no_check_coeffs(self, coeffs):
         pass
     
     
+class compute_consensus_chunked:
+    r"""
+    Consensus computation with bounded memory, for ensembles with a huge number of particles.
+
+    The particles are processed in chunks along the particle axis. For each chunk, the weights are computed and the 
+    consensus is accumulated with an online ``logsumexp``, i.e., with the running maximum :math:`m` of the weights 
+    :math:`w_n = -\alpha f(x_n)`, the normalizer :math:`s = \sum_n \exp(w_n - m)` and the weighted sum 
+    :math:`v = \sum_n \exp(w_n - m) x_n`, which are rescaled whenever the maximum increases. The consensus is then 
+    :math:`v/s`, which equals the result of :class:`compute_consensus_default` up to rounding.
+
+    If used in a dynamic, e.g., ``CBO(f, compute_consensus=compute_consensus_chunked(memory_budget=2**28))``, also the 
+    objective is evaluated chunk by chunk in :meth:`evaluate`, such that neither the gathered particles nor the weighted 
+    particles are materialized for the whole ensemble. Then, the additional memory of the consensus computation 
+    is independent of the number of particles.
+
+    Parameters:
+        chunk_size (int, optional): The number of particles per chunk. Default: None.
+        memory_budget (int, optional): If ``chunk_size`` is None, the chunk size is chosen such that the temporary arrays 
+            of one chunk take about ``memory_budget`` bytes. Default: None, i.e., ``2**27`` bytes.
+        backend (backend, optional): The array backend. Default: numpy.
+    """
+    def __init__(self, chunk_size: int = None, memory_budget: int = None, backend = None):
+        self.chunk_size = chunk_size
+        self.memory_budget = memory_budget if memory_budget is not None else 2**27
+        self.backend = backend if backend is not None else numpy_backend()
+        
+    def get_chunk_size(self, x_shape: tuple, itemsize: int) -> int:
+        """Returns the number of particles per chunk, for particles of shape (num_runs, N, ...)."""
+        if self.chunk_size is not None:
+            return self.chunk_size
+        # the gathered chunk, the weighted chunk and the weights in double precision
+        nbytes = x_shape[0] * (2 * int(np.prod(x_shape[2:])) * itemsize + 8)
+        return max(1, self.memory_budget // nbytes)
+    
+    def init_state(self,) -> None:
+        self.m = None
+        self.s = None
+        self.v = None
+        
+    def accumulate(self, energy, x, alpha) -> None:
+        """
+        Adds a chunk of particles to the running consensus.
+
+        Parameters:
+            energy: The energies of the chunk, of shape (M, n).
+            x: The particles of the chunk, of shape (M, n, ...).
+            alpha: The alpha parameter, of shape (M, 1).
+
+        Returns:
+            None
+        """
+        b = self.backend
+        weights = b.astype(- alpha * energy, b.float64)
+        m = b.max(weights, axis=-1)[..., None]
+        if self.m is not None:
+            m = b.clip(m, self.m, None) # the running maximum
+        e = b.exp(weights - m)
+        coeff_expan = tuple([Ellipsis] + [None for i in range(x.ndim-2)])
+        v = (x * b.astype(e, x.dtype)[coeff_expan]).sum(axis=1, keepdims=True)
+        s = b.sum(e, axis=-1, keepdims=True)
+        if self.m is not None:
+            scale = b.exp(self.m - m)
+            s = s + scale * self.s
+            v = v + b.astype(scale, x.dtype)[coeff_expan] * self.v
+        self.m, self.s, self.v = m, s, v
+        
+    def result(self, dtype):
+        """Returns the consensus of all accumulated chunks."""
+        coeff_expan = tuple([Ellipsis] + [None for i in range(self.v.ndim-2)])
+        return self.v / self.backend.astype(self.s, dtype)[coeff_expan]
+    
+    def __call__(self, energy, x, alpha):
+        chunk = self.get_chunk_size(x.shape, x.dtype.itemsize)
+        self.init_state()
+        for n0 in range(0, x.shape[1], chunk):
+            self.accumulate(energy[:, n0:n0 + chunk], x[:, n0:n0 + chunk, ...], alpha)
+        c = self.result(x.dtype)
+        self.init_state()
+        return c, energy
+    
+    @staticmethod
+    def chunk_idx(idx, n0: int, n1: int):
+        """
+        Restricts the index ``idx`` of the form ``consensus_idx`` to the particles ``n0, ..., n1 - 1`` of the index.
+
+        Parameters:
+            idx: The index, either ``Ellipsis``, ``(runs, Ellipsis)`` or ``(run_idx, batch_idx, Ellipsis)``.
+            n0 (int): The first particle.
+            n1 (int): The end of the chunk.
+
+        Returns:
+            The index of the chunk.
+        """
+        if idx is Ellipsis:
+            return (slice(None), slice(n0, n1), Ellipsis)
+        elif len(idx) == 2:
+            return (idx[0], slice(n0, n1), Ellipsis)
+        return (idx[0][:, n0:n1], idx[1][:, n0:n1], Ellipsis)
+        
+    def evaluate(self, dyn):
+        """
+        Evaluates the objective on the particles ``dyn.x[dyn.consensus_idx]`` chunk by chunk and computes the consensus, 
+        without gathering all particles.
+
+        Parameters:
+            dyn: The dynamic.
+
+        Returns:
+            consensus, energy
+        """
+        R, n = dyn.num_active_runs, dyn.batch_size
+        chunk = self.get_chunk_size((R, n) + tuple(dyn.d), dyn.x.dtype.itemsize)
+        alpha = dyn.alpha[dyn.active_runs_idx, :]
+        energy = None
+        self.init_state()
+        for n0 in range(0, n, chunk):
+            x = dyn.x[self.chunk_idx(dyn.consensus_idx, n0, n0 + chunk)]
+            e = dyn.eval_f(x)
+            if energy is None:
+                energy = dyn.backend.full((R, n), float('inf'), like=e)
+            energy[:, n0:n0 + chunk] = e
+            self.accumulate(e, x, alpha)
+        c = self.result(dyn.x.dtype)
+        self.init_state()
+        return c, energy
+    
 class CBXDynamic(ParticleDynamic):
     r"""The base class for consensus based dynamics
 
@@ -569,7 +1474,7 @@ class CBXDynamic(ParticleDynamic):
         f: Callable
             The function to optimize.
         noise: str or Callable, optional
-            A string can be one of 'isotropic', 'anisotropic', or 'sampling'. It is also possible 
+            A string can be one of 'isotropic', 'anisotropic', 'sampling', 'covariance' or 'low_rank_covariance'. It is also possible 
             to use a Callable instead of a string. This Callable needs to accept a single argument, which is the dynamic object. Default: 'isotropic'.
         batch_args: dict, optional
             The batch arguments. Default: None.
@@ -587,6 +1492,24 @@ class CBXDynamic(ParticleDynamic):
             The correction method. Default: 'no_correction'. One of 'no_correction', 'heavi_side', 'heavi_side_reg' or a Callable.
         correction_eps: float, optional
             The parameter :math:`\epsilon` for the regularized correction. Default: 1e-3.
+        compute_consensus: Callable, optional
+            The computation of the consensus from the energies, the particles and alpha. For huge ensembles, 
+            :class:`compute_consensus_chunked` evaluates the objective and computes the consensus with bounded memory. 
+            Default: :class:`compute_consensus_default`.
+        workspace: bool or workspace, optional
+            If ``True``, scratch buffers are preallocated and reused in every step, such that dynamics supporting 
+            this mode (e.g. :class:`CBO`) avoid large per-step temporaries in their update. A :class:`cbx.utils.workspace.workspace` 
+            instance can also be given directly, e.g., to specify the random number generator. Default: False.
+        compiled: bool, optional
+            If ``True``, dynamics supporting this mode (:class:`CBO`, :class:`CBOMemory` and :class:`PSO`) compute the 
+            consensus and the update with the fused kernels of :mod:`cbx.utils.kernels`, whenever possible, see 
+            :meth:`use_compiled`. This requires ``numba``, if it is not available, a warning is raised and the ``numpy`` 
+            implementation is used. Default: False.
+        cov_reuse_tol: float, optional
+            The relative tolerance, up to which the square root of the covariance matrix of a run is reused in 
+            :meth:`update_covariance`. If the covariance of a run differs from the covariance of the last decomposition by 
+            at most ``cov_reuse_tol`` times its norm, in the Frobenius norm, the cached square root is used instead of a new 
+            eigendecomposition. Default: 0., i.e., the square root is computed in every step.
 
     Returns:
         None
@@ -601,6 +1524,9 @@ class CBXDynamic(ParticleDynamic):
             correction: Union[str, None] = 'no_correction', 
             correction_eps: float = 1e-3,
             compute_consensus: Callable = None,
+            workspace: Union[bool, cbx_workspace] = False,
+            compiled: bool = False,
+            cov_reuse_tol: float = 0.,
             **kwargs) -> None:
         
         super().__init__(f, **kwargs)
@@ -619,7 +1545,12 @@ class CBXDynamic(ParticleDynamic):
         self.init_batch_idx(batch_args)
         
         self.consensus = None #consensus point
-        self._compute_consensus = compute_consensus if compute_consensus is not None else compute_consensus_default()
+        self._compute_consensus = compute_consensus if compute_consensus is not None else compute_consensus_default(backend=self.backend)
+        self.init_workspace(workspace)
+        self.init_compiled(compiled)
+        self.cov_reuse_tol = cov_reuse_tol
+        self.Cov_cache = None # covariance and square root of the last decomposition, see update_covariance
+        self.Cov_sqrt_cache = None
         
     known_tracks = {
         'consensus': track_consensus,
@@ -627,6 +1558,35 @@ class CBXDynamic(ParticleDynamic):
         'drift': track_drift,
         **ParticleDynamic.known_tracks,}
     
+    timed_phases = {
+        **ParticleDynamic.timed_phases,
+        'compute_consensus': 'consensus',
+        'compute_consensus_inplace': 'consensus',
+        'noise': 'noise',
+        'fill_noise': 'noise',
+        'correction': 'correction',
+        'update_covariance': 'covariance',
+    }
+    
+    run_attributes = ParticleDynamic.run_attributes + ('alpha', 'sigma', 'lamda', 'consensus', 'drift', 's', 'Cov_sqrt', 'Cov_factor', 
+                                                     'Cov_cache', 'Cov_sqrt_cache', 'indices')
+    checkpoint_attributes = ParticleDynamic.checkpoint_attributes + ('t',)
+    
+    def get_checkpoint_state(self,) -> dict:
+        state = super().get_checkpoint_state()
+        if self.batched:
+            state['batch_rng_state'] = self.batch_rng.bit_generator.state
+        if self.workspace is not None:
+            state['workspace_rng_state'] = self.workspace.rng.bit_generator.state
+        return state
+    
+    def set_checkpoint_state(self, state: dict) -> None:
+        super().set_checkpoint_state(state)
+        if 'batch_rng_state' in state:
+            self.batch_rng.bit_generator.state = state['batch_rng_state']
+        if 'workspace_rng_state' in state:
+            self.workspace.rng.bit_generator.state = state['workspace_rng_state']
+    
     def init_alpha(self, alpha):
         '''
         Initialize alpha per batch. If alpha is a float it is broadcasted to an array similar to x with dimensions (x.shape[0], 1). 
@@ -645,6 +1605,80 @@ class CBXDynamic(ParticleDynamic):
         else:
             self.alpha = alpha
             
+    def init_workspace(self, workspace) -> None:
+        """
+        Initializes the workspace of preallocated scratch buffers.
+
+        Parameters:
+            workspace: bool or workspace
+                If ``True`` a new workspace is created, if ``False`` or ``None``, no workspace is used.
+
+        Returns:
+            None
+        """
+        if workspace not in [False, None] and self.backend.name != 'numpy':
+            raise NotImplementedError('The workspace mode is only implemented for the numpy backend!')
+        
+        if workspace is True:
+            self.workspace = cbx_workspace()
+        elif workspace is False or workspace is None:
+            self.workspace = None
+        else:
+            self.workspace = workspace
+            
+    def init_compiled(self, compiled: bool) -> None:
+        """
+        Enables the compiled kernels, if ``numba`` is available.
+
+        Parameters:
+            compiled: bool
+                Whether the compiled kernels should be used.
+
+        Returns:
+            None
+        """
+        if compiled:
+            from ..utils import kernels as cbx_kernels # imports numba, only if the compiled kernels are requested
+            if not cbx_kernels.NUMBA_AVAILABLE:
+                warnings.warn('numba is not available, the numpy implementation is used instead of the compiled kernels.', stacklevel=3)
+                compiled = False
+        self.compiled = compiled
+        
+    # parameters, that must be scalars for the compiled kernels
+    compiled_scalars = ('dt', 'sigma', 'lamda')
+        
+    def use_compiled(self,) -> bool:
+        """
+        Checks if the compiled kernels can be used in the current step. This is the case for the ``numpy`` backend, particles 
+        of shape (M, N, d), if all runs are active and no batching is used, without correction, with the isotropic or anisotropic 
+        noise and the default consensus computation, and if the parameters ``compiled_scalars`` are scalars.
+
+        Returns:
+            bool: Whether the compiled kernels can be used.
+        """
+        return (self.compiled and self.backend.name == 'numpy' and self.x.ndim == 3 and 
+                self.consensus_idx is Ellipsis and self.particle_idx is Ellipsis and 
+                isinstance(self.correction_callable, no_correction) and 
+                type(self.noise_callable) in (isotropic_noise, anisotropic_noise) and 
+                self.noise_callable.norm is np.linalg.norm and 
+                type(self._compute_consensus) is compute_consensus_default and 
+                all(np.ndim(getattr(self, name)) == 0 for name in self.compiled_scalars))
+    
+    def compute_consensus_compiled(self, energy) -> ArrayLike:
+        """
+        Computes the consensus of all particles with the compiled kernel :func:`cbx.utils.kernels.consensus`.
+
+        Parameters:
+            energy (np.ndarray): The energies of the particles, of shape (M, N).
+
+        Returns:
+            np.ndarray: The consensus, of shape (M, 1, d).
+        """
+        from ..utils import kernels as cbx_kernels
+        c = np.empty((self.M, 1) + self.x.shape[2:], dtype=self.x.dtype)
+        cbx_kernels.consensus(self.x, energy, np.ascontiguousarray(self.alpha[:, 0]), c[:, 0, :])
+        return c
+            
     def get_reshaped_run_idx(self,):
         return as_strided(self.active_runs_idx, shape=(self.num_active_runs, self.batch_size), strides=(self.active_runs_idx.strides[0],0))
         
@@ -692,13 +1726,28 @@ class CBXDynamic(ParticleDynamic):
             #self.M_idx = np.repeat(np.arange(self.M)[:,None], self.batch_size, axis=1)
             ind = np.repeat(np.arange(self.N)[None,:], self.M ,axis=0)
             self.batch_rng = Generator(MT19937(batch_seed))#np.random.default_rng(batch_seed)
-            self.indices = self.batch_rng.permuted(ind, axis=1)
+            self.indices = self.permute_batch_idx(ind)
             self.set_batch_idx = self.set_batch_idx_batched
             
         self.consensus_idx = Ellipsis
         self.particle_idx  = Ellipsis
             
                 
+    def permute_batch_idx(self, indices):
+        """
+        Permutes each row of the batch indices, either with the generator ``batch_rng`` or, if a seed is given, with 
+        the batching stream of the corresponding run.
+
+        Parameters:
+            indices (np.ndarray): The indices of shape (M, N).
+
+        Returns:
+            np.ndarray: The permuted indices.
+        """
+        if self.run_rng is not None:
+            return self.run_rng.permuted(self.run_ids, 'batch', indices)
+        return self.batch_rng.permuted(indices, axis=1)
+        
     def set_batch_idx_unbatched(self,):
         """
         Set the batch index for the particles.
@@ -714,6 +1763,9 @@ class CBXDynamic(ParticleDynamic):
 
         if self.num_active_runs == self.M:
             self.consensus_idx = Ellipsis
+        elif self.active_runs_idx[-1] - self.active_runs_idx[0] == self.num_active_runs - 1:
+            # contiguous active runs can be indexed by a slice, which yields views instead of copies
+            self.consensus_idx = (slice(self.active_runs_idx[0], self.active_runs_idx[-1] + 1), Ellipsis)
         else:
             self.consensus_idx = (self.active_runs_idx, Ellipsis)
             
@@ -742,7 +1794,7 @@ class CBXDynamic(ParticleDynamic):
         """
         if self.indices.shape[1] < self.batch_size: # if indices are exhausted
             indices = np.repeat(np.arange(self.N)[None,:], self.M ,axis=0)
-            indices = self.batch_rng.permuted(indices, axis=1)
+            indices = self.permute_batch_idx(indices)
 
             if self.batch_var == 'concat':
                 self.indices = np.concatenate((self.indices, indices), axis=1)
@@ -789,7 +1841,7 @@ class CBXDynamic(ParticleDynamic):
             None
         """
         if isinstance(correction, str):
-            self.correction_callable = get_correction(correction, eps=self.correction_eps)
+            self.correction_callable = get_correction(correction, eps=self.correction_eps, backend=self.backend)
         elif callable(correction):
             self.correction_callable = correction
         else:
@@ -821,6 +1873,7 @@ class CBXDynamic(ParticleDynamic):
                 - 'anisotropic': Set the anisotropic noise model.
                 - 'sampling': Set the sampling noise model.
                 - 'covariance': Set the covariance noise model.
+                - 'low_rank_covariance': Set the covariance noise model, that samples via the weighted drifts, without forming the covariance matrix.
                 - else: use the given input as a callable.
 
         Returns
@@ -829,7 +1882,7 @@ class CBXDynamic(ParticleDynamic):
         """
         # set noise model
         if isinstance(noise, str):
-            self.noise_callable = get_noise(noise)
+            self.noise_callable = get_noise(noise, norm=self.norm, sampler=self.normal)
         elif callable(noise):
             self.noise_callable = noise
         else:
@@ -848,8 +1901,32 @@ class CBXDynamic(ParticleDynamic):
         """
         return self.noise_callable(self)
     
+    def fill_noise(self, out: ArrayLike) -> ArrayLike:
+        """
+        Writes the noise vector into the array ``out``. If the noise model implements a ``fill`` method, it is used to 
+        sample directly into ``out``, using the scratch buffers of the workspace.
+
+        Parameters:
+            out (ndarray): The output array.
+
+        Returns:
+            ndarray: The array ``out``.
+        """
+        if hasattr(self.noise_callable, 'fill'):
+            return self.noise_callable.fill(self, out, self.workspace)
+        out[...] = self.noise_callable(self) # not self.noise, which would time the 'noise' phase twice
+        return out
+    
     def update_covariance(self,) -> None:
         r"""Update the covariance matrix :math:`\text{Cov}(x)` of the noise model
+        
+        The weighted covariance is assembled as the batched Gram product :math:`A^T A` of the weighted drifts 
+        :math:`A_n = \sqrt{w_n}\, (x_n - c(x))`, such that no array of shape (M, N, d, d) is formed. If ``cov_reuse_tol`` 
+        is positive, the square root is only recomputed for the runs, whose covariance changed by more than this relative 
+        tolerance since the last decomposition, see :meth:`compute_cov_sqrt`.
+        
+        For the noise model :class:`cbx.noise.low_rank_covariance_noise`, only the factor of the weighted drifts 
+        ``Cov_factor`` is computed, such that the :math:`d\times d` matrix and its square root are not formed.
     
         Parameters
 
@@ -859,16 +1936,52 @@ class CBXDynamic(ParticleDynamic):
         None.
     
         """                       
-        weights = - self.alpha * self.energy
-        coeffs = np.exp(weights - logsumexp_scp(weights, axis=(-1,), keepdims=True))
+        weights = - self.alpha[self.active_runs_idx, :] * self.energy[self.consensus_idx]
+        weights = self.backend.astype(weights, self.backend.float64)
+        coeffs = self.backend.exp(weights - self.backend.logsumexp(weights, axis=(-1,), keepdims=True))
+        coeffs = self.backend.astype(coeffs, self.drift.dtype)
+        A = self.backend.sqrt(coeffs)[..., None] * self.drift
+        
+        if getattr(self.noise_callable, 'low_rank', False): # Cov = A^T A with the weighted drifts A, see low_rank_covariance_noise
+            self.Cov_factor = A
+            return
       
-        D = self.drift[...,None] * self.drift[...,None,:]
-        D = np.sum(D * coeffs[..., None, None], axis = -3)
-        self.Cov_sqrt = compute_mat_sqrt(D)
+        Cov = self.backend.matrix_transpose(A) @ A
+        self.Cov_sqrt = self.compute_cov_sqrt(Cov)
+        
+    def compute_cov_sqrt(self, Cov) -> ArrayLike:
+        r"""
+        Computes the square root of the covariance matrices of the active runs. If ``cov_reuse_tol`` is positive, the 
+        covariance and the square root of each run are cached, and the eigendecomposition is only performed for the runs, 
+        where :math:`\|\text{Cov} - \text{Cov}_{cache}\|_F > \text{tol} \cdot \|\text{Cov}_{cache}\|_F`.
+
+        Parameters:
+            Cov (ndarray): The covariance matrices of the active runs, of shape (num_active_runs, d, d).
+
+        Returns:
+            ndarray: The square roots of the covariance matrices.
+        """
+        if self.cov_reuse_tol <= 0.:
+            return compute_mat_sqrt(Cov, backend=self.backend)
+        
+        if self.Cov_cache is None or self.Cov_cache.shape[1:] != Cov.shape[1:]:
+            self.Cov_cache = self.backend.zeros((self.M,) + Cov.shape[1:], like=Cov)
+            self.Cov_sqrt_cache = self.backend.zeros((self.M,) + Cov.shape[1:], like=Cov)
+            stale = self.backend.ones((Cov.shape[0],), like=Cov) > 0
+        else:
+            cached = self.Cov_cache[self.active_runs_idx, ...]
+            diff = self.backend.sqrt(self.backend.sum((Cov - cached)**2, axis=(-2, -1)))
+            stale = diff > self.cov_reuse_tol * self.backend.sqrt(self.backend.sum(cached**2, axis=(-2, -1)))
+        
+        if stale.any():
+            runs = self.active_runs_idx[self.backend.to_numpy(stale)]
+            self.Cov_cache[runs, ...] = Cov[stale, ...]
+            self.Cov_sqrt_cache[runs, ...] = compute_mat_sqrt(Cov[stale, ...], backend=self.backend)
+        return self.Cov_sqrt_cache[self.active_runs_idx, ...]
                     
     def pre_step(self,):
         # save old positions
-        self.x_old = self.copy(self.x)
+        self.swap_buffers('x')
         
         # set new batch indices
         self.set_batch_idx()
@@ -876,10 +1989,16 @@ class CBXDynamic(ParticleDynamic):
     def inner_step(self,):
         pass
         
+    def compute_update_diff(self,) -> None:
+        if self.workspace is None or not hasattr(self, 'x_old') or self.x.ndim != 3:
+            super().compute_update_diff()
+        else:
+            diff = self.workspace.get('update_diff', self.x.shape, self.x.dtype)
+            np.subtract(self.x, self.x_old, out=diff)
+            self.update_diff = np.sqrt(np.einsum('mnd,mnd->m', diff, diff))/self.N
+    
     def post_step(self):
-        if hasattr(self, 'x_old'):
-            self.update_diff = self.norm(self.x - self.x_old, axis=(-2,-1))/self.N
-        
+        self.compute_update_diff()
         self.update_best_cur_particle()
         self.update_best_particle()
         self.post_process(self)
@@ -893,10 +2012,6 @@ class CBXDynamic(ParticleDynamic):
         self.init_history()
         self.t = 0.
 
-    def eval_f(self, x):
-        self.num_f_eval[self.active_runs_idx] += x.shape[1] # update number of function evaluations
-        return self.f(x)
-    
     def print_cur_state(self,):
         if self.verbosity > 0:
             print('Time: ' + "{:.3f}".format(self.t) + ', best current energy: ' + str(self.f_min))
@@ -919,8 +2034,33 @@ class CBXDynamic(ParticleDynamic):
         """
         # evaluation of objective function on batch
         
+        if hasattr(self._compute_consensus, 'evaluate'): # chunked evaluation, see compute_consensus_chunked
+            return self._compute_consensus.evaluate(self)
         energy = self.eval_f(self.x[self.consensus_idx]) # update energy
         return self._compute_consensus(energy, self.x[self.consensus_idx], self.alpha[self.active_runs_idx, :])
+    
+    def compute_consensus_inplace(self,):
+        r"""Updates the weighted mean of the particles, using the scratch buffers of the workspace.
+
+        If the consensus callable does not support the workspace mode, i.e., it does not implement an ``inplace`` function, 
+        this falls back to :meth:`compute_consensus`.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        consensus, energy
+
+        """
+        if not hasattr(self._compute_consensus, 'inplace'):
+            return self.compute_consensus()
+        
+        x = self.x[self.consensus_idx]
+        energy = self.eval_f(x)
+        out = self.workspace.get('consensus', (x.shape[0], 1) + x.shape[2:], x.dtype)
+        return self._compute_consensus.inplace(energy, x, self.alpha[self.active_runs_idx, :], out, self.workspace)
         
         
     
\ No newline at end of file
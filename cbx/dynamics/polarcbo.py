@@ -1,9 +1,10 @@
 import numpy as np
 from typing import Callable
 from numpy.typing import ArrayLike
-from scipy.special import logsumexp
+from functools import partial
 
 from .cbo import CBO
+from ..utils.backend import numpy_backend
 
 #%% Kernel for PolarCBO
 class kernel:
@@ -11,10 +12,17 @@ class kernel:
     
     This class implements kernels for PolarCBO. Every sub-class must implement the ``neg_log`` function
     which is required for the PolarCBO algorithm.
+
+    Arguments:
+        kappa (float, optional): The communication radius of the kernel. Default: 1.0.
+        backend (optional): The array backend. Default: numpy.
     """
+    # whether neg_log can be evaluated on blocks of particles, i.e., it only depends on the pairs x, y
+    blockwise = True
 
-    def __init__(self, kappa=1.):
+    def __init__(self, kappa=1., backend=None):
         self.kappa = kappa
+        self.backend = backend if backend is not None else numpy_backend()
 
     def __call__(self, x: ArrayLike, y: ArrayLike):
         """Evaluates the kernel
@@ -55,8 +63,8 @@ class Gaussian_kernel(kernel):
         kappa (float, optional): The communication radius of the kernel. 
             Using kappa=np.inf yields a constant kernel. Default: 1.0.
     """
-    def __init__(self, kappa = 1.0):
-        super().__init__(kappa=kappa)
+    def __init__(self, kappa = 1.0, backend = None):
+        super().__init__(kappa=kappa, backend=backend)
     
     def __call__(self, x: ArrayLike, y: ArrayLike):
         r"""Evaluates the Gaussian Kernel
@@ -76,7 +84,7 @@ class Gaussian_kernel(kernel):
         """
         dists = ((x-y)**2).sum(tuple(i for i in range(3, x.ndim)))
         with np.errstate(divide='ignore', invalid='ignore'):
-            return np.exp(-np.true_divide(1, 2*self.kappa**2) * dists)
+            return self.backend.exp(-np.true_divide(1, 2*self.kappa**2) * dists)
     
     def neg_log(self, x, y):        
         return np.true_divide(1, 2*self.kappa**2) * ((x-y)**2).sum(tuple(i for i in range(3, x.ndim)))
@@ -87,67 +95,164 @@ class Laplace_kernel(kernel):
     This class implements a Laplace kernel, that can be used for PolarCBO.
     
     """
-    def __init__(self, kappa = 1.0):
-        super().__init__(kappa=kappa)
+    def __init__(self, kappa = 1.0, backend = None):
+        super().__init__(kappa=kappa, backend=backend)
     
     def __call__(self, x,y):
-        dists = np.linalg.norm(x-y, axis=-1)
+        dists = self.backend.norm(x-y, axis=-1)
         with np.errstate(divide='ignore', invalid='ignore'):
-            return np.exp(-np.true_divide(1, self.kappa) * dists)
+            return self.backend.exp(-np.true_divide(1, self.kappa) * dists)
     
     def neg_log(self, x,y):
-        dists = np.linalg.norm(x-y, axis=-1,ord=2)
+        dists = self.backend.norm(x-y, axis=-1)
         with np.errstate(divide='ignore', invalid='ignore'):
             return np.true_divide(1, self.kappa) * dists
         
 class Constant_kernel(kernel):
-    def __init__(self, kappa = 1.0):
-        super().__init__(kappa=kappa)
+    def __init__(self, kappa = 1.0, backend = None):
+        super().__init__(kappa=kappa, backend=backend)
     
     def __call__(self, x,y):
-        dists = np.linalg.norm(x-y, axis=-1)
+        dists = self.backend.norm(x-y, axis=-1)
         dists = dists / self.kappa
         with np.errstate(divide='ignore', invalid='ignore'):
-            return np.exp(-dists**np.inf)
+            return self.backend.exp(-dists**np.inf)
     
     def neg_log(self, x,y):
-        dists = np.linalg.norm(x-y, axis=-1)
+        dists = self.backend.norm(x-y, axis=-1)
         dists = dists / self.kappa
         with np.errstate(divide='ignore', invalid='ignore'):
             return dists**np.inf
     
 class InverseQuadratic_kernel(kernel):
-    def __init__(self, kappa = 1.0):
-        super().__init__(kappa=kappa)
+    def __init__(self, kappa = 1.0, backend = None):
+        super().__init__(kappa=kappa, backend=backend)
     
     def __call__(self, x,y):
-        dists = np.true_divide(1, self.kappa) * np.linalg.norm(x-y, axis=-1,ord=2)
+        dists = np.true_divide(1, self.kappa) * self.backend.norm(x-y, axis=-1)
         return 1/(1+dists**2)
     
     def neg_log(self, x,y):
-        dists = np.true_divide(1, self.kappa) * np.linalg.norm(x-y, axis=-1,ord=2)
-        return -np.log(1/(1+dists**2))
+        dists = np.true_divide(1, self.kappa) * self.backend.norm(x-y, axis=-1)
+        return -self.backend.log(1/(1+dists**2))
     
 class Taz_kernel(kernel):
-    def __init__(self, kappa = 1.0):
-        super().__init__(kappa=kappa)
+    blockwise = False # normalized by the maximal distance of all pairs
+    
+    def __init__(self, kappa = 1.0, backend = None):
+        super().__init__(kappa=kappa, backend=backend)
 
     def __call__(self, x,y):
-        return np.exp(-self.neg_log(x,y))
+        return self.backend.exp(-self.neg_log(x,y))
     
     def neg_log(self, x,y):
-        dists = np.linalg.norm(x-y, axis=-1,ord=2)
-        dists =  np.true_divide(1, self.kappa) *  dists/np.max(dists)
+        dists = self.backend.norm(x-y, axis=-1)
+        dists =  np.true_divide(1, self.kappa) *  dists/self.backend.max(dists)
         return  dists**2
 
 #%% PolarCBO
-def compute_polar_consensus(energy, x, neg_log_eval, alpha = 1., kernel_factor = 1.):
-    weights = -kernel_factor * neg_log_eval - alpha * energy[:,None,:]
-    coeffs = np.exp(weights - logsumexp(weights, axis=-1, keepdims=True))
+def compute_polar_consensus(energy, x, neg_log_eval, alpha = 1., kernel_factor = 1., backend = None):
+    backend = backend if backend is not None else numpy_backend()
+    weights = backend.astype(-kernel_factor * neg_log_eval - alpha * energy[:,None,:], backend.float64)
+    coeffs = backend.exp(weights - backend.logsumexp(weights, axis=-1, keepdims=True))
+    coeffs = backend.astype(coeffs, x.dtype)
     coeff_expan = tuple([Ellipsis] + [None for i in range(x.ndim-2)])
-    c = np.sum(x[:,None,...] * coeffs[coeff_expan], axis=2)
+    c = backend.sum(x[:,None,...] * coeffs[coeff_expan], axis=2)
     return c, energy
 
+class compute_polar_consensus_blocked:
+    r"""
+    Polar consensus computation with bounded memory, for ensembles with a large number of particles.
+
+    The dense computation :func:`compute_polar_consensus` forms the kernel between all pairs of particles, i.e., arrays of 
+    shape (M, N, N, ...). Here, the target particles :math:`x_i` are processed in tiles, and for each tile of targets, 
+    the source particles :math:`x_j` are processed in tiles as well. The consensus :math:`c(x_i)` is accumulated with an 
+    online ``logsumexp`` over the source tiles, i.e., with the running maximum :math:`m_i` of the log-weights 
+    :math:`w_{ij} = -\kappa_f \log k(x_j, x_i) - \alpha f(x_j)`, the normalizer :math:`s_i = \sum_j \exp(w_{ij} - m_i)` and 
+    the weighted sum :math:`v_i = \sum_j \exp(w_{ij} - m_i) x_j`, which is computed as a matrix product. The first source 
+    tile of each target tile is the tile itself, such that the maximum is finite, even if the kernel vanishes, e.g., for 
+    the constant kernel. Therefore, the temporary arrays are of shape (M, tile, tile, ...) and the result equals the one 
+    of :func:`compute_polar_consensus` up to rounding.
+
+    Kernels, whose ``neg_log`` does not only depend on the pairs of particles, i.e., with ``blockwise = False``, e.g., 
+    :class:`Taz_kernel`, are evaluated in a single tile.
+
+    The class is used as the ``compute_consensus`` argument of :class:`PolarCBO`, e.g., 
+    ``PolarCBO(f, compute_consensus=compute_polar_consensus_blocked(tile_size=256))``.
+
+    Parameters:
+        tile_size (int, optional): The number of particles per tile. Default: None.
+        memory_budget (int, optional): If ``tile_size`` is None, the tile size is chosen such that the temporary arrays 
+            of one pair of tiles take about ``memory_budget`` bytes. Default: None, i.e., ``2**27`` bytes.
+        backend (backend, optional): The array backend. Default: numpy.
+    """
+    def __init__(self, tile_size: int = None, memory_budget: int = None, backend = None):
+        self.tile_size = tile_size
+        self.memory_budget = memory_budget if memory_budget is not None else 2**27
+        self.backend = backend if backend is not None else numpy_backend()
+        
+    def get_tile_size(self, x_shape: tuple, itemsize: int) -> int:
+        """Returns the number of particles per tile, for particles of shape (M, N, ...)."""
+        if self.tile_size is not None:
+            return self.tile_size
+        # per pair of particles: the differences in the kernel and their squares, the log-weights and the weights
+        nbytes = x_shape[0] * (2 * int(np.prod(x_shape[2:])) * itemsize + 3 * 8)
+        return max(1, int(np.sqrt(self.memory_budget // nbytes)))
+    
+    def __call__(self, energy, x, kernel, alpha = 1., kernel_factor = 1.):
+        """
+        Computes the polar consensus of all particles.
+
+        Parameters:
+            energy: The energies of the particles, of shape (M, N).
+            x: The particles, of shape (M, N, ...).
+            kernel: The kernel, implementing ``neg_log``.
+            alpha: The alpha parameter, of shape (M, 1, 1). Default: 1.
+            kernel_factor: The factor of the kernel, of shape (M, 1, 1). Default: 1.
+
+        Returns:
+            consensus, energy
+        """
+        b = self.backend
+        M, N = x.shape[:2]
+        tile = self.get_tile_size(x.shape, x.dtype.itemsize) if getattr(kernel, 'blockwise', True) else N
+        x_flat = x.reshape((M, N, -1))
+        c = b.zeros(x_flat.shape, like=x)
+        for i0 in range(0, N, tile):
+            targets = x[:, i0:i0 + tile, None, ...]
+            m = s = v = None
+            for j0 in [i0] + [j0 for j0 in range(0, N, tile) if j0 != i0]: # start with the tile of the targets
+                w = - kernel_factor * kernel.neg_log(x[:, None, j0:j0 + tile, ...], targets) - alpha * energy[:, None, j0:j0 + tile]
+                w = b.astype(w, b.float64)
+                m_new = b.max(w, axis=-1)[..., None]
+                if m is not None:
+                    m_new = b.clip(m_new, m, None) # the running maximum
+                e = b.exp(w - m_new)
+                v_new = b.astype(e, x.dtype) @ x_flat[:, j0:j0 + tile, :]
+                s_new = b.sum(e, axis=-1, keepdims=True)
+                if m is not None:
+                    scale = b.exp(m - m_new)
+                    s_new = s_new + scale * s
+                    v_new = v_new + b.astype(scale, x.dtype) * v
+                m, s, v = m_new, s_new, v_new
+            c[:, i0:i0 + tile, :] = v / b.astype(s, x.dtype)
+        return c.reshape(x.shape), energy
+    
+    def evaluate(self, dyn):
+        """
+        Evaluates the objective on the particles ``dyn.x[dyn.consensus_idx]`` and computes the polar consensus with the 
+        kernel of the dynamic.
+
+        Parameters:
+            dyn: The dynamic, i.e., an instance of :class:`PolarCBO`.
+
+        Returns:
+            consensus, energy
+        """
+        x = dyn.x[dyn.consensus_idx]
+        energy = dyn.eval_f(x)
+        return self(energy, x, dyn.kernel, alpha=dyn.alpha[dyn.active_runs_idx, :, None], kernel_factor=dyn.kernel_factor())
+
 
 class PolarCBO(CBO):
     r"""PolarCBO
@@ -174,6 +279,10 @@ class PolarCBO(CBO):
         Decides how to scale the kernel, additionally to the factor :math:`\kappa`.
         - 'alpha': the kernel is addittionally multiplied by :math:`\kappa`. Default.
         - 'const': the kernel is not scaled addtionally.
+    compute_consensus : Callable, optional
+        The computation of the consensus from the energies, the particles and the negative logarithm of the kernel. For 
+        large numbers of particles, :class:`compute_polar_consensus_blocked` computes the consensus in tiles with bounded 
+        memory. Default: :func:`compute_polar_consensus`.
     
     References
     ----------
@@ -188,7 +297,9 @@ class PolarCBO(CBO):
                  kernel_factor_mode: str = 'alpha',
                  compute_consensus: Callable = None,
                  **kwargs) -> None:
-        super().__init__(f, compute_consensus = compute_consensus if compute_consensus is not None else compute_polar_consensus, **kwargs)
+        super().__init__(f, compute_consensus = compute_consensus, **kwargs)
+        if compute_consensus is None:
+            self._compute_consensus = partial(compute_polar_consensus, backend=self.backend)
         
         self.kappa = kappa
         self.set_kernel(kernel)
@@ -220,7 +331,7 @@ class PolarCBO(CBO):
         """
         if isinstance(kernel,str):
             if kernel in self.kernel_dict:
-                self.kernel = self.kernel_dict[kernel](kappa=self.kappa)
+                self.kernel = self.kernel_dict[kernel](kappa=self.kappa, backend=self.backend)
             else: 
                 raise ValueError('Unknown kernel name: ' + 
                                  kernel + '. Choose from: ' + str(self.kernel_dict.keys()))
@@ -236,6 +347,8 @@ class PolarCBO(CBO):
             raise NotImplementedError('Unknown mode: ' + self.kernel_factor_mode)
         
     def compute_consensus(self,):
+        if hasattr(self._compute_consensus, 'evaluate'): # blocked computation, see compute_polar_consensus_blocked
+            return self._compute_consensus.evaluate(self)
         x = self.x[self.consensus_idx]
         energy = self.eval_f(x)
         neg_log_eval = self.kernel.neg_log(x[:,None,...], x[:,:,None,...])
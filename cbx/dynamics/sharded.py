@@ -0,0 +1,203 @@
+import numpy as np
+import os
+import queue
+import traceback
+import multiprocessing as mp
+from numpy.random import SeedSequence
+from typing import Callable, Union
+
+from .pdyn import CBXDynamic, post_process_default
+from .cbo_memory import CBOMemory
+from .pso import PSO
+from ..utils.rng import run_generators
+from ..utils.backend import get_backend
+from ..utils.sharding import queue_communicator, compute_consensus_sharded, sync_best_particle, sync_termination
+
+# the implementations of ``compute_consensus``, that evaluate the ``compute_consensus`` argument of the dynamic as the 
+# weighted mean of the particles, which is replaced by the sharded computation
+_weighted_mean_consensus = (CBXDynamic.compute_consensus, CBOMemory.compute_consensus, PSO.compute_consensus)
+
+def _optimize_shard(dynamic, f, comm, seed, kwargs, opt_kwargs, result_queue) -> None:
+    """Performs the dynamic on the particles of one shard and sends the results to the main process."""
+    try:
+        kwargs = dict(kwargs)
+        kwargs['post_process'] = sync_best_particle(comm, kwargs.get('post_process', None) or post_process_default())
+        backend = get_backend(kwargs.get('backend', None), kwargs.get('x', None), dtype=kwargs.get('dtype', None))
+        kwargs['compute_consensus'] = compute_consensus_sharded(comm, backend=backend)
+        dyn = dynamic(f, seed=seed, **kwargs)
+        dyn.term_criteria = sync_termination(comm, dyn.term_criteria).criteria()
+        dyn.optimize(**opt_kwargs)
+        to_numpy = dyn.backend.to_numpy
+        res = {'x': np.asarray(to_numpy(dyn.x)),
+               'energy': np.asarray(to_numpy(dyn.energy)),
+               'best_particle': np.asarray(to_numpy(dyn.best_particle)),
+               'best_energy': np.asarray(to_numpy(dyn.best_energy)),
+               'num_f_eval': np.asarray(to_numpy(dyn.num_f_eval)),
+               'term_reason': dyn.term_reason,
+               'it': dyn.it,
+               'history': {key: [to_numpy(h) if hasattr(h, 'shape') else h for h in entries]
+                           for key, entries in dyn.history.items()}}
+        result_queue.put((comm.rank, res, None))
+    except Exception:
+        comm.abort()
+        result_queue.put((comm.rank, None, traceback.format_exc()))
+
+class ShardedDynamic:
+    r"""Distributes the particles of a dynamic over a group of processes
+
+    For very large numbers of particles :math:`N`, this class splits the particles of every run into ``num_shards``
+    contiguous slices, where each slice is owned by a separate dynamic in a worker process. In every step, the shards
+    exchange only the triples of the maximal weight, the normalizer and the weighted sum of their particles, from which
+    each shard computes the exact global consensus, see :mod:`cbx.utils.sharding`. Moreover, the best particles and the
+    flags of the termination criteria are synchronized after every step, such that all shards terminate every run at the
+    same iteration. Therefore, the memory and the evaluations of the objective per worker scale with
+    :math:`N/\text{num\_shards}`.
+
+    The termination criteria are evaluated on each shard, and a run terminates as soon as a criterion is met on any shard.
+    E.g., :class:`cbx.utils.termination.max_eval_term` counts the evaluations of one shard, hence the budget of the shard
+    with the most particles applies, and :class:`cbx.utils.termination.max_time_term` stops all shards, once the time
+    of the first one is up. The scheduler must not depend on the particles of the shard, e.g., the default scheduler
+    :class:`cbx.scheduler.multiply`. Each shard draws its random numbers from its own streams, derived from ``seed``.
+
+    After :meth:`optimize`, the attributes ``x`` and ``energy`` contain all particles, ``best_particle``, ``best_energy``
+    and ``term_reason`` are the global ones and ``num_f_eval`` is the sum over all shards. Entries of the history, whose
+    second axis indexes the particles, e.g., ``'x'`` and ``'energy'``, are concatenated along this axis, all other entries
+    are the ones of the first shard.
+
+    Parameters
+    ----------
+    dynamic : type
+        A consensus based dynamic, whose consensus is the weighted mean computed by the ``compute_consensus`` argument, 
+        i.e., :class:`CBO`, :class:`CBOMemory` or :class:`PSO`. Dynamics, that override ``compute_consensus``, e.g., 
+        :class:`PolarCBO`, are rejected.
+    f : Callable
+        The objective function. It must be picklable, if the start method is not ``'fork'``.
+    num_shards : int, optional
+        The number of shards, each performed by one process. The default is the number of CPUs.
+    seed : int or SeedSequence, optional
+        The root seed of the random number streams. The default is None, i.e., fresh entropy is used.
+    start_method : str, optional
+        The start method of the processes, see :mod:`multiprocessing`. The default is the default of the platform.
+    timeout : float, optional
+        The maximal time in seconds, that a shard waits for the others in one exchange. The default is None, i.e., no limit.
+    **kwargs
+        The keyword arguments of the dynamic. Either ``x`` of shape (M, N, ...), which is split along the second axis, or
+        ``M``, ``N`` and ``d`` must be given. As for the dynamic, ``x`` of shape (N, d) or (d,) are the particles of a 
+        single run.
+
+    Examples
+    --------
+    >>> from cbx.dynamics import CBO, ShardedDynamic
+    >>> dyn = ShardedDynamic(CBO, f, num_shards=8, M=2, N=10**6, d=20, max_it=100)
+    >>> dyn.optimize()
+    """
+    def __init__(self,
+                 dynamic: type,
+                 f: Callable,
+                 num_shards: Union[int, None] = None,
+                 seed = None,
+                 start_method: Union[str, None] = None,
+                 timeout: Union[float, None] = None,
+                 **kwargs):
+        if getattr(dynamic, 'compute_consensus', None) not in _weighted_mean_consensus:
+            raise ValueError('The dynamic ' + getattr(dynamic, '__name__', str(dynamic)) + ' overrides compute_consensus, ' + 
+                             'only dynamics with the weighted mean as consensus can be sharded!')
+        self.dynamic = dynamic
+        self.f = f
+        x = kwargs.get('x', None)
+        if x is not None and x.ndim < 3: # the particles of a single run
+            x = x[None, ...] if x.ndim == 2 else x[None, None, ...]
+            kwargs['x'] = x
+        self.M = x.shape[0] if x is not None else kwargs.get('M', 1)
+        self.N = x.shape[1] if x is not None else kwargs.get('N', 20)
+        self.num_shards = num_shards if num_shards is not None else (os.cpu_count() or 1)
+        if not 0 < self.num_shards <= self.N:
+            raise ValueError('The number of shards must be between 1 and the number of particles N=' + str(self.N) + '!')
+        self.shards = np.array_split(np.arange(self.N), self.num_shards)
+        self.seed = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+        self.start_method = start_method
+        self.timeout = timeout
+        self.kwargs = kwargs
+
+    def shard_kwargs(self, k: int) -> dict:
+        """Returns the keyword arguments of the dynamic of the k-th shard."""
+        kwargs = dict(self.kwargs)
+        idx = self.shards[k]
+        if kwargs.get('x', None) is not None:
+            kwargs['x'] = kwargs['x'][:, idx[0]:idx[-1] + 1, ...]
+        else:
+            kwargs['N'] = len(idx)
+        return kwargs
+
+    def shard_seed(self, k: int) -> run_generators:
+        """Returns the random number streams of the runs of the k-th shard."""
+        return run_generators(SeedSequence(self.seed.entropy, spawn_key=self.seed.spawn_key + (k,)), self.M)
+
+    def optimize(self, **opt_kwargs) -> np.ndarray:
+        """
+        Performs the sharded dynamic and gathers the results.
+
+        Parameters:
+            **opt_kwargs: The keyword arguments of :meth:`ParticleDynamic.optimize`.
+
+        Returns:
+            np.ndarray: The best particles of all runs.
+        """
+        ctx = mp.get_context(self.start_method)
+        queues = [ctx.Queue() for _ in range(self.num_shards)]
+        result_queue = ctx.Queue()
+        procs = [ctx.Process(target=_optimize_shard,
+                             args=(self.dynamic, self.f, queue_communicator(k, queues, timeout=self.timeout),
+                                   self.shard_seed(k), self.shard_kwargs(k), opt_kwargs, result_queue), daemon=True)
+                 for k in range(self.num_shards)]
+        for p in procs:
+            p.start()
+        results = [None] * self.num_shards
+        errors = []
+        missing = set(range(self.num_shards))
+        while missing:
+            try:
+                k, res, err = result_queue.get(timeout=0.1)
+            except queue.Empty: # check if a shard died without sending its result, e.g., because of a crash
+                dead = [k for k in missing if not procs[k].is_alive() and procs[k].exitcode != 0]
+                if dead:
+                    for p in procs:
+                        p.terminate()
+                    raise RuntimeError('The processes of the shards ' + str(dead) + ' died!') from None
+                continue
+            results[k] = res
+            missing.remove(k)
+            if err is not None:
+                errors.append('Shard ' + str(k) + ' failed:\n' + err)
+        for p in procs:
+            p.join()
+        if errors:
+            raise RuntimeError('\n'.join(errors))
+        self.gather(results)
+        return self.best_particle
+
+    def gather(self, results: list) -> None:
+        """
+        Gathers the results of the shards.
+
+        Parameters:
+            results (list): The results of the shards, as returned by the workers.
+
+        Returns:
+            None
+        """
+        self.x = np.concatenate([r['x'] for r in results], axis=1)
+        self.energy = np.concatenate([r['energy'] for r in results], axis=1)
+        self.num_f_eval = sum(r['num_f_eval'] for r in results)
+        for name in ['best_particle', 'best_energy', 'term_reason', 'it']:
+            setattr(self, name, results[0][name])
+
+        self.history = {}
+        for key in results[0]['history']:
+            entries = [r['history'][key] for r in results]
+            sharded = all(len(e) > 0 and all(getattr(h, 'ndim', 0) > 1 and h.shape[1] == len(self.shards[k]) for h in e)
+                          for k, e in enumerate(entries))
+            if sharded and any(len(idx) > 1 for idx in self.shards):
+                self.history[key] = [np.concatenate([e[i] for e in entries], axis=1) for i in range(len(entries[0]))]
+            else:
+                self.history[key] = entries[0]
@@ -6,13 +6,15 @@ from numpy.typing import ArrayLike
 from numpy.random import normal
 import numpy as np
 
-def get_noise(name):
+def get_noise(name, **kwargs):
     if name == 'isotropic':
-        return isotropic_noise()
+        return isotropic_noise(**kwargs)
     elif name == 'anisotropic':
-        return anisotropic_noise()
+        return anisotropic_noise(**kwargs)
     elif name == 'covariance' or name == 'sampling':
-        return covariance_noise()
+        return covariance_noise(**kwargs)
+    elif name == 'low_rank_covariance':
+        return low_rank_covariance_noise(**kwargs)
     else:
         raise NotImplementedError('Noise model {} not implemented'.format(name))
 
@@ -46,6 +48,40 @@ class noise:
         This function performs the sampling of the noise vector. Each specific noise model must implement this function.
         """
         raise NotImplementedError('Base class does not implement sample')
+    
+    def fill(self, dyn, out, ws):
+        """
+        This function writes the noise vector for a given dynamic object into the array ``out``. It is used in the workspace mode 
+        of the dynamics. Noise models can overwrite this function to avoid allocations, by using the scratch buffers of the workspace ``ws``.
+        By default, the noise vector is computed with :meth:`__call__` and copied to ``out``.
+
+        Parameters
+        ----------
+        dyn
+            The dynamic object
+        out
+            The array, the noise vector is written to
+        ws
+            The workspace of the dynamic
+
+        Returns
+        -------
+        ArrayLike
+            The array ``out``
+        """
+        out[...] = self(dyn)
+        return out
+    
+    def uses_default_sampling(self,) -> bool:
+        """Checks if the default sampler and norm are used, such that the noise can be sampled with the workspace generator, 
+        or if the sampler can write into an output array, see :class:`cbx.utils.rng.normal_buffer`."""
+        return (self.sampler is normal or hasattr(self.sampler, 'fill')) and self.norm is np.linalg.norm
+    
+    def fill_standard_normal(self, out, ws):
+        """Writes standard normal numbers into ``out``, either with the ``fill`` method of the sampler or with the workspace generator."""
+        if hasattr(self.sampler, 'fill'):
+            return self.sampler.fill(out)
+        return ws.rng.standard_normal(out=out)
 
 class isotropic_noise(noise):
     r"""
@@ -75,7 +111,7 @@ class isotropic_noise(noise):
          super().__init__(norm = norm, sampler = sampler)
 
     def __call__(self, dyn) -> ArrayLike:
-        return np.sqrt(dyn.dt) * self.sample(dyn.drift)
+        return dyn.dt**0.5 * self.sample(dyn.drift)
 
     def sample(self, drift) -> ArrayLike:
         r'''
@@ -102,6 +138,18 @@ class isotropic_noise(noise):
         z = self.sampler(0, 1, size=(drift.shape))
         return z * self.norm(drift, axis=-1, keepdims=True)
     
+    def fill(self, dyn, out, ws) -> ArrayLike:
+        if not self.uses_default_sampling():
+            return super().fill(dyn, out, ws)
+        
+        self.fill_standard_normal(out, ws)
+        nrm = ws.get('noise_norm', out.shape[:-1], out.dtype)
+        np.einsum('...i,...i->...', dyn.drift, dyn.drift, out=nrm)
+        np.sqrt(nrm, out=nrm)
+        nrm *= np.sqrt(dyn.dt)
+        out *= nrm[..., None]
+        return out
+    
 
 
 class anisotropic_noise(noise):
@@ -130,7 +178,7 @@ class anisotropic_noise(noise):
             super().__init__(norm = norm, sampler = sampler)
 
         def __call__(self, dyn) -> ArrayLike:
-            return np.sqrt(dyn.dt) * self.sample(dyn.drift)
+            return dyn.dt**0.5 * self.sample(dyn.drift)
 
         def sample(self, drift: ArrayLike) -> ArrayLike:
             r"""
@@ -155,6 +203,15 @@ class anisotropic_noise(noise):
 
             return self.sampler(0, 1, size=drift.shape) * drift
         
+        def fill(self, dyn, out, ws) -> ArrayLike:
+            if not self.uses_default_sampling():
+                return super().fill(dyn, out, ws)
+            
+            self.fill_standard_normal(out, ws)
+            out *= dyn.drift
+            out *= np.sqrt(dyn.dt)
+            return out
+        
 class covariance_noise(noise):
         r"""
 
@@ -167,6 +224,7 @@ class covariance_noise(noise):
 
         Here, :math:`\xi` is a random vector of size :math:`(d)` distributed according to :math:`\mathcal{N}(0,1)`.
         """
+        low_rank = False
         
         def __init__(self, 
                      norm: Callable = None,
@@ -174,7 +232,11 @@ class covariance_noise(noise):
             super().__init__(norm = norm, sampler = sampler)
 
         def __call__(self, dyn) -> ArrayLike:
-             factor = np.sqrt((1/dyn.lamda) * (1 - np.exp(-dyn.dt)**2))[(...,) + (None,) * (dyn.x.ndim - 2)]
+             lamda = dyn.lamda
+             if getattr(lamda, 'ndim', 0) > 0 and lamda.shape[0] == dyn.M: # lamda per run, select the active runs
+                 lamda = lamda[dyn.active_runs_idx, ...]
+             factor = dyn.backend.asarray(((1/lamda) * (1 - np.exp(-dyn.dt)**2))**0.5, like=dyn.drift)
+             factor = factor[(...,) + (None,) * (dyn.x.ndim - 2)]
              return factor * self.sample(dyn.drift, dyn.Cov_sqrt)
         
         def sample(self, drift:ArrayLike, Cov_sqrt:ArrayLike) -> ArrayLike:
@@ -215,4 +277,69 @@ class covariance_noise(noise):
             Returns:
                 ArrayLike: The output of the matrix-vector product.
             """
-            return (Cov_sqrt@z.transpose(0,2,1)).transpose(0,2,1)
\ No newline at end of file
+            return (Cov_sqrt@z.swapaxes(-1,-2)).swapaxes(-1,-2)
+        
+class low_rank_covariance_noise(covariance_noise):
+        r"""
+
+        This class implements the covariance noise model without forming the covariance matrix. The weighted covariance of 
+        the ensemble factorizes as :math:`\text{Cov}(x) = A^T A`, where the rows of :math:`A\in\mathbb{R}^{N\times d}` are 
+        the weighted drifts :math:`A_n = \sqrt{w_n}\, (x_n - c(x))` of a run, with the normalized weights :math:`w_n`. 
+        Therefore, the noise vector is computed as
+
+        .. math::
+
+            n_{m,n} = \sqrt{(1/\lambda)\cdot (1-\exp(-dt))^2} \cdot A^T\xi,
+
+        where :math:`\xi` is a random vector of size :math:`(N)` distributed according to :math:`\mathcal{N}(0,1)`. Since 
+        :math:`A^T\xi` is normally distributed with the covariance :math:`A^T A = \text{Cov}(x)`, the noise has the same 
+        distribution as the one of :class:`covariance_noise`. However, each sample only costs :math:`\mathcal{O}(N\cdot d)` 
+        operations, instead of the :math:`\mathcal{O}(d^3)` operations of the matrix square root, and the 
+        :math:`d\times d` matrix is never formed. This is beneficial, if the dimension :math:`d` is larger than the number 
+        of particles :math:`N`.
+
+        The factor :math:`A` is computed by :meth:`cbx.dynamics.CBXDynamic.update_covariance` and stored in the attribute 
+        ``Cov_factor`` of the dynamic.
+        """
+        low_rank = True
+
+        def __call__(self, dyn) -> ArrayLike:
+             lamda = dyn.lamda
+             if getattr(lamda, 'ndim', 0) > 0 and lamda.shape[0] == dyn.M: # lamda per run, select the active runs
+                 lamda = lamda[dyn.active_runs_idx, ...]
+             factor = dyn.backend.asarray(((1/lamda) * (1 - np.exp(-dyn.dt)**2))**0.5, like=dyn.drift)
+             factor = factor[(...,) + (None,) * (dyn.x.ndim - 2)]
+             return factor * self.sample(dyn.drift, dyn.Cov_factor)
+        
+        def sample(self, drift:ArrayLike, Cov_factor:ArrayLike) -> ArrayLike:
+            r"""
+            Samples the covariance noise :math:`A^T\xi` for each particle, from the factor :math:`A` of the covariance.
+
+            Parameters
+            ----------
+                drift (ArrayLike): The drift of the ensemble, of shape (M, N, d).
+                Cov_factor (ArrayLike): The factor :math:`A` of the covariance, of shape (M, K, d), where :math:`K` is the 
+                    number of particles, that define the covariance.
+
+            Returns
+            -------
+                ArrayLike: The covariance noise, of shape (M, N, d).
+            
+            """
+            z = self.sampler(0, 1, size = drift.shape[:-1] + Cov_factor.shape[-2:-1])
+            return self.apply_cov_factor(Cov_factor, z)
+        
+        def apply_cov_factor(self, Cov_factor: ArrayLike, z: ArrayLike) -> ArrayLike:
+            """
+            Applies the transposed factor of the covariance to the input tensor, i.e., computes :math:`A^T z_{m,n}` for all 
+            runs and particles.
+
+            Parameters
+            ----------
+                Cov_factor (ArrayLike): The factor of the covariance, of shape (M, K, d).
+                z (ArrayLike): The input tensor of shape (M, N, K).
+
+            Returns:
+                ArrayLike: The output of the matrix-vector products, of shape (M, N, d).
+            """
+            return z @ Cov_factor
@@ -6,9 +6,8 @@ This module implements the  schedulers employed in conensus based schemes.
 
 """
 
-import numpy as np
-from scipy.special import logsumexp
 import warnings
+from .utils.backend import numpy_backend
 
 class param_update():
     r"""Base class for parameter updates
@@ -49,7 +48,8 @@ class param_update():
 
     def ensure_max(self, dyn):
         r"""Ensures that the parameter does not exceed its maximum value."""
-        setattr(dyn, self.name, np.minimum(self.maximum, getattr(dyn, self.name)))
+        backend = getattr(dyn, 'backend', numpy_backend())
+        setattr(dyn, self.name, backend.minimum(self.maximum, getattr(dyn, self.name)))
 
 
 class scheduler():
@@ -146,13 +146,16 @@ class effective_sample_size(param_update):
         self.solve_max_it = solve_max_it
         
     def update(self, dyn):
-        val = getattr(dyn, self.name)
+        backend = getattr(dyn, 'backend', numpy_backend())
+        # the bisection is performed in double precision
+        energy = backend.astype(dyn.energy, backend.float64)
         val = bisection_solve(
-            eff_sample_size_gap(dyn.energy, self.eta), 
-            self.minimum * np.ones((dyn.M,)), self.maximum * np.ones((dyn.M,)), 
-            max_it = self.solve_max_it, thresh=1e-2
+            eff_sample_size_gap(energy, self.eta, backend=backend), 
+            backend.full((dyn.M,), self.minimum, like=energy), 
+            backend.full((dyn.M,), self.maximum, like=energy), 
+            max_it = self.solve_max_it, thresh=1e-2, backend=backend
         )
-        setattr(dyn, self.name, val[:, None])
+        setattr(dyn, self.name, backend.astype(val[:, None], dyn.energy.dtype))
         self.ensure_max(dyn)
         
         
@@ -166,20 +169,30 @@ class eff_sample_size_gap:
         \alpha \mapsto J_{eff}(\alpha) - \eta N.
         
     Therefore, the root of this non-increasing function solve the effective sampling size equation for :math:`\alpha`.
+    
+    Parameters
+    ----------
+    energy : Array
+        The energies of the particles, of shape (M, N).
+    eta : float
+        The parameter :math:`\eta`.
+    backend : backend, optional
+        The array backend. The default is numpy.
     """
     
     
-    def __init__(self, energy, eta):
+    def __init__(self, energy, eta, backend=None):
         self.eta = eta
         self.energy = energy
         self.N = energy.shape[-1]
+        self.backend = backend if backend is not None else numpy_backend()
     
     def __call__(self, alpha):
-        nom   = logsumexp(-alpha[:, None] * self.energy, axis=-1)
-        denom = logsumexp(-2 * alpha[:, None] * self.energy, axis=-1)
-        return np.exp(2 * nom - denom) - self.eta * self.N
+        nom   = self.backend.logsumexp(-alpha[:, None] * self.energy, axis=-1)
+        denom = self.backend.logsumexp(-2 * alpha[:, None] * self.energy, axis=-1)
+        return self.backend.exp(2 * nom - denom) - self.eta * self.N
         
-def bisection_solve(f, low, high, max_it = 100, thresh = 1e-2, verbosity=0):
+def bisection_solve(f, low, high, max_it = 100, thresh = 1e-2, verbosity=0, backend=None):
     r"""simple bisection optimization to solve for roots
     
     Parameters
@@ -191,6 +204,8 @@ def bisection_solve(f, low, high, max_it = 100, thresh = 1e-2, verbosity=0):
         The low initial value for the bisection, should be an array of size (M,)
     high: Array
         The high initial value for the bisection, should be an array of size (M,)
+    backend: optional
+        The array backend of ``low`` and ``high``. The default is numpy.
     
     
     Returns
@@ -200,19 +215,20 @@ def bisection_solve(f, low, high, max_it = 100, thresh = 1e-2, verbosity=0):
     it = 0
     x = high
     term = False
-    idx = np.arange(len(low))
+    backend = backend if backend is not None else numpy_backend()
+    running = backend.astype(backend.ones(low.shape, like=low), backend.bool)
     while not term:
         x = (low + high)/2
         fx = f(x)
-        gtzero = np.where(fx[idx] > 0)[0]
-        ltzero  = np.where(fx[idx] < 0)[0]
+        gtzero = running & (fx > 0)
+        ltzero = running & (fx < 0)
         # update low and high
-        low[idx[gtzero]] = x[idx[gtzero]]
-        high[idx[ltzero]]  = x[idx[ltzero]]
+        low[gtzero] = x[gtzero]
+        high[ltzero] = x[ltzero]
         # update running idx and iteration
-        idx = np.where(np.abs(fx) > thresh)[0]
+        running = abs(fx) > thresh
         it += 1
-        term = (it > max_it) | (len(idx) == 0)
+        term = (it > max_it) | (not running.any())
     if verbosity > 0:
         print('Finishing after ' + str(it) + ' Iterations')
     return x
\ No newline at end of file
@@ -0,0 +1,438 @@
+r"""
+Backends
+========
+
+This module implements the array backends that are used in the dynamics. A backend bundles all array
+operations, that are required to run a dynamic, such that a whole optimization can be performed with
+one array library. Currently, the following backends are implemented:
+
+* :class:`numpy_backend`: the default backend, employing ``numpy`` and ``scipy``.
+* :class:`torch_backend`: a backend employing ``torch`` tensors, on a given device.
+* :class:`array_api_backend`: a backend for namespaces that are compatible with the `array API standard <https://data-apis.org/array-api/>`_.
+
+"""
+import numpy as np
+from scipy.special import logsumexp as logsumexp_scp
+from .rng import global_seed
+
+def get_backend(backend = None, x = None, dtype = None):
+    """
+    Returns a backend instance.
+
+    Parameters
+    ----------
+    backend : str, backend or None
+        If a string is given, it must be one of ``'numpy'`` or ``'torch'``. If a backend instance is given,
+        it is returned directly. If ``None``, the backend is inferred from the array ``x``.
+    x : array_like, optional
+        The array from which the backend is inferred, if ``backend`` is ``None``.
+    dtype : optional
+        The floating point dtype of newly created arrays, e.g., ``'float32'``. Only used if the backend is 
+        created by this function. If ``None``, the default dtype of the array library is used.
+
+    Returns
+    -------
+    backend
+    """
+    if backend is None:
+        if is_torch_tensor(x):
+            return torch_backend(device=x.device, dtype=dtype if dtype is not None else x.dtype)
+        return numpy_backend(dtype=dtype)
+    elif isinstance(backend, str):
+        if backend == 'numpy':
+            return numpy_backend(dtype=dtype)
+        elif backend == 'torch':
+            return torch_backend(dtype=dtype)
+        else:
+            raise ValueError('Unknown backend ' + backend + '. Choose from "numpy" or "torch", or specify a backend instance.')
+    return backend
+
+def is_torch_tensor(x) -> bool:
+    """Checks if ``x`` is a torch tensor, without importing torch."""
+    return type(x).__module__.startswith('torch')
+
+
+class backend:
+    """Base class for array backends
+
+    Every backend implements the array operations listed below. The signatures follow the ones of ``numpy``,
+    the keyword ``like`` specifies an array, whose type, dtype and device should be used for the created array.
+    The attribute ``dtype`` is the floating point dtype of newly created arrays, while ``float64`` denotes the 
+    double precision dtype of the array library, which is used to accumulate numerically sensitive reductions, and 
+    ``bool`` the boolean dtype for masks.
+    """
+    name = None
+    dtype = None
+    float64 = None
+    bool = None
+
+    def copy(self, x): raise NotImplementedError
+    def norm(self, x, axis = None, keepdims = False): raise NotImplementedError
+    def normal(self, loc = 0., scale = 1., size = None): raise NotImplementedError
+    def uniform(self, low = 0., high = 1., size = None): raise NotImplementedError
+    def asarray(self, x, like = None): raise NotImplementedError
+    def full(self, shape, fill_value, like = None): raise NotImplementedError
+    def arange(self, n, like = None): raise NotImplementedError
+    def to_numpy(self, x): raise NotImplementedError
+    def logsumexp(self, x, axis = None, keepdims = False): raise NotImplementedError
+    def exp(self, x): raise NotImplementedError
+    def log(self, x): raise NotImplementedError
+    def sqrt(self, x): raise NotImplementedError
+    def tanh(self, x): raise NotImplementedError
+    def sum(self, x, axis = None, keepdims = False): raise NotImplementedError
+    def mean(self, x, axis = None, keepdims = False): raise NotImplementedError
+    def min(self, x, axis = None): raise NotImplementedError
+    def max(self, x, axis = None): raise NotImplementedError
+    def argmin(self, x, axis = None): raise NotImplementedError
+    def minimum(self, x, y): raise NotImplementedError
+    def clip(self, x, a_min, a_max, out = None): raise NotImplementedError
+    def nan_to_num(self, x, nan = 0.0, copy = True): raise NotImplementedError
+    def eigh(self, A): raise NotImplementedError
+    def matrix_transpose(self, A): raise NotImplementedError
+    def astype(self, x, dtype): raise NotImplementedError
+    def get_rng_state(self): raise NotImplementedError
+    def set_rng_state(self, state): raise NotImplementedError
+
+    def zeros(self, shape, like = None):
+        return self.full(shape, 0., like = like)
+
+    def ones(self, shape, like = None):
+        return self.full(shape, 1., like = like)
+
+
+class numpy_backend(backend):
+    """The numpy backend
+
+    This is the default backend. Most operations are directly given by the corresponding ``numpy`` functions.
+
+    Parameters
+    ----------
+    dtype : optional
+        The floating point dtype of newly created arrays. The default is ``float64``. For other dtypes, random numbers
+        are sampled directly in the given precision, from a private generator of the backend. Unless ``seed`` is given, 
+        this generator is seeded from the global ``numpy`` random state at the creation of the backend, such that 
+        ``np.random.seed`` before the creation of the dynamic controls the samples. Restoring a global state with 
+        ``set_rng_state`` recreates the generator in the same way.
+    seed : optional
+        The seed of the private generator for the samples in other dtypes than ``float64``. The default is None, i.e., the 
+        generator is seeded from the global random state.
+    """
+    name = 'numpy'
+    dtype = np.dtype(np.float64)
+    float64 = np.float64
+    bool = np.bool_
+    copy = staticmethod(np.copy)
+    norm = staticmethod(np.linalg.norm)
+    normal = staticmethod(np.random.normal)
+    uniform = staticmethod(np.random.uniform)
+    logsumexp = staticmethod(logsumexp_scp)
+    exp = staticmethod(np.exp)
+    log = staticmethod(np.log)
+    sqrt = staticmethod(np.sqrt)
+    tanh = staticmethod(np.tanh)
+    sum = staticmethod(np.sum)
+    mean = staticmethod(np.mean)
+    min = staticmethod(np.min)
+    max = staticmethod(np.max)
+    argmin = staticmethod(np.argmin)
+    minimum = staticmethod(np.minimum)
+    clip = staticmethod(np.clip)
+    nan_to_num = staticmethod(np.nan_to_num)
+    eigh = staticmethod(np.linalg.eigh)
+    to_numpy = staticmethod(np.asarray)
+
+    def __init__(self, dtype = None, seed = None):
+        self.rng = None
+        if dtype is not None and np.dtype(dtype) != self.dtype:
+            self.dtype = np.dtype(dtype)
+            # the generator is created once, seeded from the global random state if no seed is given
+            self.rng = np.random.default_rng(seed if seed is not None else global_seed())
+            self.normal = self._normal
+            self.uniform = self._uniform
+
+    def _normal(self, loc = 0., scale = 1., size = None):
+        z = self.rng.standard_normal(size = size, dtype = self.dtype)
+        z *= scale
+        z += loc
+        return z
+
+    def _uniform(self, low = 0., high = 1., size = None):
+        z = self.rng.random(size = size, dtype = self.dtype)
+        z *= (high - low)
+        z += low
+        return z
+
+    def asarray(self, x, like = None):
+        return np.asarray(x, dtype = self.dtype if like is None else like.dtype)
+
+    def full(self, shape, fill_value, like = None):
+        dtype = like.dtype if like is not None and np.issubdtype(like.dtype, np.floating) else self.dtype
+        return np.full(shape, fill_value, dtype = dtype)
+
+    def astype(self, x, dtype):
+        return x.astype(dtype, copy = False)
+
+    def arange(self, n, like = None):
+        return np.arange(n)
+
+    def matrix_transpose(self, A):
+        return np.swapaxes(A, -1, -2)
+
+    def get_rng_state(self):
+        # the default precision samples from the global numpy random state
+        return self.rng.bit_generator.state if self.rng is not None else np.random.get_state()
+
+    def set_rng_state(self, state):
+        if self.rng is not None and isinstance(state, dict) and 'bit_generator' in state:
+            self.rng.bit_generator.state = state
+            return
+        np.random.set_state(state)
+        if self.rng is not None: # a global state, the generator is recreated as at the creation of the backend
+            self.rng = np.random.default_rng(global_seed())
+
+
+class torch_backend(backend):
+    """The torch backend
+
+    Parameters
+    ----------
+    device : str or torch.device, optional
+        The device on which new tensors are created. The default is ``'cpu'``.
+    dtype : torch.dtype, optional
+        The dtype of newly created tensors. If ``None``, the default dtype of torch is used.
+    """
+    name = 'torch'
+    def __init__(self, device = 'cpu', dtype = None):
+        import torch
+        self.torch = torch
+        self.device = device
+        if isinstance(dtype, str):
+            dtype = getattr(torch, dtype)
+        self.dtype = dtype if dtype is not None else torch.get_default_dtype()
+        self.float64 = torch.float64
+        self.bool = torch.bool
+
+    def _kwargs(self, like):
+        if like is None or not is_torch_tensor(like):
+            return {'dtype': self.dtype, 'device': self.device}
+        dtype = like.dtype if like.is_floating_point() else self.dtype
+        return {'dtype': dtype, 'device': like.device}
+
+    def copy(self, x):
+        return self.torch.clone(x)
+
+    def norm(self, x, axis = None, keepdims = False):
+        return self.torch.linalg.norm(x, dim = axis, keepdim = keepdims)
+
+    def normal(self, loc = 0., scale = 1., size = None):
+        return self.torch.normal(loc, scale, size = tuple(size), dtype = self.dtype, device = self.device)
+
+    def uniform(self, low = 0., high = 1., size = None):
+        return self.torch.empty(tuple(size), dtype = self.dtype, device = self.device).uniform_(low, high)
+
+    def asarray(self, x, like = None):
+        if like is None:
+            device = x.device if is_torch_tensor(x) else self.device
+            return self.torch.as_tensor(x, dtype = self.dtype, device = device)
+        return self.torch.as_tensor(x, **self._kwargs(like))
+
+    def full(self, shape, fill_value, like = None):
+        return self.torch.full(tuple(shape), fill_value, **self._kwargs(like))
+
+    def arange(self, n, like = None):
+        return self.torch.arange(n, device = self.device if like is None else like.device)
+
+    def to_numpy(self, x):
+        if is_torch_tensor(x):
+            return x.detach().cpu().numpy()
+        return np.asarray(x)
+
+    def logsumexp(self, x, axis = None, keepdims = False):
+        axis = axis if axis is not None else tuple(range(x.ndim))
+        return self.torch.logsumexp(x, dim = axis, keepdim = keepdims)
+
+    def exp(self, x):
+        return self.torch.exp(x)
+
+    def log(self, x):
+        return self.torch.log(x)
+
+    def sqrt(self, x):
+        return self.torch.sqrt(x)
+
+    def tanh(self, x):
+        return self.torch.tanh(x)
+
+    def sum(self, x, axis = None, keepdims = False):
+        axis = axis if axis is not None else tuple(range(x.ndim))
+        return self.torch.sum(x, dim = axis, keepdim = keepdims)
+
+    def mean(self, x, axis = None, keepdims = False):
+        axis = axis if axis is not None else tuple(range(x.ndim))
+        return self.torch.mean(x, dim = axis, keepdim = keepdims)
+
+    def min(self, x, axis = None):
+        return self.torch.amin(x, dim = axis if axis is not None else tuple(range(x.ndim)))
+
+    def max(self, x, axis = None):
+        return self.torch.amax(x, dim = axis if axis is not None else tuple(range(x.ndim)))
+
+    def argmin(self, x, axis = None):
+        return self.torch.argmin(x, dim = axis)
+
+    def minimum(self, x, y):
+        if not is_torch_tensor(x) and not is_torch_tensor(y):
+            return np.minimum(x, y)
+        if is_torch_tensor(x) and is_torch_tensor(y):
+            return self.torch.minimum(x, y)
+        if not is_torch_tensor(x):
+            x, y = y, x
+        return self.torch.clamp(x, max = y)
+
+    def clip(self, x, a_min, a_max, out = None):
+        return self.torch.clamp(x, min = a_min, max = a_max, out = out)
+
+    def nan_to_num(self, x, nan = 0.0, copy = True):
+        if copy:
+            return self.torch.nan_to_num(x, nan = nan)
+        return x.nan_to_num_(nan = nan)
+
+    def eigh(self, A):
+        return self.torch.linalg.eigh(A)
+
+    def matrix_transpose(self, A):
+        return A.transpose(-1, -2)
+
+    def astype(self, x, dtype):
+        return x.to(dtype)
+
+    def get_rng_state(self):
+        state = {'cpu': self.torch.get_rng_state()}
+        if self.torch.device(self.device).type == 'cuda':
+            state['cuda'] = self.torch.cuda.get_rng_state(self.device)
+        return state
+
+    def set_rng_state(self, state):
+        self.torch.set_rng_state(state['cpu'])
+        if 'cuda' in state:
+            self.torch.cuda.set_rng_state(state['cuda'], self.device)
+
+
+class array_api_backend(backend):
+    """Backend for array API compatible namespaces
+
+    This backend only employs functions of the `array API standard <https://data-apis.org/array-api/>`_. Since the standard
+    does not specify random number generation, random numbers are generated with ``numpy`` and converted with ``xp.asarray``.
+
+    Parameters
+    ----------
+    xp : namespace
+        The array API compatible namespace, e.g., ``numpy`` (version 2 or higher), ``array_api_strict`` or a namespace
+        obtained from ``array_api_compat``.
+    rng : numpy.random.Generator, optional
+        The generator used for random numbers. The default is ``np.random.default_rng()``.
+    dtype : optional
+        The floating point dtype of newly created arrays. The default is ``xp.float64``.
+    """
+    name = 'array_api'
+    def __init__(self, xp, rng = None, dtype = None):
+        self.xp = xp
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.dtype = dtype if dtype is not None else xp.float64
+        self.float64 = xp.float64
+        self.bool = xp.bool
+
+    def copy(self, x):
+        return self.xp.asarray(x, copy = True)
+
+    def norm(self, x, axis = None, keepdims = False):
+        return self.xp.linalg.vector_norm(x, axis = axis, keepdims = keepdims)
+
+    def normal(self, loc = 0., scale = 1., size = None):
+        return self.xp.asarray(self.rng.normal(loc, scale, size = size), dtype = self.dtype)
+
+    def uniform(self, low = 0., high = 1., size = None):
+        return self.xp.asarray(self.rng.uniform(low, high, size = size), dtype = self.dtype)
+
+    def asarray(self, x, like = None):
+        return self.xp.asarray(x, dtype = self.dtype if like is None else like.dtype)
+
+    def full(self, shape, fill_value, like = None):
+        return self.xp.full(tuple(shape), fill_value, dtype = self.dtype if like is None else like.dtype)
+
+    def arange(self, n, like = None):
+        return self.xp.arange(n)
+
+    def to_numpy(self, x):
+        return np.from_dlpack(x)
+
+    def logsumexp(self, x, axis = None, keepdims = False):
+        xp = self.xp
+        m = xp.max(x, axis = axis, keepdims = True)
+        m = xp.where(xp.isfinite(m), m, xp.zeros_like(m))
+        res = xp.log(xp.sum(xp.exp(x - m), axis = axis, keepdims = True)) + m
+        return res if keepdims else xp.squeeze(res, axis = axis)
+
+    def exp(self, x):
+        return self.xp.exp(x)
+
+    def log(self, x):
+        return self.xp.log(x)
+
+    def sqrt(self, x):
+        return self.xp.sqrt(x)
+
+    def tanh(self, x):
+        return self.xp.tanh(x)
+
+    def sum(self, x, axis = None, keepdims = False):
+        return self.xp.sum(x, axis = axis, keepdims = keepdims)
+
+    def mean(self, x, axis = None, keepdims = False):
+        return self.xp.mean(x, axis = axis, keepdims = keepdims)
+
+    def min(self, x, axis = None):
+        return self.xp.min(x, axis = axis)
+
+    def max(self, x, axis = None):
+        return self.xp.max(x, axis = axis)
+
+    def argmin(self, x, axis = None):
+        return self.xp.argmin(x, axis = axis)
+
+    def minimum(self, x, y):
+        xp = self.xp
+        if not hasattr(x, 'dtype') and not hasattr(y, 'dtype'):
+            return min(x, y)
+        dtype = x.dtype if hasattr(x, 'dtype') else y.dtype
+        return xp.minimum(xp.asarray(x, dtype = dtype), xp.asarray(y, dtype = dtype))
+
+    def clip(self, x, a_min, a_max, out = None):
+        res = self.xp.clip(x, min = a_min, max = a_max)
+        if out is not None:
+            out[...] = res
+            return out
+        return res
+
+    def nan_to_num(self, x, nan = 0.0, copy = True):
+        xp = self.xp
+        res = xp.where(xp.isnan(x), xp.asarray(nan, dtype = x.dtype), x)
+        if not copy:
+            x[...] = res
+            return x
+        return res
+
+    def eigh(self, A):
+        return self.xp.linalg.eigh(A)
+
+    def matrix_transpose(self, A):
+        return self.xp.matrix_transpose(A)
+
+    def astype(self, x, dtype):
+        return self.xp.astype(x, dtype, copy = False)
+
+    def get_rng_state(self):
+        return self.rng.bit_generator.state
+
+    def set_rng_state(self, state):
+        self.rng.bit_generator.state = state
@@ -0,0 +1,120 @@
+r"""
+Checkpoints
+===========
+
+This module implements the storage format of the checkpoints of a dynamic, see :meth:`cbx.dynamics.ParticleDynamic.save_checkpoint`.
+A checkpoint is a directory, with the following content:
+
+* ``<name>.npy``: one file for each array of the state, which can be loaded as a memory map with ``np.load(..., mmap_mode='r')``.
+* ``history/<key>.npy``: the entries of the history ``state['history'][key]``, stacked along the first axis.
+* ``state.pkl``: all remaining values of the state, e.g., scalars, the states of the random number generators
+  and the scheduler, pickled in one dictionary.
+
+A checkpoint is first written to the directory ``path + '.tmp'``, which then replaces ``path``. Therefore, a crash
+while writing never corrupts the previous checkpoint. The previous checkpoint is moved aside and removed afterwards, on
+POSIX systems arrays that are memory mapped from it remain valid. On Windows, files that are memory mapped can neither
+be moved nor removed, hence a checkpoint can not be replaced while it is loaded with ``mmap_mode``. In this case, save
+to a different path, or load the checkpoint into memory. Leftovers of previous checkpoints, that could not be removed,
+are removed by the next save.
+"""
+
+import numpy as np
+import os
+import pickle
+import shutil
+import glob
+import tempfile
+from typing import Callable
+
+def save_checkpoint(path: str, state: dict, to_numpy: Callable = np.asarray) -> None:
+    """
+    Writes the state of a dynamic to the directory ``path``.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the checkpoint.
+    state : dict
+        The state, where every value with ``ndim > 0`` is stored as an ``.npy`` file. The optional entry ``'history'``
+        is a dict of lists, where each list is stacked and stored as one ``.npy`` file, if possible.
+    to_numpy : Callable, optional
+        Converts the arrays of the state to ``numpy`` arrays. The default is ``np.asarray``.
+
+    Returns
+    -------
+    None
+    """
+    tmp = path + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, 'history'))
+
+    meta = {'arrays': [], 'converted': [], 'history': {}, 'history_converted': []}
+    for name, value in state.items():
+        if name == 'history':
+            continue
+        if getattr(value, 'ndim', 0) > 0:
+            if not isinstance(value, np.ndarray):
+                meta['converted'].append(name)
+            np.save(os.path.join(tmp, name + '.npy'), to_numpy(value))
+            meta['arrays'].append(name)
+        else:
+            meta[name] = value
+
+    for key, entries in state.get('history', {}).items():
+        try:
+            if hasattr(entries, 'as_array'): # e.g. a memory mapped history, which is not loaded into memory
+                arr = np.asarray(entries.as_array()) if len(entries) > 0 else None
+            else:
+                arr = np.stack([to_numpy(e) for e in entries]) if len(entries) > 0 else None
+        except (ValueError, TypeError): # entries of different shape or not array-like
+            arr = None
+        if arr is None or arr.dtype == object:
+            meta['history'][key] = list(entries)
+        else:
+            if not hasattr(entries, 'as_array') and not all(isinstance(e, np.ndarray) for e in entries):
+                meta['history_converted'].append(key)
+            np.save(os.path.join(tmp, 'history', key + '.npy'), arr)
+            meta['history'][key] = None
+
+    with open(os.path.join(tmp, 'state.pkl'), 'wb') as file:
+        pickle.dump(meta, file)
+
+    for stale in glob.glob(glob.escape(path) + '.old*'):
+        shutil.rmtree(stale, ignore_errors=True)
+    if os.path.exists(path):
+        # move the previous checkpoint aside under a fresh name, such that a leftover does not block the replacement
+        old = tempfile.mkdtemp(prefix=os.path.basename(path) + '.old', dir=os.path.dirname(os.path.abspath(path)))
+        os.rmdir(old)
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True) # fails for memory mapped files on Windows
+    else:
+        os.replace(tmp, path)
+
+def load_checkpoint(path: str, mmap_mode: str = None) -> dict:
+    """
+    Reads a checkpoint, that was written by :func:`save_checkpoint`.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the checkpoint.
+    mmap_mode : str, optional
+        The mode of the memory maps of the arrays, see ``np.load``. The default is None, i.e., the arrays are loaded into memory.
+
+    Returns
+    -------
+    dict
+        The state, where all arrays are ``numpy`` arrays and the entries of the history are rows of the stacked arrays.
+        The entries ``'converted'`` and ``'history_converted'`` list the arrays, that were converted by ``to_numpy``.
+    """
+    with open(os.path.join(path, 'state.pkl'), 'rb') as file:
+        state = pickle.load(file)
+
+    for name in state.pop('arrays'):
+        state[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+
+    for key, entries in state['history'].items():
+        if entries is None:
+            state['history'][key] = list(np.load(os.path.join(path, 'history', key + '.npy'), mmap_mode=mmap_mode))
+    return state
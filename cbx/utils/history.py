@@ -1,4 +1,7 @@
 import numpy as np
+import os
+from typing import Callable
+
 
 class track:
     """
@@ -44,7 +47,7 @@ class track_x(track):
     @staticmethod
     def init_history(dyn):
         dyn.history['x'] = []
-        dyn.history['x'].append(dyn.x)
+        dyn.history['x'].append(dyn.in_run_order(dyn.x, copy=True))
     
     @staticmethod
     def update(dyn) -> None:
@@ -60,7 +63,7 @@ class track_x(track):
         -------
             None
         """
-        dyn.history['x'].append(dyn.copy(dyn.x))
+        dyn.history['x'].append(dyn.in_run_order(dyn.x, copy=True))
         
         
 class track_update_norm(track):
@@ -84,7 +87,7 @@ class track_update_norm(track):
         Returns:
             None
         """
-        dyn.history['update_norm'].append(dyn.update_diff)
+        dyn.history['update_norm'].append(dyn.in_run_order(dyn.update_diff))
      
 
 class track_energy(track):
@@ -98,12 +101,15 @@ class track_energy(track):
 
     @staticmethod
     def update(dyn) -> None:
-        dyn.history['energy'].append(dyn.best_cur_energy) 
+        dyn.history['energy'].append(dyn.in_run_order(dyn.best_cur_energy))
 
 
 class track_consensus(track):
     """
     Class for tracking the 'consensus' entry in the dynamic.
+
+    Only the active runs are stored. If the history is stored in an array, see :class:`array_history`, each entry has a 
+    slot for every run, which is NaN for the inactive runs, such that the shape of the entries does not change.
     """
 
     @staticmethod
@@ -111,7 +117,8 @@ class track_consensus(track):
         dyn.history['consensus'] = []
     @staticmethod
     def update(dyn) -> None:
-        dyn.history['consensus'].append(dyn.copy(dyn.consensus))
+        store = dyn.history['consensus']
+        store.append(dyn.active_in_run_order(dyn.consensus, copy=True, full=isinstance(store, array_history)))
         
 class track_drift_mean(track):
     """
@@ -123,11 +130,12 @@ class track_drift_mean(track):
         dyn.history['drift_mean'] = []
     @staticmethod
     def update(dyn) -> None:
-        dyn.history['drift_mean'].append(np.mean(np.abs(dyn.drift), axis=(-2,-1)))
+        dyn.history['drift_mean'].append(dyn.backend.mean(abs(dyn.drift), axis=(-2,-1)))
         
 class track_drift(track):
     """
-    Class for tracking the 'drift' entry in the history.
+    Class for tracking the 'drift' entry in the history. As for :class:`track_consensus`, the entries of an array storage 
+    have a slot for every run.
     """
 
     @staticmethod
@@ -137,5 +145,193 @@ class track_drift(track):
     
     @staticmethod
     def update(dyn) -> None:        
-        dyn.history['drift'].append(dyn.drift)
-        dyn.history['particle_idx'].append(dyn.particle_idx)
\ No newline at end of file
+        store = dyn.history['drift']
+        store.append(dyn.active_in_run_order(dyn.drift, copy=True, full=isinstance(store, array_history)))
+        dyn.history['particle_idx'].append(dyn.run_idx_in_run_order(dyn.particle_idx))
+
+
+class array_history:
+    """
+    List-like storage of the entries of one history key in a preallocated array.
+
+    The array is allocated at the first call of :meth:`append`, with room for ``capacity`` entries of the shape of the first 
+    entry. Each entry is written in place into the array, if the capacity is exhausted, the array is enlarged to twice its size. 
+    If ``path`` is given, the array is a ``np.memmap`` of an ``.npy`` file, see :class:`memmap_history`. Entries, that are not 
+    arrays, e.g., the indices in ``'particle_idx'``, are kept in a list in memory. All array entries must have the same shape, 
+    therefore the entries of ``'consensus'`` and ``'drift'`` have a slot for every run, see :class:`track_consensus`. 
+    This also holds for :class:`ring_history`.
+
+    Indexing works as for a list of the entries, where integers return a view of one entry and slices return a view of the 
+    corresponding block.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        The initial number of entries, for which the array is allocated. The default is 64.
+    path : str, optional
+        The path of the ``.npy`` file. The default is None, i.e., the array is kept in memory.
+    to_numpy : Callable, optional
+        Converts the entries to ``numpy`` arrays. The default is ``np.asarray``.
+    dtype : optional
+        The dtype, in which floating point entries are stored, e.g., ``'float16'`` to reduce the memory. The default is None, 
+        i.e., the dtype of the first entry.
+    """
+    def __init__(self, capacity: int = 64, path: str = None, to_numpy: Callable = np.asarray, dtype = None):
+        self.path = path
+        self.capacity = max(capacity, 1)
+        self.to_numpy = to_numpy
+        self.dtype = dtype
+        self.data = None
+        self.items = None
+        self.len = 0
+        
+    def allocate(self, n: int, shape: tuple, dtype) -> np.ndarray:
+        if self.path is None:
+            return np.empty((n,) + shape, dtype=dtype)
+        return np.lib.format.open_memmap(self.path, mode='w+', dtype=dtype, shape=(n,) + shape)
+    
+    def store(self, a) -> bool:
+        """Converts the entry ``a``, allocates the array if necessary and returns whether ``a`` is kept in the list ``items``."""
+        if self.items is not None or (self.data is None and getattr(a, 'ndim', None) is None):
+            self.items = self.items if self.items is not None else []
+            return True
+        
+        a = self.to_numpy(a)
+        if self.data is None:
+            dtype = self.dtype if self.dtype is not None and a.dtype.kind == 'f' else a.dtype
+            self.data = self.allocate(self.capacity, a.shape, dtype)
+        elif a.shape != self.data.shape[1:]:
+            raise ValueError('All entries of an array history must have the same shape, got ' + 
+                             str(a.shape) + ' instead of ' + str(self.data.shape[1:]) + '.')
+        return False
+        
+    def append(self, a) -> None:
+        if self.store(a):
+            self.items.append(a)
+            return
+        if self.len == self.data.shape[0]:
+            self.grow()
+        self.data[self.len] = self.to_numpy(a)
+        self.len += 1
+        
+    def grow(self,) -> None:
+        """Enlarges the array to twice the number of entries."""
+        n, shape, dtype = 2 * self.data.shape[0], self.data.shape[1:], self.data.dtype
+        if self.path is None:
+            new = np.empty((n,) + shape, dtype=dtype)
+            new[:self.len] = self.data[:self.len]
+            self.data = new
+            return
+        tmp = self.path + '.tmp'
+        new = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(n,) + shape)
+        new[:self.len] = self.data[:self.len]
+        new.flush()
+        del new
+        self.data = None
+        os.replace(tmp, self.path)
+        self.data = np.lib.format.open_memmap(self.path, mode='r+')
+        
+    def as_array(self,) -> np.ndarray:
+        """Returns all entries as one array, which is a view of the storage."""
+        if self.items is not None:
+            return self.items
+        return self.data[:self.len] if self.data is not None else np.zeros((0,))
+    
+    def clear(self,) -> None:
+        """Deletes all entries, the storage is overwritten by the next entries."""
+        self.items = None
+        self.len = 0
+        
+    def flush(self,) -> None:
+        """Writes the changes to disk, if the storage is a memory map."""
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+    
+    def __len__(self,):
+        return len(self.items) if self.items is not None else self.len
+    
+    def __getitem__(self, i):
+        return self.as_array()[i]
+    
+    def __iter__(self,):
+        return iter(self.as_array())
+    
+    
+class memmap_history(array_history):
+    """
+    List-like storage of the entries of one history key in a preallocated ``.npy`` file on disk.
+
+    The file is accessed as a ``np.memmap``, where each entry is written in place, such that the memory of the process does 
+    not grow with the number of entries, the operating system only keeps the recently used pages in memory. 
+    Therefore, e.g., :class:`cbx.plotting.plot_dynamic_history` reads the frames lazily from disk. See :class:`array_history` 
+    for the details.
+
+    Parameters
+    ----------
+    path : str
+        The path of the ``.npy`` file.
+    capacity : int, optional
+        The initial number of entries, for which the file is allocated. The default is 64.
+    to_numpy : Callable, optional
+        Converts the entries to ``numpy`` arrays. The default is ``np.asarray``.
+    dtype : optional
+        The dtype, in which floating point entries are stored. The default is None, i.e., the dtype of the first entry.
+    """
+    def __init__(self, path: str, capacity: int = 64, to_numpy: Callable = np.asarray, dtype = None):
+        super().__init__(capacity=capacity, path=path, to_numpy=to_numpy, dtype=dtype)
+        
+        
+class ring_history(array_history):
+    """
+    Ring buffer, that only keeps the last ``capacity`` entries of one history key.
+
+    If the buffer is full, each new entry overwrites the oldest one, such that the memory stays constant, however long 
+    the dynamic runs. Indexing works as for a list of the kept entries, ordered from the oldest to the newest one. 
+    The total number of appended entries is stored in ``num_appended``.
+
+    Parameters
+    ----------
+    capacity : int
+        The number of kept entries.
+    path : str, optional
+        The path of an ``.npy`` file, that holds the buffer. The default is None, i.e., the buffer is kept in memory.
+    to_numpy : Callable, optional
+        Converts the entries to ``numpy`` arrays. The default is ``np.asarray``.
+    dtype : optional
+        The dtype, in which floating point entries are stored. The default is None, i.e., the dtype of the first entry.
+    """
+    def __init__(self, capacity: int, path: str = None, to_numpy: Callable = np.asarray, dtype = None):
+        super().__init__(capacity=capacity, path=path, to_numpy=to_numpy, dtype=dtype)
+        self.start = 0
+        self.num_appended = 0
+        
+    def append(self, a) -> None:
+        self.num_appended += 1
+        if self.store(a):
+            self.items.append(a)
+            if len(self.items) > self.capacity:
+                del self.items[0]
+            return
+        self.data[(self.start + self.len) % self.capacity] = self.to_numpy(a)
+        if self.len < self.capacity:
+            self.len += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+            
+    def as_array(self,) -> np.ndarray:
+        """Returns the kept entries as one array, ordered from the oldest to the newest one. This is a copy, if the buffer wrapped around."""
+        if self.items is not None or self.data is None or self.start == 0:
+            return super().as_array()
+        return np.concatenate((self.data[self.start:], self.data[:self.start]))
+    
+    def clear(self,) -> None:
+        super().clear()
+        self.start = 0
+        self.num_appended = 0
+        
+    def __getitem__(self, i):
+        if self.items is None and self.data is not None and isinstance(i, (int, np.integer)):
+            if not -self.len <= i < self.len:
+                raise IndexError('history index out of range')
+            return self.data[(self.start + i % self.len) % self.capacity]
+        return self.as_array()[i]
@@ -0,0 +1,185 @@
+r"""
+Compiled kernels
+================
+
+This module implements fused kernels for the consensus computation and the particle updates of :class:`cbx.dynamics.CBO`,
+:class:`cbx.dynamics.CBOMemory` and :class:`cbx.dynamics.PSO`, which are used if a dynamic is created with
+``compiled=True``. Each kernel performs one parallel pass over the particles, where the weights, the normalization and the
+weighted mean, or the drift, the noise and the update of a particle are computed together, instead of one ``numpy``
+operation after the other.
+
+The kernels are compiled with ``numba``, if it can be imported. Otherwise, ``NUMBA_AVAILABLE`` is ``False`` and the
+dynamics use their ``numpy`` implementation. The functions of this module can still be called in this case, but they are
+executed as plain Python loops.
+
+This module, and hence ``numba``, is only imported, if a dynamic uses the compiled kernels, i.e., ``import cbx`` does not
+import ``numba``.
+
+The kernels are parallelized over the particles with the threading layer of ``numba``. Importing this module changes the
+global ``numba.config.THREADING_LAYER_PRIORITY``, such that the OpenMP layer is preferred over TBB, since a process, that
+forks workers after the TBB layer was started, e.g., :class:`cbx.dynamics.ParallelRuns` with the start method ``'fork'``,
+may hang at exit. This preference is opt-in, in the sense that it only applies once the compiled kernels are used, and it
+is not applied, if a layer is configured by the environment variables ``NUMBA_THREADING_LAYER`` or
+``NUMBA_THREADING_LAYER_PRIORITY``.
+
+All kernels expect ``numpy`` arrays of particles of shape (M, N, d). The standard normal numbers ``z`` are sampled before
+by the dynamic, such that the random numbers are the same as for the ``numpy`` implementation.
+"""
+
+import numpy as np
+import os
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+    njit = numba.njit
+    prange = numba.prange
+    if 'NUMBA_THREADING_LAYER' not in os.environ and 'NUMBA_THREADING_LAYER_PRIORITY' not in os.environ:
+        numba.config.THREADING_LAYER_PRIORITY = ['omp', 'tbb', 'workqueue']
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fun: fun
+    prange = range
+
+@njit(parallel=True, cache=True)
+def consensus(x, energy, alpha, out):
+    """
+    Computes the consensus of each run in one pass over the particles, with the weights normalized by their maximum.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The particles, of shape (M, N, d).
+    energy : np.ndarray
+        The energies, of shape (M, N).
+    alpha : np.ndarray
+        The alpha parameter of each run, of shape (M,).
+    out : np.ndarray
+        The output, of shape (M, d).
+
+    Returns
+    -------
+    np.ndarray
+        The array ``out``.
+    """
+    M, N, d = x.shape
+    for m in prange(M):
+        w_max = -np.inf
+        for n in range(N):
+            w_max = max(w_max, -alpha[m] * energy[m, n])
+        s = 0.
+        for k in range(d):
+            out[m, k] = 0.
+        for n in range(N):
+            e = np.exp(-alpha[m] * energy[m, n] - w_max)
+            s += e
+            for k in range(d):
+                out[m, k] += e * x[m, n, k]
+        for k in range(d):
+            out[m, k] /= s
+    return out
+
+@njit(parallel=True, cache=True)
+def cbo_update(x, c, z, lamda_dt, sigma_sqrt_dt, anisotropic, drift, s):
+    r"""
+    Performs the update of :class:`cbx.dynamics.CBO` in place, i.e.,
+
+    .. math::
+
+        x \gets x - \lambda\, dt\, (x - c) + \sigma \sqrt{dt}\, \eta \odot z,
+
+    where :math:`\eta = x - c` for the anisotropic and :math:`\eta = \|x - c\|_2` for the isotropic noise.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The particles, of shape (M, N, d), which are updated in place.
+    c : np.ndarray
+        The consensus, of shape (M, d).
+    z : np.ndarray
+        Standard normal numbers, of shape (M, N, d).
+    lamda_dt : float
+        The product :math:`\lambda\, dt`.
+    sigma_sqrt_dt : float
+        The product :math:`\sigma \sqrt{dt}`.
+    anisotropic : bool
+        Whether the noise is anisotropic.
+    drift : np.ndarray
+        The output of the drift, of shape (M, N, d).
+    s : np.ndarray
+        The output of the scaled noise, of shape (M, N, d).
+
+    Returns
+    -------
+    None
+    """
+    M, N, d = x.shape
+    for i in prange(M * N):
+        m, n = i // N, i % N
+        nrm = 0.
+        for k in range(d):
+            drift[m, n, k] = x[m, n, k] - c[m, k]
+            nrm += drift[m, n, k]**2
+        nrm = np.sqrt(nrm)
+        for k in range(d):
+            s[m, n, k] = sigma_sqrt_dt * (drift[m, n, k] if anisotropic else nrm) * z[m, n, k]
+            x[m, n, k] += s[m, n, k] - lamda_dt * drift[m, n, k]
+
+@njit(parallel=True, cache=True)
+def memory_update(x, y, v, c, z, z_memory, lamda_dt, lamda_memory_dt, sigma_sqrt_dt, sigma_memory_sqrt_dt,
+                  anisotropic, m_dt, v_scale, dt, drift, memory_diff, s, s_memory):
+    r"""
+    Performs the update of :class:`cbx.dynamics.CBOMemory`, or, if the velocities ``v`` are given, of
+    :class:`cbx.dynamics.PSO`, in place. The noise terms :math:`s` and :math:`s_{mem}` are both scaled with the drift,
+    as in the ``numpy`` implementation.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The particles, of shape (M, N, d), which are updated in place.
+    y : np.ndarray
+        The historical best positions, of shape (M, N, d).
+    v : np.ndarray or None
+        The velocities of PSO, of shape (M, N, d), which are updated in place. If None, the update of CBOMemory is performed.
+    c : np.ndarray
+        The consensus, of shape (M, d).
+    z, z_memory : np.ndarray
+        Standard normal numbers, of shape (M, N, d), of the two noise terms.
+    lamda_dt, lamda_memory_dt : float
+        The products :math:`\lambda\, dt` and :math:`\lambda_{mem}\, dt`.
+    sigma_sqrt_dt, sigma_memory_sqrt_dt : float
+        The products :math:`\sigma \sqrt{dt}` and :math:`\sigma_{mem} \sqrt{dt}`.
+    anisotropic : bool
+        Whether the noise is anisotropic.
+    m_dt, v_scale, dt : float
+        The inertia :math:`m\, dt`, the factor :math:`1/(m + \gamma\, dt)` and the time step of PSO.
+    drift, memory_diff, s, s_memory : np.ndarray
+        The outputs of the drift, the difference to the historical best positions and the two noise terms.
+
+    Returns
+    -------
+    None
+    """
+    M, N, d = x.shape
+    for i in prange(M * N):
+        m, n = i // N, i % N
+        nrm = 0.
+        for k in range(d):
+            drift[m, n, k] = x[m, n, k] - c[m, k]
+            memory_diff[m, n, k] = x[m, n, k] - y[m, n, k]
+            nrm += drift[m, n, k]**2
+        nrm = np.sqrt(nrm)
+        for k in range(d):
+            eta = (drift[m, n, k] if anisotropic else nrm)
+            s[m, n, k] = sigma_sqrt_dt * eta * z[m, n, k]
+            s_memory[m, n, k] = sigma_memory_sqrt_dt * eta * z_memory[m, n, k]
+            if v is None:
+                x[m, n, k] += s[m, n, k] + s_memory[m, n, k] - lamda_dt * drift[m, n, k] - lamda_memory_dt * memory_diff[m, n, k]
+            else:
+                v[m, n, k] = (m_dt * v[m, n, k] + lamda_dt * drift[m, n, k] + lamda_memory_dt * memory_diff[m, n, k] +
+                              s[m, n, k] + s_memory[m, n, k]) * v_scale
+                x[m, n, k] += dt * v[m, n, k]
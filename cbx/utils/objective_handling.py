@@ -1,27 +1,49 @@
 import numpy as np
+import os
+import asyncio
+import inspect
+import queue
+import traceback
+import weakref
+from collections import OrderedDict
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
 #from typing import Callable, Any
 
-def _promote_objective(f, f_dim):
+def _promote_objective(f, f_dim, f_args = None):
     if not callable(f):
         raise TypeError("Objective function must be callable.")
-    if f_dim == '3D':
+    f_args = f_args if f_args is not None else {}
+    if f_dim == '1D-async' or (f_dim in ['1D', 'auto'] and inspect.iscoroutinefunction(f)):
+        return cbx_objective_f1D_async(f, **f_args)
+    elif inspect.iscoroutinefunction(f):
+        raise ValueError("Asynchronous objectives are only supported for f_dim='1D'.")
+    elif f_dim == 'auto':
+        return cbx_objective_auto(f, **f_args)
+    elif f_dim == '3D':
         return f
     elif f_dim == '2D':
         return cbx_objective_f2D(f)
     elif f_dim == '1D':
         return cbx_objective_f1D(f)
+    elif f_dim == '1D-threads':
+        return cbx_objective_f1D_threads(f, **f_args)
+    elif f_dim == '1D-processes':
+        return cbx_objective_f1D_processes(f, **f_args)
     else:
-        raise ValueError("f_dim must be '1D', '2D' or '3D'.")
+        raise ValueError("f_dim must be '1D', '2D', '3D', 'auto', '1D-threads', '1D-processes' or '1D-async'.")
 
 
 class cbx_objective:
     def __init__(self, f_extra=None):
         super().__init__()
         self.num_eval = 0
+        self.cache = None
         
     def __call__(self, x):
         """
-        Applies the objective function to the input x and counts th number of evaluations.
+        Applies the objective function to the input x and counts th number of evaluations. If a cache is set, 
+        see :meth:`set_cache`, only the particles that are not found in the cache are evaluated and counted.
 
         Parameters
         ----------
@@ -32,17 +54,124 @@ class cbx_objective:
         -------
         The output of the objective function.
         """
+        cache = getattr(self, 'cache', None)
+        if cache is not None:
+            if isinstance(x, np.ndarray):
+                return cache(self, x)
+            cache.last_num_eval = None # the cache is bypassed, all particles are evaluated
 
-        self.num_eval += np.prod(np.atleast_2d(x).shape[:-1], dtype = int)
+        # use the shape directly if possible, np.atleast_2d would copy non-numpy arrays
+        shape = x.shape if getattr(x, 'ndim', 0) > 1 else np.atleast_2d(x).shape
+        self.num_eval += np.prod(shape[:-1], dtype = int)
         return self.apply(x)
 
     def apply(self, x): 
         NotImplementedError(f"Objective [{type(self).__name__}] is missing the required \"apply\" function")
         
+    def set_cache(self, size = 10000, decimals = None):
+        """
+        Enables the memoization of the evaluations, see :class:`objective_cache`. If ``size`` is None, the cache is disabled.
+
+        Parameters
+        ----------
+        size : int, optional
+            The maximal number of cached particles. The default is 10000.
+        decimals : int, optional
+            The number of decimals, to which the particles are rounded before the lookup. The default is None, i.e., 
+            only bitwise identical particles are found.
+        """
+        self.cache = objective_cache(size = size, decimals = decimals) if size is not None else None
+        
     def reset(self,):
         self.num_eval = 0
+        if getattr(self, 'cache', None) is not None:
+            self.cache.clear()
+        
+        
+class objective_cache:
+    """
+    Size-bounded least-recently-used cache of objective evaluations
+
+    The particles are keyed by the bytes of their (optionally rounded) coordinates, such that repeated evaluations at 
+    the same point, e.g., of the consensus in :class:`cbx.correction.heavi_side_correction`, of the initial particles 
+    in :class:`cbx.dynamics.CBOMemory` or of particles that collapsed onto the same point, are looked up instead of 
+    evaluated. Identical particles within one call are only evaluated once. The missing particles are evaluated in a 
+    single call of the ``apply`` method of the objective, such that vectorized objectives stay vectorized.
+
+    The cache only supports ``numpy`` arrays, other arrays are always evaluated.
+
+    Parameters
+    ----------
+    size : int, optional
+        The maximal number of cached particles. The default is 10000.
+    decimals : int, optional
+        The number of decimals, to which the particles are rounded before the lookup. The default is None, i.e., 
+        only bitwise identical particles are found.
+
+    Attributes
+    ----------
+    hits : int
+        The number of particles that were found in the cache.
+    misses : int
+        The number of particles that were evaluated.
+    last_num_eval : np.ndarray
+        The number of evaluated particles per row of the last input, i.e., an array of the shape ``x.shape[:-2]``.
+    """
+    def __init__(self, size = 10000, decimals = None):
+        self.size = size
+        self.decimals = decimals
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.last_num_eval = None
         
+    def keys(self, x):
+        if self.decimals is not None:
+            x = np.round(x, self.decimals) + 0. # adding zero maps -0. to 0.
+        x = np.ascontiguousarray(x)
+        return [xi.tobytes() for xi in x]
         
+    def __call__(self, f, x):
+        x = np.atleast_2d(x)
+        xf = x.reshape(-1, x.shape[-1])
+        keys = self.keys(xf)
+        
+        out = np.empty((xf.shape[0],), dtype = x.dtype if x.dtype.kind == 'f' else float)
+        evaluated = np.zeros((xf.shape[0],), dtype = bool)
+        missing = {}
+        duplicates = []
+        for i, key in enumerate(keys):
+            if key in self.data:
+                out[i] = self.data[key]
+                self.data.move_to_end(key)
+            elif key in missing: # particles that appear more than once are only evaluated once
+                duplicates.append((i, missing[key]))
+            else:
+                missing[key] = i
+                evaluated[i] = True
+                
+        if missing:
+            idx = np.fromiter(missing.values(), dtype = int, count = len(missing))
+            out[idx] = np.asarray(f.apply(xf[idx][None, ...])).reshape(-1)
+            for key, i in missing.items():
+                self.data[key] = out[i]
+            while len(self.data) > self.size:
+                self.data.popitem(last = False)
+        for i, j in duplicates:
+            out[i] = out[j]
+        
+        num_new = len(missing)
+        self.misses += num_new
+        self.hits += len(keys) - num_new
+        f.num_eval += num_new
+        self.last_num_eval = evaluated.reshape(x.shape[:-1]).sum(axis = -1)
+        return out.reshape(x.shape[:-1])
+    
+    def clear(self,):
+        """Deletes all cached evaluations and resets the counters."""
+        self.__init__(size = self.size, decimals = self.decimals)
+        
+
 class cbx_objective_fh(cbx_objective):
     """
     Creates a cbx_objective from a function handle.
@@ -77,6 +206,449 @@ class cbx_objective_f1D(cbx_objective_fh):
         return np.apply_along_axis(self.f, 1, x.reshape(-1, x.shape[-1])).reshape(-1,x.shape[-2])
     
     
+class cbx_objective_auto(cbx_objective_fh):
+    """
+    Evaluates an objective function, that is given for single particles, with the fastest applicable strategy.
+
+    At the first call, the objective is probed on a few particles of the input, where the results are compared to the 
+    evaluation on each single particle. The first of the following strategies, which yields the same results, is used 
+    for all subsequent calls:
+
+    * ``'broadcast'``: the objective already broadcasts over the leading axes, as the objectives in :mod:`cbx.objectives`, 
+      and is called once on the whole array.
+    * ``'vectorize'``: the objective is wrapped with ``np.vectorize`` with the signature ``'(d)->()'``.
+    * ``'loop'``: the objective is applied to each particle, in chunks of ``chunksize`` particles, 
+      as in :class:`cbx_objective_f1D`.
+
+    The picked strategy is stored in the attribute ``strategy``. The evaluations of the probe are counted in ``num_eval``, 
+    the number of probe evaluations of the last call is stored in the attribute ``last_num_probe_eval``.
+
+    Parameters
+    ----------
+    f : Callable
+        The objective function, acting on arrays of shape (d,).
+    num_probe : int, optional
+        The maximal number of particles, on which the objective is probed. The default is 4.
+    chunksize : int, optional
+        The number of particles, that are passed to ``np.apply_along_axis`` at once, for the strategy ``'loop'``. 
+        The default is None, i.e., all particles at once.
+    """
+    def __init__(self, f, num_probe = 4, chunksize = None):
+        super().__init__(f)
+        self.num_probe = num_probe
+        self.chunksize = chunksize
+        self.strategy = None
+        self.last_num_probe_eval = 0
+        
+    def probe(self, x):
+        """
+        Picks the strategy, by comparing the evaluation on the first particles of x to the evaluation on each single particle.
+        The number of evaluations, including the ones of failed strategies, is stored in ``last_num_probe_eval``.
+
+        Parameters
+        ----------
+        x
+            The input of shape (..., d).
+        
+        Returns
+        -------
+        str
+            The picked strategy, one of ``'broadcast'``, ``'vectorize'`` or ``'loop'``.
+        """
+        x = np.atleast_2d(x)
+        xf = x.reshape(-1, x.shape[-1])[:self.num_probe]
+        # use two leading axes, to detect objectives that only handle arrays of shape (N, d)
+        xp = xf[:(xf.shape[0]//2) * 2].reshape(2, -1, x.shape[-1]) if xf.shape[0] > 1 else xf[None, ...]
+        ref = np.array([np.asarray(self.f(xi), dtype=float).item() for xi in xp.reshape(-1, x.shape[-1])]).reshape(xp.shape[:-1])
+        self.last_num_probe_eval = ref.size
+        
+        for strategy in ['broadcast', 'vectorize']:
+            self.last_num_probe_eval += ref.size
+            try:
+                res = np.asarray(self.apply_strategy(xp, strategy), dtype=float)
+            except Exception:
+                continue
+            if res.shape == ref.shape and np.allclose(res, ref, equal_nan=True):
+                return strategy
+        return 'loop'
+    
+    def apply_strategy(self, x, strategy):
+        if strategy == 'broadcast':
+            return self.f(x)
+        elif strategy == 'vectorize':
+            return np.vectorize(self.f, signature='(d)->()')(x)
+        
+        xf = x.reshape(-1, x.shape[-1])
+        chunksize = self.chunksize if self.chunksize is not None else max(xf.shape[0], 1)
+        return np.concatenate([np.apply_along_axis(self.f, 1, xf[i:i + chunksize]) 
+                               for i in range(0, xf.shape[0], chunksize)]).reshape(x.shape[:-1])
+    
+    def apply(self, x):
+        x = np.atleast_2d(x)
+        self.last_num_probe_eval = 0
+        if self.strategy is None:
+            self.strategy = self.probe(x)
+            self.num_eval += self.last_num_probe_eval
+        return self.apply_strategy(x, self.strategy).reshape(-1, x.shape[-2])
+    
+    
+class cbx_objective_f1D_threads(cbx_objective_f1D):
+    """
+    Evaluates an objective function, that acts on single particles, concurrently on a pool of threads.
+
+    This is useful for expensive objectives, that release the GIL, e.g., simulations implemented in C extensions. 
+    The particles are split into contiguous chunks, which are evaluated by the threads, where each thread writes 
+    its results directly into the output array. Therefore, the order of the output is the same as for :class:`cbx_objective_f1D`. 
+    The thread pool is created at the first call and is reused for all subsequent evaluations.
+
+    Parameters
+    ----------
+    f : Callable
+        The objective function, acting on arrays of shape (d,).
+    workers : int, optional
+        The number of threads. The default is the number of CPUs.
+    chunksize : int, optional
+        The number of particles, that are evaluated in one task. The default is chosen such that each thread 
+        receives about four tasks.
+    """
+    def __init__(self, f, workers = None, chunksize = None):
+        super().__init__(f)
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunksize = chunksize
+        self.executor = None
+        
+    def apply(self, x):
+        x = np.atleast_2d(x)
+        xf = x.reshape(-1, x.shape[-1])
+        n = xf.shape[0]
+        out = np.empty((n,), dtype = x.dtype if x.dtype.kind == 'f' else float)
+        
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers = self.workers)
+        chunksize = self.chunksize if self.chunksize is not None else max(1, -(-n // (4 * self.workers)))
+        
+        def eval_chunk(start, stop):
+            for i in range(start, stop):
+                out[i] = self.f(xf[i])
+                
+        futures = [self.executor.submit(eval_chunk, start, min(start + chunksize, n)) for start in range(0, n, chunksize)]
+        for future in futures:
+            future.result() # raises the exceptions of the threads
+        return out.reshape(-1, x.shape[-2])
+    
+    def close(self,):
+        """Shuts down the thread pool."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            
+    def __getstate__(self,):
+        state = self.__dict__.copy()
+        state['executor'] = None # the pool is recreated on the next call
+        return state
+    
+    
+def _import_shared_memory():
+    """Imports :class:`multiprocessing.shared_memory.SharedMemory`, which is only available for Python >= 3.8."""
+    try:
+        from multiprocessing.shared_memory import SharedMemory
+    except ImportError as e:
+        raise ImportError(
+            "The objective mode '1D-processes' requires multiprocessing.shared_memory, " +
+            "which is only available for Python >= 3.8."
+        ) from e
+    return SharedMemory
+    
+def _process_worker(f, idx, gen, task_queue, result_queue):
+    """Main loop of the worker processes of :class:`cbx_objective_f1D_processes`."""
+    SharedMemory = _import_shared_memory()
+    shms = {}
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        call_id, task_id, in_name, out_name, shape, dtype, start, stop = task
+        try:
+            for name in (in_name, out_name):
+                if name not in shms:
+                    shms[name] = SharedMemory(name=name)
+            x = np.ndarray(shape, dtype=dtype, buffer=shms[in_name].buf)
+            out = np.ndarray((shape[0],), dtype=float, buffer=shms[out_name].buf)
+            for i in range(start, stop):
+                out[i] = f(x[i])
+            del x, out
+            result_queue.put((idx, gen, call_id, task_id, None))
+        except Exception:
+            result_queue.put((idx, gen, call_id, task_id, traceback.format_exc()))
+    for shm in shms.values():
+        shm.close()
+        
+def _shutdown_processes(state):
+    """Stops the workers and releases the shared memory of :class:`cbx_objective_f1D_processes`."""
+    for w in state['workers']:
+        if w is not None and w[0].is_alive():
+            w[1].put(None)
+    for w in state['workers']:
+        if w is not None:
+            w[0].join(timeout=5)
+            if w[0].is_alive():
+                w[0].terminate()
+    state['workers'] = []
+    for shm in state['shms'].values():
+        shm.close()
+        shm.unlink()
+    state['shms'] = {}
+    
+
+class cbx_objective_f1D_processes(cbx_objective_f1D):
+    """
+    Evaluates an objective function, that acts on single particles, on a persistent pool of worker processes.
+
+    This is useful for expensive objectives, that hold the GIL, e.g., objectives implemented in pure Python. 
+    Instead of pickling the particles, they are copied into a buffer in shared memory, from which the workers read 
+    their chunks. The energies are written back into a second shared buffer, at the position of the particle, 
+    such that the output has the same order as for :class:`cbx_objective_f1D`. 
+    
+    The chunks are scheduled dynamically, i.e., each worker receives a new chunk once it has finished the previous one. 
+    If a worker process dies, e.g., because of a crash in an extension, it is restarted and its chunk is evaluated again,
+    up to ``max_retries`` times. Exceptions raised by the objective are re-raised in the main process.
+
+    The workers are started at the first call and are stopped by :meth:`close`, or when the object is garbage collected.
+    This mode requires :mod:`multiprocessing.shared_memory`, i.e., Python >= 3.8.
+
+    Parameters
+    ----------
+    f : Callable
+        The objective function, acting on arrays of shape (d,). It must be picklable, if the start method is not ``'fork'``.
+    workers : int, optional
+        The number of worker processes. The default is the number of CPUs.
+    chunksize : int, optional
+        The number of particles, that are evaluated in one task. The default is chosen such that each worker 
+        receives about four tasks.
+    start_method : str, optional
+        The start method of the processes, see :mod:`multiprocessing`. The default is the default of the platform.
+    max_retries : int, optional
+        The number of times a chunk is evaluated again, if the evaluating worker died. The default is 2.
+    poll_interval : float, optional
+        The interval in seconds, at which the liveness of the workers is checked while waiting. The default is 0.1.
+    """
+    def __init__(self, f, workers = None, chunksize = None, start_method = None, max_retries = 2, poll_interval = 0.1):
+        super().__init__(f)
+        _import_shared_memory() # fail early on Python < 3.8
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.chunksize = chunksize
+        self.start_method = start_method
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.call_id = 0
+        self.init_state()
+        
+    def init_state(self,):
+        self.ctx = mp.get_context(self.start_method)
+        self.result_queue = None
+        # the state is shared with the finalizer, which stops the workers
+        self.state = {'workers': [], 'shms': {}}
+        self._finalizer = weakref.finalize(self, _shutdown_processes, self.state)
+        
+    def start_worker(self, idx):
+        old = self.state['workers'][idx]
+        gen = 0 if old is None else old[2] + 1
+        task_queue = self.ctx.SimpleQueue()
+        p = self.ctx.Process(target=_process_worker, args=(self.f, idx, gen, task_queue, self.result_queue), daemon=True)
+        p.start()
+        self.state['workers'][idx] = (p, task_queue, gen)
+        
+    def get_shm(self, name, nbytes):
+        shm = self.state['shms'].get(name, None)
+        if shm is None or shm.size < nbytes:
+            SharedMemory = _import_shared_memory()
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = SharedMemory(create=True, size=max(nbytes, 1))
+            self.state['shms'][name] = shm
+        return shm
+        
+    def apply(self, x):
+        x = np.atleast_2d(x)
+        xf = x.reshape(-1, x.shape[-1])
+        n = xf.shape[0]
+        
+        # publish the particles in shared memory, the buffers are created before the workers are started, 
+        # such that the workers share the resource tracker of the main process
+        shm_in = self.get_shm('x', xf.nbytes)
+        shm_out = self.get_shm('energy', n * np.dtype(float).itemsize)
+        np.ndarray(xf.shape, dtype=xf.dtype, buffer=shm_in.buf)[...] = xf
+        
+        if self.result_queue is None:
+            self.result_queue = self.ctx.Queue()
+            self.state['workers'] = [None] * self.workers
+        for idx, w in enumerate(self.state['workers']):
+            if w is None or not w[0].is_alive():
+                self.start_worker(idx)
+        
+        chunksize = self.chunksize if self.chunksize is not None else max(1, -(-n // (4 * self.workers)))
+        chunks = [(start, min(start + chunksize, n)) for start in range(0, n, chunksize)]
+        self.call_id += 1
+        pending = list(range(len(chunks)))[::-1]
+        inflight = {}
+        retries = [0] * len(chunks)
+        done = 0
+        
+        def submit(idx):
+            if pending:
+                task_id = pending.pop()
+                inflight[idx] = task_id
+                start, stop = chunks[task_id]
+                self.state['workers'][idx][1].put(
+                    (self.call_id, task_id, shm_in.name, shm_out.name, xf.shape, xf.dtype.str, start, stop))
+        
+        for idx in range(self.workers):
+            submit(idx)
+        
+        while done < len(chunks):
+            try:
+                idx, gen, call_id, task_id, err = self.result_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                # restart dead workers and reschedule their chunks
+                for idx, w in enumerate(self.state['workers']):
+                    if not w[0].is_alive():
+                        task_id = inflight.pop(idx, None)
+                        if task_id is not None:
+                            retries[task_id] += 1
+                            if retries[task_id] > self.max_retries:
+                                raise RuntimeError('Worker process died ' + str(retries[task_id]) + 
+                                                   ' times while evaluating particles ' + str(chunks[task_id]) + '.') from None
+                            pending.append(task_id)
+                        self.start_worker(idx)
+                        submit(idx)
+                continue
+            
+            if call_id != self.call_id or gen != self.state['workers'][idx][2]:
+                continue # stale result of a previous call or of a restarted worker
+            if err is not None:
+                self.close() # stop the remaining chunks, which would otherwise write into the buffers of the next call
+                raise RuntimeError('Evaluation of the objective failed in a worker process:\n' + err)
+            inflight.pop(idx, None)
+            done += 1
+            submit(idx)
+            
+        return np.ndarray((n,), dtype=float, buffer=shm_out.buf).astype(
+            x.dtype if x.dtype.kind == 'f' else float).reshape(-1, x.shape[-2])
+    
+    def close(self,):
+        """Stops the worker processes and releases the shared memory."""
+        _shutdown_processes(self.state)
+        self.result_queue = None
+        
+    def __getstate__(self,):
+        state = self.__dict__.copy()
+        for key in ['ctx', 'result_queue', 'state', '_finalizer']:
+            state.pop(key)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.init_state()
+    
+    
+class cbx_objective_f1D_async(cbx_objective_f1D):
+    """
+    Evaluates an asynchronous objective function, that acts on single particles, concurrently on an event loop.
+
+    This is useful for objectives, that wait for external resources, e.g., a simulation server that is queried over 
+    the network. The objective is an ``async def`` function (or any callable returning an awaitable), the evaluations 
+    of all particles that are passed in one call, i.e., the particles of the current ``consensus_idx`` batch, are gathered 
+    concurrently, where at most ``max_concurrency`` evaluations are pending at the same time. Each evaluation is 
+    cancelled after ``timeout`` seconds and is retried up to ``retries`` times, if it failed or timed out. The output 
+    has the same order as for :class:`cbx_objective_f1D`.
+
+    When called synchronously, e.g., in :meth:`ParticleDynamic.optimize`, the evaluations of each call run on a new 
+    event loop. Objectives, which rely on resources bound to a specific event loop, e.g., an open client session, 
+    should be used with :meth:`ParticleDynamic.optimize_async` instead, which schedules the evaluations on the running 
+    event loop of the caller, see :meth:`set_loop`.
+
+    Parameters
+    ----------
+    f : Callable
+        The asynchronous objective function, acting on arrays of shape (d,).
+    max_concurrency : int, optional
+        The maximum number of pending evaluations. The default is 32.
+    timeout : float, optional
+        The timeout of a single evaluation in seconds. The default is None, i.e., no timeout.
+    retries : int, optional
+        The number of times a failed evaluation is repeated, before the exception is raised. The default is 0.
+    """
+    def __init__(self, f, max_concurrency = 32, timeout = None, retries = 0):
+        super().__init__(f)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.loop = None
+        
+    def set_loop(self, loop):
+        """
+        Sets the event loop, on which the evaluations are scheduled, if the objective is called from another thread.
+        If ``loop`` is None, each synchronous call runs on a new event loop.
+        """
+        self.loop = loop
+        
+    async def eval_particle(self, x, semaphore):
+        for attempt in range(self.retries + 1):
+            try:
+                async with semaphore:
+                    return await asyncio.wait_for(self.f(x), self.timeout)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                
+    async def apply_async(self, x):
+        """
+        Evaluates the objective concurrently on all particles of x.
+
+        Parameters
+        ----------
+        x
+            The input of shape (..., N, d).
+        
+        Returns
+        -------
+        The energies of shape (-1, N).
+        """
+        x = np.atleast_2d(x)
+        xf = x.reshape(-1, x.shape[-1])
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self.eval_particle(xf[i], semaphore)) for i in range(xf.shape[0])]
+        try:
+            energy = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks: # do not leave pending evaluations behind
+                task.cancel()
+            raise
+        return np.asarray(energy, dtype = x.dtype if x.dtype.kind == 'f' else float).reshape(-1, x.shape[-2])
+        
+    def apply(self, x):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+            
+        if self.loop is not None and self.loop is not running_loop and self.loop.is_running():
+            # called from a worker thread, e.g., in optimize_async
+            return asyncio.run_coroutine_threadsafe(self.apply_async(x), self.loop).result()
+        elif running_loop is None:
+            return asyncio.run(self.apply_async(x))
+        else:
+            # a nested loop can not run in a thread that already runs an event loop
+            with ThreadPoolExecutor(max_workers = 1) as executor:
+                return executor.submit(asyncio.run, self.apply_async(x)).result()
+    
+    def __getstate__(self,):
+        state = self.__dict__.copy()
+        state['loop'] = None
+        return state
+    
+    
 class cbx_objective_f2D(cbx_objective_fh):
     """
     A class for handling 2D objective functions.
@@ -2,7 +2,10 @@ import numpy as np
 from typing import Callable, List
 
 def apply_resampling_default(dyn, idx):
-    z = dyn.normal(0, 1., size=(len(idx), dyn.N, *dyn.d))
+    if getattr(dyn, 'run_rng', None) is not None: # use the resampling streams of the runs
+        z = dyn.backend.asarray(dyn.run_rng.normal(dyn.run_ids[idx], 'resample', (dyn.N, *dyn.d)))
+    else:
+        z = dyn.normal(0, 1., size=(len(idx), dyn.N, *dyn.d))
     dyn.x[idx, ...] += dyn.sigma * np.sqrt(dyn.dt) * z
 
 class resampling:
@@ -0,0 +1,329 @@
+import numpy as np
+from numpy.random import Generator, SeedSequence, PCG64, Philox
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Union, Sequence
+
+def global_seed() -> np.ndarray:
+    """
+    Draws a seed for a new generator from the global ``numpy`` random state, such that ``np.random.seed`` makes the generator 
+    reproducible. The seed is drawn with the explicit dtype ``uint64``, since the default integer of ``numpy < 2`` on Windows 
+    is ``int32``, for which the bound ``2**32`` is out of range.
+
+    Returns
+    -------
+    np.ndarray
+        The seed, four integers in ``[0, 2**32)``.
+    """
+    return np.random.randint(0, 2**32, size=4, dtype=np.uint64)
+
+class run_generators:
+    r"""Independent random number streams for each run
+
+    This class derives one ``numpy`` :class:`Generator` for each run and each purpose of the random numbers, i.e.,
+    the initialization of the particles ``'init'``, the noise ``'noise'``, the batching ``'batch'`` and the
+    resampling ``'resample'``. The generator of the run with id :math:`m` and the purpose :math:`p` is seeded with the
+    child ``SeedSequence(entropy, spawn_key=spawn_key + (m, p))`` of the given seed sequence. Therefore, the random
+    numbers of a run only depend on the seed and the id of the run, and not on the other runs, e.g., whether the runs
+    are performed in one dynamic or distributed over several processes.
+
+    Parameters
+    ----------
+    seed : int or SeedSequence
+        The root seed of all streams.
+    M : int, optional
+        The number of runs. The default is 1.
+    run_ids : Sequence[int], optional
+        The global ids of the runs, i.e., the ``m``-th run of a dynamic uses the streams of the id ``run_ids[m]``. This
+        allows to split a set of runs into several dynamics, e.g., ``run_ids=range(4, 8)`` for the second half of 8 runs.
+        The default is ``range(M)``.
+    bit_generator : str, optional
+        The bit generator of the streams, either ``'PCG64'`` or ``'Philox'``. The default is ``'PCG64'``.
+
+    Examples
+    --------
+    >>> from cbx.dynamics import CBO
+    >>> dyn = CBO(f, d=2, M=8, seed=42)
+    >>> dyn_half = CBO(f, d=2, M=4, seed=run_generators(42, run_ids=range(4, 8)))
+
+    Here, the runs of ``dyn_half`` are identical to the last four runs of ``dyn``.
+    """
+    purposes = {'init': 0, 'noise': 1, 'batch': 2, 'resample': 3}
+    bit_generators = {'PCG64': PCG64, 'Philox': Philox}
+
+    def __init__(self,
+                 seed: Union[int, SeedSequence],
+                 M: int = 1,
+                 run_ids: Sequence[int] = None,
+                 bit_generator: str = 'PCG64'):
+        self.seed_seq = seed if isinstance(seed, SeedSequence) else SeedSequence(seed)
+        self.run_ids = np.arange(M) if run_ids is None else np.asarray(run_ids, dtype=int)
+        self.M = len(self.run_ids)
+        if bit_generator not in self.bit_generators:
+            raise ValueError('Unknown bit generator: ' + str(bit_generator) + '! Choose from ' + str(list(self.bit_generators)))
+        self.bit_generator = self.bit_generators[bit_generator]
+        self.generators = {}
+
+    def get(self, purpose: str) -> list:
+        """
+        Returns the generators of all runs for the given purpose, these are created at the first request.
+
+        Parameters
+        ----------
+        purpose : str
+            One of ``'init'``, ``'noise'``, ``'batch'`` or ``'resample'``.
+
+        Returns
+        -------
+        list
+            The generators, where the m-th entry belongs to the m-th run.
+        """
+        gens = self.generators.get(purpose, None)
+        if gens is None:
+            p = self.purposes[purpose]
+            gens = [Generator(self.bit_generator(SeedSequence(self.seed_seq.entropy,
+                                                               spawn_key=self.seed_seq.spawn_key + (int(m), p))))
+                    for m in self.run_ids]
+            self.generators[purpose] = gens
+        return gens
+
+    def normal(self, runs, purpose: str, size: tuple, loc: float = 0., scale: float = 1., dtype = np.float64) -> np.ndarray:
+        """
+        Samples normally distributed numbers, one array of shape ``size`` from the stream of each run.
+
+        Parameters
+        ----------
+        runs : Sequence[int]
+            The local indices of the runs, i.e., ``0 <= runs[i] < M``.
+        purpose : str
+            The purpose of the random numbers.
+        size : tuple
+            The shape of the sample of one run.
+        loc : float, optional
+            The mean. The default is 0.
+        scale : float, optional
+            The standard deviation. The default is 1.
+        dtype : optional
+            The dtype of the samples, either ``float64`` or ``float32``, which are sampled directly in this precision. 
+            The default is ``float64``.
+
+        Returns
+        -------
+        np.ndarray
+            The samples of shape ``(len(runs), *size)``.
+        """
+        gens = self.get(purpose)
+        z = np.empty((len(runs),) + tuple(size), dtype=dtype)
+        for i, m in enumerate(runs):
+            gens[m].standard_normal(out=z[i, ...], dtype=dtype)
+        if scale != 1.:
+            z *= scale
+        if loc != 0.:
+            z += loc
+        return z
+
+    def uniform(self, runs, purpose: str, size: tuple, low: float = 0., high: float = 1.) -> np.ndarray:
+        """
+        Samples uniformly distributed numbers in ``[low, high)``, one array of shape ``size`` from the stream of each run.
+
+        Parameters
+        ----------
+        runs : Sequence[int]
+            The local indices of the runs.
+        purpose : str
+            The purpose of the random numbers.
+        size : tuple
+            The shape of the sample of one run.
+        low : float, optional
+            The lower bound. The default is 0.
+        high : float, optional
+            The upper bound. The default is 1.
+
+        Returns
+        -------
+        np.ndarray
+            The samples of shape ``(len(runs), *size)``.
+        """
+        gens = self.get(purpose)
+        return np.stack([gens[m].uniform(low, high, size=size) for m in runs]) if len(runs) > 0 else np.empty((0,) + tuple(size))
+
+    def permuted(self, runs, purpose: str, a: np.ndarray) -> np.ndarray:
+        """
+        Permutes each row ``a[i, :]`` with the stream of the run ``runs[i]``.
+
+        Parameters
+        ----------
+        runs : Sequence[int]
+            The local indices of the runs, one for each row of ``a``.
+        purpose : str
+            The purpose of the random numbers.
+        a : np.ndarray
+            The array of shape ``(len(runs), n)``.
+
+        Returns
+        -------
+        np.ndarray
+            The permuted array.
+        """
+        gens = self.get(purpose)
+        out = np.empty_like(a)
+        for i, m in enumerate(runs):
+            out[i, :] = gens[m].permuted(a[i, :])
+        return out
+
+    def get_state(self,) -> dict:
+        """Returns the states of all generators, that were created so far."""
+        return {purpose: [g.bit_generator.state for g in gens] for purpose, gens in self.generators.items()}
+
+    def set_state(self, state: dict) -> None:
+        """Restores the states of the generators, that were returned by :meth:`get_state`."""
+        self.generators = {} # generators, that were not created, are in their initial state
+        for purpose, states in state.items():
+            gens = self.get(purpose)
+            for m, s in enumerate(states):
+                gens[m].bit_generator.state = s
+
+class normal_buffer:
+    r"""Normal sampler with block-pregenerated random numbers
+
+    This class can be used as the ``normal`` callable of a dynamic, e.g., ``CBO(f, d=2, normal=normal_buffer())``. Instead of
+    sampling new random numbers in every step, standard normal numbers for ``num_steps`` calls are generated at once into a
+    flat buffer. Every call returns a view of the next slice of the buffer, such that no array is allocated, if ``loc=0``
+    and ``scale=1``. Noise models, that implement a ``fill`` method for the workspace mode, copy the slice directly into
+    their output via :meth:`fill`.
+
+    The numbers are drawn from the generator ``rng`` in the same order, as by calling ``rng.standard_normal(size)`` in
+    every step. Therefore, the distribution of the samples is exactly the same as for the sampling without a buffer, and
+    if the size of the requests does not change, even the samples themselves. If a request does not fit into the rest of
+    the current block, the rest is discarded, which does not change the distribution of the samples.
+
+    Parameters
+    ----------
+    rng : Generator, optional
+        The generator of the random numbers. The default is a generator, that is seeded from the global ``numpy`` random
+        state, such that ``np.random.seed`` before the creation of the buffer makes the samples reproducible. Note that
+        the per-run streams of a dynamic with a ``seed`` replace the ``normal`` callable, i.e., the buffer is not used then.
+    num_steps : int, optional
+        The number of requests, that are pregenerated at once. The size of a block is ``num_steps`` times the size of the
+        first request, or of the first request, that does not fit into a block. The default is 100.
+    background : bool, optional
+        If ``True``, the next block is generated by a background thread, while the current block is consumed. The default
+        is ``False``.
+    dtype : optional
+        The dtype of the samples, either ``float64`` or ``float32``. The default is ``float64``.
+
+    The state of the generator and the buffer, including the position, is returned by :meth:`get_state`, which is stored
+    in the checkpoints of a dynamic, see :meth:`cbx.dynamics.ParticleDynamic.save_checkpoint`.
+
+    Note
+    ----
+    The returned arrays are views of the buffer. A block is never refilled, instead each block is generated into a new
+    array, such that the views stay valid, also in the background mode.
+    """
+    def __init__(self,
+                 rng: Generator = None,
+                 num_steps: int = 100,
+                 background: bool = False,
+                 dtype = np.float64):
+        self.rng = rng if rng is not None else np.random.default_rng(global_seed())
+        self.num_steps = num_steps
+        self.dtype = np.dtype(dtype)
+        self.executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self.buffer = np.empty((0,), dtype=self.dtype)
+        self.pos = 0
+        self.next_buffer = None # the block, that is generated in the background
+
+    def __call__(self, loc = 0., scale = 1., size = None):
+        n, shape = self.get_size(size)
+        z = self.take(n).reshape(shape)
+        if scale != 1.:
+            z = z * scale
+        if loc != 0.:
+            z = z + loc
+        return z if size is not None else z[()]
+
+    def fill(self, out: np.ndarray) -> np.ndarray:
+        """
+        Writes standard normal numbers into the array ``out``.
+
+        Parameters
+        ----------
+        out : np.ndarray
+            The output array.
+
+        Returns
+        -------
+        np.ndarray
+            The array ``out``.
+        """
+        out[...] = self.take(out.size).reshape(out.shape)
+        return out
+
+    @staticmethod
+    def get_size(size):
+        if size is None:
+            return 1, ()
+        shape = (size,) if isinstance(size, int) else tuple(size)
+        return int(np.prod(shape)), shape
+
+    def take(self, n: int) -> np.ndarray:
+        """
+        Returns a view of the next ``n`` numbers of the buffer, where a new block is generated, if the current one is exhausted.
+
+        Parameters
+        ----------
+        n : int
+            The number of random numbers.
+
+        Returns
+        -------
+        np.ndarray
+            The flat view of the numbers.
+        """
+        if self.pos + n > self.buffer.shape[0]:
+            self.next_block(n)
+        z = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return z
+
+    def next_block(self, n: int) -> None:
+        if self.next_buffer is not None:
+            buffer = self.next_buffer.result()
+            self.next_buffer = None
+            if buffer.shape[0] < n: # the pregenerated block is too small for this request
+                buffer = self.generate(np.empty((self.num_steps * n,), dtype=self.dtype))
+        else:
+            size = self.buffer.shape[0] if self.buffer.shape[0] >= n else self.num_steps * n
+            buffer = self.generate(np.empty((size,), dtype=self.dtype))
+
+        if self.executor is not None: # a new array, views of the old block may still be used by the caller
+            self.next_buffer = self.executor.submit(self.generate, np.empty_like(buffer))
+        self.buffer = buffer
+        self.pos = 0
+
+    def generate(self, out: np.ndarray) -> np.ndarray:
+        return self.rng.standard_normal(out=out, dtype=self.dtype)
+
+    def get_state(self,) -> dict:
+        """Returns the state of the generator, the current block, the position in it and the pregenerated next block."""
+        next_buffer = self.next_buffer.result() if self.next_buffer is not None else None
+        return {'rng': self.rng.bit_generator.state, 'buffer': self.buffer.copy(), 'pos': self.pos, 
+                'next_buffer': next_buffer.copy() if next_buffer is not None else None}
+
+    def set_state(self, state: dict) -> None:
+        """Restores the state, that was returned by :meth:`get_state`."""
+        if self.next_buffer is not None:
+            self.next_buffer.result() # wait for the background thread, before the generator is changed
+        self.rng.bit_generator.state = state['rng']
+        self.buffer = np.array(state['buffer'], dtype=self.dtype)
+        self.pos = state['pos']
+        self.next_buffer = None
+        if state['next_buffer'] is not None:
+            self.next_buffer = Future()
+            self.next_buffer.set_result(np.array(state['next_buffer'], dtype=self.dtype))
+
+    def close(self,) -> None:
+        """Stops the background thread."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            self.next_buffer = None
@@ -0,0 +1,232 @@
+r"""
+Sharding
+========
+
+This module implements the building blocks of the sharded mode of a dynamic, where each worker owns a slice of the
+:math:`N` particles of every run, see :class:`cbx.dynamics.ShardedDynamic`. The consensus point
+
+.. math::
+
+    c(x) = \frac{\sum_{n} \exp(-\alpha f(x_n)) x_n}{\sum_{n} \exp(-\alpha f(x_n))}
+
+decomposes into sums over the shards. Each shard :math:`k` computes the triple of the maximal weight
+:math:`m_k = \max_{n} -\alpha f(x_n)`, the normalizer :math:`s_k = \sum_{n} \exp(-\alpha f(x_n) - m_k)` and the weighted
+sum :math:`v_k = \sum_{n} \exp(-\alpha f(x_n) - m_k) x_n`, where :math:`n` runs over the particles of the shard. With
+:math:`m = \max_k m_k`, the global consensus is then given by
+
+.. math::
+
+    c(x) = \frac{\sum_k \exp(m_k - m) v_k}{\sum_k \exp(m_k - m) s_k},
+
+which is evaluated in a numerically stable way. Therefore, the shards only exchange :math:`\mathcal{O}(M\cdot d)` numbers
+per step, independent of the number of particles.
+
+The termination criteria are synchronized in the same way, see :class:`sync_termination`, such that all shards 
+terminate every run at the same iteration.
+
+The exchange is performed by a communicator, which provides the attributes ``rank`` and ``size`` and the method
+``allgather(obj)``, that returns the list of the objects of all ranks, ordered by rank. Besides the communicators of this
+module, an ``mpi4py`` communicator, e.g., ``MPI.COMM_WORLD``, can be used directly.
+"""
+
+import numpy as np
+import queue
+from functools import partial
+from typing import Callable
+
+from .backend import numpy_backend
+
+class local_communicator:
+    """Communicator of a single rank, i.e., without any communication."""
+    rank = 0
+    size = 1
+
+    def allgather(self, obj) -> list:
+        return [obj]
+
+    def abort(self,) -> None:
+        pass
+
+class queue_communicator:
+    """
+    Communicator of processes on the local machine, that exchange messages via ``multiprocessing`` queues.
+
+    The queues must be created before the processes are started, e.g., with ``ctx.Queue()`` for each rank, and all
+    processes receive the full list of queues.
+
+    Parameters
+    ----------
+    rank : int
+        The rank of this process.
+    queues : list
+        The queues of all ranks, where ``queues[r]`` receives the messages of the rank ``r``.
+    timeout : float, optional
+        The maximal time in seconds, that :meth:`allgather` waits for a message. The default is None, i.e., no limit.
+    """
+    def __init__(self, rank: int, queues: list, timeout: float = None):
+        self.rank = rank
+        self.size = len(queues)
+        self.queues = queues
+        self.timeout = timeout
+        self.round = 0
+        self.pending = {}
+
+    def allgather(self, obj) -> list:
+        """
+        Sends ``obj`` to all other ranks and receives their objects.
+
+        Parameters
+        ----------
+        obj
+            A picklable object.
+
+        Returns
+        -------
+        list
+            The objects of all ranks, ordered by rank.
+        """
+        self.round += 1
+        for r, q in enumerate(self.queues):
+            if r != self.rank:
+                q.put((self.round, self.rank, obj))
+
+        res = [None] * self.size
+        res[self.rank] = obj
+        missing = set(range(self.size)) - {self.rank}
+        for r in list(missing): # messages of this round, that were received in a previous round
+            if (self.round, r) in self.pending:
+                res[r] = self.pending.pop((self.round, r))
+                missing.remove(r)
+        while missing:
+            try:
+                rnd, r, msg = self.queues[self.rank].get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError('Rank ' + str(self.rank) + ' timed out while waiting for the ranks ' + str(sorted(missing))) from None
+            if rnd is None:
+                raise RuntimeError('Rank ' + str(r) + ' aborted!')
+            if rnd == self.round:
+                res[r] = msg
+                missing.remove(r)
+            else: # a faster rank already sent the message of the next round
+                self.pending[(rnd, r)] = msg
+        return res
+
+    def abort(self,) -> None:
+        """Notifies all other ranks, that this rank failed, such that they do not wait for it."""
+        for r, q in enumerate(self.queues):
+            if r != self.rank:
+                q.put((None, self.rank, None))
+
+def merge_consensus(triples: list) -> np.ndarray:
+    """
+    Merges the per-shard triples of the maximal weight, the normalizer and the weighted sum to the global consensus.
+
+    Parameters
+    ----------
+    triples : list
+        The triples ``(m, s, v)`` of all shards, with shapes (M, 1), (M, 1) and (M, 1, ...).
+
+    Returns
+    -------
+    np.ndarray
+        The consensus, of shape (M, 1, ...).
+    """
+    m = np.max(np.stack([t[0] for t in triples]), axis=0)
+    s = 0.
+    v = 0.
+    for m_k, s_k, v_k in triples:
+        scale = np.exp(m_k - m)
+        s = s + scale * s_k
+        v = v + scale[(Ellipsis,) + (None,) * (v_k.ndim - 2)] * v_k
+    return v / s[(Ellipsis,) + (None,) * (v.ndim - 2)]
+
+class compute_consensus_sharded:
+    """
+    Consensus computation of a sharded dynamic, which can be used as the ``compute_consensus`` argument of a dynamic.
+    The local triple of the shard is exchanged with the communicator ``comm`` and the exact global consensus is returned,
+    see the module documentation.
+
+    Parameters:
+        comm: The communicator. Default: :class:`local_communicator`.
+        backend (backend, optional): The array backend. Default: numpy.
+    """
+    def __init__(self, comm = None, backend = None):
+        self.comm = comm if comm is not None else local_communicator()
+        self.backend = backend if backend is not None else numpy_backend()
+
+    def local_triple(self, energy, x, alpha) -> tuple:
+        """
+        Computes the triple ``(m, s, v)`` of the particles of this shard.
+
+        Parameters:
+            energy: The energies of the particles, of shape (M, N).
+            x: The particles, of shape (M, N, ...).
+            alpha: The alpha parameter, of shape (M, 1).
+
+        Returns:
+            tuple: The triple as ``numpy`` arrays, with ``m`` and ``s`` in double precision.
+        """
+        weights = self.backend.astype(- alpha * energy, self.backend.float64)
+        m = self.backend.max(weights, axis=-1)[..., None]
+        e = self.backend.exp(weights - m)
+        s = self.backend.sum(e, axis=-1, keepdims=True)
+        coeff_expan = tuple([Ellipsis] + [None for i in range(x.ndim-2)])
+        v = (x * self.backend.astype(e, x.dtype)[coeff_expan]).sum(axis=1, keepdims=True)
+        to_numpy = self.backend.to_numpy
+        return np.asarray(to_numpy(m)), np.asarray(to_numpy(s)), np.asarray(to_numpy(v))
+
+    def __call__(self, energy, x, alpha):
+        triples = self.comm.allgather(self.local_triple(energy, x, alpha))
+        c = merge_consensus(triples)
+        return self.backend.asarray(c.astype(triples[0][2].dtype, copy=False), like=x), energy
+
+class sync_best_particle:
+    """
+    Post processing of a sharded dynamic, that replaces the best particle and its energy of every run by the best over all
+    shards, such that termination criteria based on ``best_energy`` terminate all shards at the same iteration.
+
+    Parameters:
+        comm: The communicator.
+        post_process (Callable, optional): The post processing of the dynamic, that is applied first. Default: None.
+    """
+    def __init__(self, comm, post_process: Callable = None):
+        self.comm = comm
+        self.post_process = post_process
+
+    def __call__(self, dyn) -> None:
+        if self.post_process is not None:
+            self.post_process(dyn)
+        to_numpy = dyn.backend.to_numpy
+        best = self.comm.allgather((np.asarray(to_numpy(dyn.best_energy)), np.asarray(to_numpy(dyn.best_particle))))
+        energies = np.stack([b[0] for b in best])
+        k = np.argmin(energies, axis=0)
+        run_idx = np.arange(energies.shape[1])
+        dyn.best_energy = dyn.backend.asarray(energies[k, run_idx], like=dyn.best_energy)
+        dyn.best_particle = dyn.backend.asarray(np.stack([b[1] for b in best])[k, run_idx, ...], like=dyn.best_particle)
+
+class sync_termination:
+    """
+    Synchronizes the termination criteria of the shards of a sharded dynamic. The first criterion evaluates all criteria 
+    on this shard and exchanges the flags with the communicator ``comm``, a criterion is met for a run, if it is met on any 
+    shard. Therefore, all shards terminate each run at the same iteration, even if a criterion depends on the shard, e.g., 
+    the number of evaluations of shards of different sizes, or the elapsed time.
+
+    Parameters:
+        comm: The communicator.
+        term_criteria (list): The termination criteria of the dynamic.
+    """
+    def __init__(self, comm, term_criteria: list):
+        self.comm = comm
+        self.term_criteria = list(term_criteria)
+        self.flags = None
+
+    def criteria(self,) -> list:
+        """Returns the synchronized criteria, which replace the ``term_criteria`` of the dynamic."""
+        return [partial(self.check, i) for i in range(len(self.term_criteria))]
+
+    def check(self, i: int, dyn) -> np.ndarray:
+        if i == 0: # the criteria are evaluated in order, see ParticleDynamic.select_active_runs
+            to_numpy = dyn.backend.to_numpy
+            flags = np.stack([np.asarray(to_numpy(term(dyn)), dtype=bool) for term in self.term_criteria], axis=-1)
+            self.flags = np.any(np.stack(self.comm.allgather(flags)), axis=0)
+        return self.flags[:, i]
@@ -38,6 +38,23 @@ class max_eval_term:
     def __call__(self, dyn):
         return dyn.num_f_eval >= self.max_eval
     
+    def steps_left(self, dyn):
+        """
+        Returns the number of steps, that can be performed before the first active run reaches the maximum number of evaluations.
+        The number of evaluations per step is taken from ``dyn.evals_per_step``, which is the maximal number of evaluations of 
+        a step, that was observed so far, i.e., each step is assumed to perform at least as many evaluations, as a full 
+        evaluation of the particles. If it is not known yet, one step is returned.
+        """
+        evals_per_step = getattr(dyn, 'evals_per_step', None)
+        if evals_per_step is None:
+            return 1
+        idx = dyn.active_runs_idx
+        e = evals_per_step[idx]
+        remaining = (self.max_eval - dyn.num_f_eval[idx])[e > 0]
+        if remaining.size == 0:
+            return float('inf')
+        return int(np.min(-(-remaining // e[e > 0])))
+    
 class max_it_term:
     """
     Checks if the current value of `dyn.it` is greater than or equal to the value of `dyn.max_it`.
@@ -50,6 +67,10 @@ class max_it_term:
     
     def __call__(self, dyn):
         return (dyn.it >= self.max_it) * np.ones((dyn.M), dtype=bool)
+    
+    def steps_left(self, dyn):
+        """Returns the number of steps, that can be performed before the maximum number of iterations is reached."""
+        return self.max_it - dyn.it
 
 class max_time_term:
     """
@@ -61,4 +82,17 @@ class max_time_term:
     def __init__(self, max_time=10.):
         self.max_time = max_time
     def __call__(self, dyn):
-        return (dyn.t >= self.max_time) * np.ones((dyn.M), dtype=bool)
\ No newline at end of file
+        return (dyn.t >= self.max_time) * np.ones((dyn.M), dtype=bool)
+    
+    def steps_left(self, dyn):
+        """Returns the number of steps, that can be performed before the maximum time is reached."""
+        r = (self.max_time - dyn.t) / dyn.dt
+        if r <= 0:
+            return 0
+        n = int(np.ceil(r))
+        # the dynamic accumulates the time step by step, if the time after n - 1 steps is close to max_time, the 
+        # accumulated time might already reach it, thus stop one step earlier
+        tol = 4 * n * np.finfo(float).eps * max(abs(self.max_time), abs(dyn.t), abs(dyn.dt)) / dyn.dt
+        if r - (n - 1) <= tol:
+            n -= 1
+        return max(n, 1)
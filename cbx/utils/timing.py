@@ -0,0 +1,122 @@
+import numpy as np
+from time import perf_counter
+from typing import Callable
+
+class timer:
+    r"""Timer for the phases of a dynamic
+
+    This class records the wall time and the number of calls of named phases, e.g., the evaluation of the objective or the
+    computation of the consensus. Phases can be nested, where the time of a phase is always recorded *exclusively*, i.e.,
+    the time spent in nested phases is subtracted. For example, the time of the phase ``'step'`` only contains the parts of
+    a step, that are not covered by any other phase.
+
+    Whenever the outermost phase ``'step'`` is finished, the times of all phases since the end of the previous step are
+    stored as one entry of the per-step times.
+
+    Note
+    ----
+    For asynchronous backends, e.g., ``torch`` on a GPU, the recorded times correspond to the time of launching the
+    operations and not necessarily to their execution.
+    """
+    def __init__(self,):
+        self.calls = {}
+        self.total = {}
+        self.step_times = []
+        self._cur = {}
+        self._stack = []
+
+    def wrap(self, name: str, fun: Callable) -> 'timed':
+        """Returns a callable, that records the time of each call of ``fun`` under the phase ``name``."""
+        return timed(fun, name, self)
+
+    def start(self, name: str) -> None:
+        """Starts the phase ``name``."""
+        self._stack.append([name, perf_counter(), 0.])
+
+    def stop(self,) -> None:
+        """Stops the phase that was started last."""
+        name, t0, t_nested = self._stack.pop()
+        dt = perf_counter() - t0
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.total[name] = self.total.get(name, 0.) + dt - t_nested
+        self._cur[name] = self._cur.get(name, 0.) + dt - t_nested
+        if self._stack:
+            self._stack[-1][2] += dt
+        elif name == 'step':
+            self.step_times.append(self._cur)
+            self._cur = {}
+
+    def reset(self,) -> None:
+        """Deletes all recorded times."""
+        self.__init__()
+
+    def summary(self,) -> dict:
+        """
+        Returns the cumulative times of all phases.
+
+        Returns
+        -------
+        dict
+            For each phase, a dict with the number of calls ``'calls'``, the cumulative time ``'total'`` in seconds
+            and the mean time per call ``'mean'``.
+        """
+        return {name: {'calls': self.calls[name],
+                       'total': self.total[name],
+                       'mean': self.total[name]/self.calls[name]} for name in self.total}
+
+    def as_array(self,) -> np.ndarray:
+        """
+        Returns the per-step times as a structured array, with one field per phase.
+
+        Returns
+        -------
+        np.ndarray
+            Structured array of shape (num_steps,), where ``arr[phase][i]`` is the time of the phase in the i-th step.
+        """
+        names = list(self.total.keys())
+        arr = np.zeros((len(self.step_times),), dtype=[(name, float) for name in names])
+        for i, times in enumerate(self.step_times):
+            for name, t in times.items():
+                arr[name][i] = t
+        return arr
+
+    def print_summary(self,) -> None:
+        """Prints a table of the cumulative times of all phases."""
+        total = sum(self.total.values())
+        print('Phase'.ljust(15) + 'Calls'.rjust(10) + 'Total [s]'.rjust(12) + 'Mean [s]'.rjust(12) + 'Share'.rjust(8))
+        for name, s in sorted(self.summary().items(), key=lambda item: -item[1]['total']):
+            print(name.ljust(15) + str(s['calls']).rjust(10) +
+                  '{:.4f}'.format(s['total']).rjust(12) + '{:.2e}'.format(s['mean']).rjust(12) +
+                  '{:.1%}'.format(s['total']/total if total > 0 else 0.).rjust(8))
+
+class timed:
+    r"""Callable that records the time of each call in a timer
+
+    All attributes of the wrapped callable are accessible through this object, such that, e.g., the number of
+    evaluations ``num_eval`` of a wrapped objective can still be accessed.
+
+    Parameters
+    ----------
+    fun : Callable
+        The callable that is timed.
+    name : str
+        The name of the phase.
+    timer : timer
+        The timer that records the times.
+    """
+    def __init__(self, fun: Callable, name: str, timer: timer):
+        self.fun = fun
+        self.name = name
+        self.timer = timer
+
+    def __call__(self, *args, **kwargs):
+        self.timer.start(self.name)
+        try:
+            return self.fun(*args, **kwargs)
+        finally:
+            self.timer.stop()
+
+    def __getattr__(self, name):
+        if name == 'fun': # not yet initialized, e.g., while unpickling
+            raise AttributeError(name)
+        return getattr(self.fun, name)
@@ -0,0 +1,51 @@
+import numpy as np
+from numpy.random import Generator
+from .rng import global_seed
+
+class workspace:
+    r"""Workspace of preallocated scratch buffers
+
+    This class stores named scratch buffers, that can be reused in every step of a dynamic. A buffer is only allocated,
+    if it is requested for the first time, or if the requested shape or dtype differs from the stored buffer.
+    In the steady state of a dynamic, requesting a buffer therefore does not allocate any memory.
+
+    Parameters
+    ----------
+    rng : Generator, optional
+        The random number generator that is used to sample noise directly into the buffers,
+        via ``rng.standard_normal(out=...)``. The default is a generator, that is seeded from the global ``numpy`` random
+        state, such that ``np.random.seed`` before the creation of the workspace makes the noise reproducible.
+    """
+    def __init__(self, rng: Generator = None):
+        self.rng = rng if rng is not None else np.random.default_rng(global_seed())
+        self.buffers = {}
+
+    def get(self, name: str, shape: tuple, dtype = float) -> np.ndarray:
+        """
+        Returns the buffer with the given name.
+
+        Parameters
+        ----------
+        name : str
+            The name of the buffer.
+        shape : tuple
+            The shape of the buffer.
+        dtype : optional
+            The dtype of the buffer. The default is ``float``.
+
+        Returns
+        -------
+        np.ndarray
+            The buffer. Its content is undefined, if it was newly allocated.
+        """
+        shape = tuple(shape)
+        buf = self.buffers.get(name, None)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+        return buf
+
+    @property
+    def nbytes(self,) -> int:
+        """The total number of bytes of all buffers in the workspace."""
+        return sum(buf.nbytes for buf in self.buffers.values())
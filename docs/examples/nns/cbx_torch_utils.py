@@ -2,8 +2,9 @@ from collections import OrderedDict
 import torch
 from torch import logsumexp
 from torch.func import functional_call, stack_module_state, vmap
-from cbx.scheduler import bisection_solve, eff_sample_size_gap
-import numpy as np
+# the effective sample size scheduler of cbx works directly on torch tensors,
+# when the dynamic uses the torch backend
+from cbx.scheduler import effective_sample_size # noqa: F401
 
 def norm_torch(x, axis, **kwargs):
     return torch.linalg.norm(x, dim=axis, **kwargs)  
@@ -11,13 +12,13 @@ def norm_torch(x, axis, **kwargs):
 def compute_consensus_torch(energy, x, alpha):
     weights = - alpha * energy
     coeffs = torch.exp(weights - logsumexp(weights, dim=(-1,), keepdims=True))[...,None]
-    return (x * coeffs).sum(axis=-2, keepdims=True), energy.cpu().numpy()
+    return (x * coeffs).sum(axis=-2, keepdims=True), energy
 
 def compute_polar_consensus_torch(energy, x, neg_log_eval, alpha = 1., kernel_factor = 1.):
     weights = -kernel_factor * neg_log_eval - alpha * energy[:,None,:]
     coeffs = torch.exp(weights - torch.logsumexp(weights, dim=(-1,), keepdims=True))[...,None]
     c = torch.sum(x[:,None,...] * coeffs, axis=-2)
-    return c, energy.cpu().numpy()
+    return c, energy
 
 def normal_torch(device):
     def _normal_torch(mean, std, size):
@@ -64,22 +65,3 @@ def get_param_properties(models, pnames=None):
         pprop[p] = (params[p][0,...].shape, a, a + params[p][0,...].numel())
     return pprop
 
-
-class effective_sample_size:
-    def __init__(self, name = 'alpha', eta=.5, maximum=1e5, minimum=1e-5, solve_max_it = 15):
-        self.name = name
-        self.eta = eta
-        self.J_eff = 1.0
-        self.solve_max_it = solve_max_it
-        self.maximum = maximum
-        self.minimum = minimum
-        
-    def update(self, dyn):
-        val = getattr(dyn, self.name)
-        device = val.device
-        val = bisection_solve(
-            eff_sample_size_gap(dyn.energy, self.eta), 
-            self.minimum * np.ones((dyn.M,)), self.maximum * np.ones((dyn.M,)), 
-            max_it = self.solve_max_it, thresh=1e-2
-        )
-        setattr(dyn, self.name, torch.tensor(val[:, None], device=device))
\ No newline at end of file
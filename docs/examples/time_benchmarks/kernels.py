@@ -0,0 +1,42 @@
+"""
+Benchmark of the compiled kernels of CBO, CBOMemory and PSO.
+
+For the numpy implementation and the compiled kernels, we report the wall time
+per step. This requires numba, the first step of the compiled kernels includes
+the compilation and is excluded.
+"""
+import numpy as np
+import timeit
+from cbx.dynamics import CBO, CBOMemory, PSO
+from cbx.utils.objective_handling import cbx_objective_fh
+from cbx.utils.kernels import NUMBA_AVAILABLE
+
+np.random.seed(42)
+#%%
+conf = {'M': 20, 'N': 500, 'd': 50,
+        'alpha': 40.0, 'dt': 0.01, 'sigma': 1.0,
+        'max_it': 10**9,
+        'track_args': {'names': []},
+        'check_f_dims': False,
+        'f_dim': '3D'}
+num_steps = 20
+
+@cbx_objective_fh
+def f(x):
+    return np.einsum('...i,...i->...', x, x)
+
+#%%
+if not NUMBA_AVAILABLE:
+    raise ImportError('This benchmark requires numba!')
+
+for dynamic in [CBO, CBOMemory, PSO]:
+    for noise in ['isotropic', 'anisotropic']:
+        times = {}
+        for name, compiled in [('numpy', False), ('compiled', True)]:
+            dyn = dynamic(f, noise=noise, compiled=compiled, **conf)
+            dyn.step() # warm-up, compiles the kernels
+            times[name] = timeit.timeit(dyn.step, number=num_steps)/num_steps
+        print(dynamic.__name__.ljust(10) + ' | ' + noise.ljust(12) +
+              ' | numpy: {:.4f}s'.format(times['numpy']) +
+              ' | compiled: {:.4f}s'.format(times['compiled']) +
+              ' | speedup: {:.2f}'.format(times['numpy']/times['compiled']))
@@ -0,0 +1,43 @@
+"""
+Benchmark of the parallel evaluation of objectives, that act on single particles.
+
+The first objective computes the smallest eigenvalue of a parameter dependent matrix, 
+where LAPACK releases the GIL. The second objective is implemented in pure Python 
+and holds the GIL. We compare the serial evaluation with f_dim='1D', the evaluation 
+on a thread pool with f_dim='1D-threads' and on a process pool with f_dim='1D-processes'.
+"""
+import numpy as np
+import timeit
+from cbx.dynamics import CBO
+
+np.random.seed(42)
+#%%
+conf = {'M': 4, 'N': 50, 'd': 3,
+        'max_it': 5,
+        'track_args': {'names': []},
+        'check_f_dims': False,
+        'verbosity': 0}
+
+B = np.random.normal(size=(3, 300, 300))
+B = B + B.transpose(0, 2, 1)
+
+def f_eig(p):
+    return np.linalg.eigvalsh(np.tensordot(p, B, axes=1))[0]**2
+
+def f_python(p):
+    s = 0.
+    for k in range(20000):
+        s += (p[k % 3] - 0.1 * (k % 7))**2
+    return s
+
+#%%
+if __name__ == '__main__':
+    for f in [f_eig, f_python]:
+        for f_dim, f_args in [('1D', None), 
+                              ('1D-threads', {'workers': 4}), 
+                              ('1D-processes', {'workers': 4})]:
+            dyn = CBO(f, f_dim=f_dim, f_args=f_args, **conf)
+            t = timeit.timeit(dyn.optimize, number=1)
+            if hasattr(dyn.f, 'close'):
+                dyn.f.close()
+            print(f.__name__.ljust(10) + ' | ' + f_dim.ljust(12) + ' | ' + str(f_args).ljust(16) + ' | time: {:.3f}s'.format(t))
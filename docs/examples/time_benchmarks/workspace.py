@@ -0,0 +1,48 @@
+"""
+Benchmark of the workspace mode of CBO.
+
+For the default and the workspace mode, we report the wall time per step,
+the peak number of bytes that are allocated during one step and the total
+number of bytes that are still allocated after the step.
+"""
+import numpy as np
+import tracemalloc
+import timeit
+from cbx.dynamics import CBO
+from cbx.utils.objective_handling import cbx_objective_fh
+
+np.random.seed(42)
+#%%
+conf = {'M': 50, 'N': 500, 'd': 200,
+        'alpha': 40.0, 'dt': 0.01, 'sigma': 1.0,
+        'max_it': 10**9,
+        'track_args': {'names': []},
+        'check_f_dims': False,
+        'f_dim': '3D'}
+num_steps = 20
+
+@cbx_objective_fh
+def f(x):
+    return np.einsum('...i,...i->...', x, x)
+
+#%%
+def step_bytes(dyn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    cur_before, _ = tracemalloc.get_traced_memory()
+    dyn.step()
+    cur_after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - cur_before, cur_after - cur_before
+
+for name, workspace in [('default', False), ('workspace', True)]:
+    for noise in ['isotropic', 'anisotropic']:
+        dyn = CBO(f, noise=noise, workspace=workspace, **conf)
+        dyn.step() # warm-up, allocates the buffers
+        t = timeit.timeit(dyn.step, number=num_steps)/num_steps
+        peak, remaining = step_bytes(dyn)
+        print(name.ljust(10) + ' | ' + noise.ljust(12) +
+              ' | time/step: {:.4f}s'.format(t) +
+              ' | peak bytes/step: {:.2e}'.format(peak) +
+              ' | retained bytes/step: {:.2e}'.format(remaining) +
+              ' | x.nbytes: {:.2e}'.format(dyn.x.nbytes))
@@ -1,6 +1,7 @@
 import cbx
 import pytest
 import numpy as np
+from cbx.utils.termination import max_it_term, max_eval_term, energy_tol_term
 
 class test_abstract_dynamic():
     
@@ -23,7 +24,43 @@ class test_abstract_dynamic():
         assert dyn.num_f_eval.shape == (7,)
         assert dyn.num_f_eval.sum() == dyn.f.num_eval
         
+    def test_eval_counting_cache(self, f, dynamic):
+        '''Test if only the actual evaluations are counted, if a cache is used'''
+        dyn = dynamic(f, d=5, M=7, N=5, max_it=3, cache_args={'size': 1000})
+        dyn.optimize()
+        
+        assert dyn.num_f_eval.sum() == dyn.f.num_eval == dyn.f.cache.misses
+        assert dyn.f.cache.hits + dyn.f.cache.misses >= dyn.f.num_eval
+        
             
+    def test_parallel_runs(self, f, dynamic):
+        '''Test if the runs distributed over processes equal the runs of a single seeded dynamic'''
+        conf = {'d': 3, 'N': 6, 'max_it': 5, 'verbosity': 0, 'track_args': {'names': ['x', 'energy']}}
+        dyn = dynamic(f, M=5, seed=0, **conf)
+        dyn.optimize()
+        runs = cbx.dynamics.ParallelRuns(dynamic, f, M=5, workers=2, num_chunks=3, seed=0, **conf)
+        runs.optimize()
+        
+        for name in ['x', 'best_particle', 'best_energy', 'num_f_eval']:
+            assert np.array_equal(getattr(dyn, name), getattr(runs, name))
+        assert len(runs.term_reason) == 5
+        assert np.array_equal(np.stack(dyn.history['x']), np.stack(runs.history['x']))
+        assert np.array_equal(np.stack(dyn.history['energy']), np.stack(runs.history['energy']))
+        
+    def compare_compiled(self, f, dynamic, noise):
+        '''Compares the compiled kernels with the numpy implementation, for dynamics supporting compiled=True'''
+        x = np.random.uniform(-1, 1, (3, 6, 2))
+        res = []
+        for compiled in [False, True]:
+            np.random.seed(3)
+            dyn = dynamic(f, x=x, noise=noise, max_it=5, track_args={'names': ['x', 'drift']})
+            dyn.compiled = compiled # if numba is not available, the kernels are executed as plain Python functions
+            dyn.optimize()
+            res.append(dyn)
+        for name in ['x', 'energy', 'best_energy', 'consensus', 'num_f_eval']:
+            assert np.allclose(getattr(res[0], name), getattr(res[1], name))
+        assert np.allclose(np.stack(res[0].history['drift']), np.stack(res[1].history['drift']))
+        
     def test_step_eval(self, f, dynamic):
         dyn = dynamic(f, d=5, M=7, N=5, max_it=1)
         dyn.step()
@@ -38,4 +75,117 @@ class test_abstract_dynamic():
         assert dyn.M == 5
         assert dyn.N == 7
         dyn.step()
-        assert dyn.d == (2,3,1)
\ No newline at end of file
+        assert dyn.d == (2,3,1)
+        
+    def test_double_buffer(self, f, dynamic):
+        '''Test if the old positions are stored without allocating new buffers'''
+        dyn = dynamic(f, d=3, M=2, N=4, max_it=5)
+        dyn.step()
+        x = dyn.copy(dyn.x)
+        buffers = {id(dyn.x), id(dyn.x_old)}
+        dyn.step()
+        assert np.all(dyn.x_old == x)
+        assert {id(dyn.x), id(dyn.x_old)} == buffers
+        
+    def test_dtype_float32(self, f, dynamic):
+        '''Test if the dynamic runs in single precision'''
+        dyn = dynamic(f, d=3, M=2, N=4, max_it=3, dtype=np.float32, 
+                      track_args={'names': ['x', 'energy']})
+        dyn.optimize()
+        assert dyn.x.dtype == np.float32
+        assert dyn.energy.dtype == np.float32
+        assert dyn.best_particle.dtype == np.float32
+        assert dyn.history['x'][-1].dtype == np.float32
+        
+    def test_compact_runs(self, f, dynamic):
+        '''Test if the runs are restored to their original order after compaction'''
+        def odd_runs_term(dyn):
+            return (dyn.it >= 2) & (dyn.run_ids % 2 == 1)
+        
+        dyn = dynamic(f, d=3, M=5, N=4, compact_runs=True, 
+                      term_criteria=[odd_runs_term, max_it_term(4)],
+                      track_args={'names': ['x']})
+        dyn.optimize()
+        assert np.all(dyn.run_ids == np.arange(5))
+        assert [r[0] for r in dyn.term_reason] == [1, 0, 1, 0, 1]
+        assert np.all(dyn.history['x'][-1][1::2] == dyn.history['x'][2][1::2])
+        assert np.all(dyn.x == dyn.history['x'][-1])
+        
+    @pytest.mark.parametrize("check_int", [1, 4, 100])
+    def test_run_steps(self, f, dynamic, check_int):
+        '''Test if run_steps performs the same number of steps as optimize'''
+        dyn = dynamic(f, d=3, M=3, N=4, term_criteria=[max_eval_term(43), max_it_term(15)])
+        dyn.optimize(sched=None)
+        
+        dyn_steps = dynamic(f, d=3, M=3, N=4, term_criteria=[max_eval_term(43), max_it_term(15)])
+        steps = dyn_steps.run_steps(100, check_int=check_int)
+        assert steps == dyn.it == dyn_steps.it
+        assert np.all(dyn.num_f_eval == dyn_steps.num_f_eval)
+        assert dyn_steps.run_steps(100, check_int=check_int) == 0
+        
+    def test_run_steps_max_eval_cache(self, f, dynamic):
+        '''Test if run_steps does not exceed the evaluation budget, if the cache reduces the evaluations per step'''
+        x = np.random.uniform(-1, 1, (2, 4, 3))
+        x[:, 2:, :] = x[:, :2, :] # duplicates, which are evaluated once with the cache
+        dyn = dynamic(f, x=x, cache_args={'size': 1000}, term_criteria=[max_eval_term(30), max_it_term(50)])
+        dyn.run_steps(100, check_int=100)
+        assert np.all(dyn.num_f_eval <= 30)
+        
+    def test_run_steps_compact(self, f, dynamic):
+        '''Test if run_steps restores the original order of the runs'''
+        x = np.random.uniform(-1, 1, (4, 4, 3))
+        x[1, ...] *= 1e-3
+        dyn = dynamic(f, x=x, compact_runs=True, term_criteria=[energy_tol_term(1e-4), max_it_term(5)])
+        dyn.run_steps(100, check_int=2)
+        assert np.all(dyn.run_ids == np.arange(4))
+        
+    def test_run_steps_max_steps(self, f, dynamic):
+        '''Test if run_steps performs at most k steps'''
+        dyn = dynamic(f, d=3, M=3, N=4, max_it=10)
+        assert dyn.run_steps(3, check_int=2) == 3
+        assert dyn.run_steps(30, check_int=4) == 7
+        assert dyn.it == 10
+        
+    def test_iterate(self, f, dynamic):
+        '''Test if iterate yields snapshots and performs the same iterations as optimize'''
+        x = np.random.uniform(-1, 1, (3, 4, 2))
+        dyn = dynamic(f, x=x, max_it=6)
+        dyn_it = dynamic(f, x=x, max_it=6)
+        np.random.seed(0)
+        dyn.optimize()
+        np.random.seed(0)
+        snaps = list(dyn_it.iterate(every=2, fields=['x', 'best_energy'], copy=True))
+        assert [snap['it'] for snap in snaps] == [2, 4, 6]
+        assert np.array_equal(snaps[-1]['x'], dyn.x)
+        assert np.array_equal(dyn_it.best_energy, dyn.best_energy)
+        
+    def test_iterate_views(self, f, dynamic):
+        '''Test if iterate yields read-only views and stops, if the loop is left'''
+        dyn = dynamic(f, d=2, M=3, N=4, max_it=10)
+        for snap in dyn.iterate(fields=['x']):
+            assert not snap['x'].flags.writeable
+            assert np.shares_memory(snap['x'], dyn.x)
+            if snap['it'] == 3:
+                break
+        assert dyn.it == 3
+        
+    def test_checkpoint_resume(self, f, dynamic, tmp_path, conf=None):
+        '''Test if a run resumed from a checkpoint continues bit-identically'''
+        path = str(tmp_path / 'checkpoint')
+        conf = conf if conf is not None else {'d': 3, 'M': 3, 'N': 6, 'track_args': {'names': ['x', 'energy']}}
+        np.random.seed(17)
+        dyn = dynamic(f, max_it=10, **conf)
+        dyn.optimize()
+        
+        np.random.seed(17)
+        dyn_first = dynamic(f, max_it=4, **conf)
+        dyn_first.optimize(checkpoint_int=2, checkpoint_path=path)
+        dyn_resumed = dynamic(f, max_it=10, **conf)
+        dyn_resumed.load_checkpoint(path)
+        assert dyn_resumed.it == 4
+        dyn_resumed.optimize()
+        
+        for name in ['x', 'energy', 'best_particle', 'best_energy', 'alpha', 'num_f_eval', 't']:
+            assert np.array_equal(getattr(dyn, name, None), getattr(dyn_resumed, name, None))
+        assert np.array_equal(np.stack(dyn.history['x']), np.stack(dyn_resumed.history['x']))
+        assert np.array_equal(np.stack(dyn.history['energy']), np.stack(dyn_resumed.history['energy']))
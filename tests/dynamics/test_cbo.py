@@ -1,6 +1,7 @@
 from cbx.dynamics.cbo import CBO
 import pytest
 import numpy as np
+import os
 from test_abstraction import test_abstract_dynamic
 from cbx.utils.objective_handling import cbx_objective_fh
 from cbx.utils.termination import max_it_term, energy_tol_term, max_eval_term, max_time_term
@@ -11,6 +12,16 @@ class Test_cbo(test_abstract_dynamic):
     def dynamic(self):
         return CBO
     
+    def test_check_f_dims_rng(self, dynamic, f):
+        '''Test if the probe of check_f_dims consumes fresh normal samples of the global random state'''
+        x = np.zeros((3,5,7))
+        np.random.seed(0)
+        dynamic(f, x=x)
+        a = np.random.uniform()
+        np.random.seed(0)
+        np.random.normal(0., 1., x.shape)
+        assert a == np.random.uniform()
+        
     def test_term_crit_energy(self, dynamic, f):
         '''Test termination criterion on energy'''
         dyn = dynamic(f, x=np.zeros((3,5,7)), term_criteria=[energy_tol_term(1e-6), max_it_term(10)])
@@ -147,4 +158,331 @@ class Test_cbo(test_abstract_dynamic):
     def test_heavi_side_reg(self, f, dynamic):
         dyn = dynamic(f, d=3, N=4, M=2, correction='heavi_side_reg')
         dyn.step()
-        assert dyn.x.shape == (2, 4, 3)
\ No newline at end of file
+        assert dyn.x.shape == (2, 4, 3)
+
+    def test_step_workspace(self, dynamic, f):
+        '''Test if step is correctly performed in workspace mode'''
+        x = np.random.uniform(-1,1,(3,5,7))
+        delta = np.random.uniform(-1,1,(3,5,7))
+        def noise(dyn):
+            return delta
+
+        dyn = dynamic(f, x=x, noise=noise, workspace=True)
+        dyn.step()
+        x_new = x - dyn.lamda * dyn.dt * (x - dyn.consensus) + dyn.sigma * delta
+        assert np.allclose(dyn.x, x_new)
+        
+    @pytest.mark.parametrize("dt", [0.01, 0.1, 0.3])
+    def test_run_steps_max_time(self, f, dynamic, dt):
+        '''Test if run_steps performs the same number of steps as optimize for max_time_term'''
+        dyn = dynamic(f, d=3, M=2, N=4, dt=dt, term_criteria=[max_time_term(0.9)])
+        dyn.optimize()
+        dyn_steps = dynamic(f, d=3, M=2, N=4, dt=dt, term_criteria=[max_time_term(0.9)])
+        assert dyn_steps.run_steps(1000, check_int=1000) == dyn.it
+        
+    def test_workspace_seed(self, dynamic, f):
+        '''Test if the workspace mode is reproducible with np.random.seed'''
+        x = np.random.uniform(-1,1,(3,5,7))
+        res = []
+        for _ in range(2):
+            np.random.seed(11)
+            dyn = dynamic(f, x=x, workspace=True, max_it=3)
+            dyn.optimize()
+            res.append(dyn.x)
+        assert np.array_equal(res[0], res[1])
+        
+    def test_workspace_consensus(self, dynamic, f):
+        '''Test if the consensus in workspace mode agrees with the default mode'''
+        x = np.random.uniform(-1,1,(3,5,7))
+        dyn = dynamic(f, x=x)
+        dyn_ws = dynamic(f, x=x, workspace=True)
+        dyn.step()
+        dyn_ws.step()
+        assert np.allclose(dyn.consensus, dyn_ws.consensus)
+        assert np.allclose(dyn.energy, dyn_ws.energy)
+        
+    def test_workspace_no_allocation(self, dynamic):
+        '''Test if a steady-state step in workspace mode does not allocate full size arrays'''
+        import tracemalloc
+        @cbx_objective_fh
+        def g(x):
+            return np.einsum('...i,...i->...', x, x)
+        
+        dyn = dynamic(g, f_dim='3D', d=50, M=2, N=1000, workspace=True, noise='anisotropic')
+        dyn.step()
+        dyn.step()
+        tracemalloc.start()
+        dyn.step()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < dyn.x.nbytes/4
+        
+    def test_history_memmap(self, dynamic, f, tmp_path):
+        '''Test if the memory mapped history stores the same entries as the lists'''
+        x = np.random.uniform(-1, 1, (3, 5, 2))
+        track_args = {'names': ['x', 'consensus', 'drift', 'energy'], 'save_int': 2}
+        dyn = dynamic(f, x=x, max_it=6, track_args=track_args)
+        dyn_mm = dynamic(f, x=x, max_it=6, track_args={**track_args, 'storage': 'memmap', 'path': str(tmp_path)})
+        np.random.seed(0)
+        dyn.optimize()
+        np.random.seed(0)
+        dyn_mm.optimize()
+        for key in track_args['names']:
+            assert len(dyn.history[key]) == len(dyn_mm.history[key])
+            assert np.array_equal(np.stack(dyn.history[key]), dyn_mm.history[key].as_array())
+        assert os.path.exists(str(tmp_path / 'x.npy'))
+        assert type(dyn_mm.history['x']).__name__ == 'memmap_history'
+        assert dyn_mm.history['x'].data.shape[0] == 6 // 2 + 2
+        dyn_mm.reset()
+        assert len(dyn_mm.history['x']) == 1
+        
+    def test_history_ring_buffer(self, dynamic, f):
+        '''Test if the ring buffer keeps the last entries in low precision'''
+        x = np.random.uniform(-1, 1, (3, 5, 2))
+        dyn = dynamic(f, x=x, max_it=20, track_args={'names': ['x', 'consensus']})
+        dyn_ring = dynamic(f, x=x, max_it=20, 
+                           track_args={'names': ['x', 'consensus'], 'capacity': {'x': 4}, 'dtype': {'consensus': 'float32'}})
+        np.random.seed(0)
+        dyn.optimize()
+        np.random.seed(0)
+        dyn_ring.optimize()
+        assert len(dyn_ring.history['x']) == 4
+        assert np.array_equal(dyn_ring.history['x'].as_array(), np.stack(dyn.history['x'][-4:]))
+        assert dyn_ring.history['consensus'].as_array().dtype == np.float32
+        assert np.allclose(dyn_ring.history['consensus'].as_array(), np.stack(dyn.history['consensus']), atol=1e-5)
+        
+    @pytest.mark.parametrize("storage_args", [{'storage': 'memmap'}, {'capacity': 3}, {'dtype': 'float32'}, 
+                                              {'storage': 'memmap', 'capacity': {'drift': 2}, 'dtype': {'consensus': 'float16'}}])
+    @pytest.mark.parametrize("compact_runs", [False, True])
+    def test_history_array_staggered_term(self, dynamic, f, storage_args, compact_runs):
+        '''Test if the array storage of the history handles runs, that terminate at different iterations'''
+        x = np.random.uniform(-1, 1, (4, 5, 3))
+        x[[0, 2], ...] *= 1e-3
+        track_args = {'names': ['x', 'consensus', 'drift']}
+        conf = {'x': x, 'sigma': 0., 'compact_runs': compact_runs, 'term_criteria': [energy_tol_term(1e-4), max_it_term(5)]}
+        dyn = dynamic(f, track_args=track_args, **conf)
+        dyn_array = dynamic(f, track_args={**track_args, **storage_args}, **conf)
+        dyn.optimize()
+        dyn_array.optimize()
+        assert dyn_array.it == 5
+        for key in ['consensus', 'drift']:
+            entries = dyn.history[key][-len(dyn_array.history[key]):]
+            for i, h in enumerate(dyn_array.history[key].as_array()):
+                assert h.shape[0] == 4
+                active = ~np.isnan(h.reshape(4, -1)).all(axis=-1)
+                assert np.sum(active) == entries[i].shape[0]
+                assert np.allclose(h[active, ...], entries[i], rtol=1e-3, atol=1e-5)
+            assert not np.any(active[[0, 2]]) and np.all(active[[1, 3]])
+        
+    @pytest.mark.parametrize("save_schedule, its", [('log', [0, 1, 2, 4, 8, 16]), ([3, 0, 10, 50], [0, 3, 10])])
+    def test_history_save_schedule(self, dynamic, f, save_schedule, its):
+        '''Test if the tracks are updated at the iterations of the schedule'''
+        x = np.random.uniform(-1, 1, (3, 5, 2))
+        dyn = dynamic(f, x=x, max_it=20, track_args={'names': ['x']})
+        dyn_sched = dynamic(f, x=x, max_it=20, track_args={'names': ['x'], 'save_schedule': save_schedule})
+        np.random.seed(0)
+        dyn.optimize()
+        np.random.seed(0)
+        dyn_sched.optimize()
+        # the first entry are the initial particles, the entry of iteration i is stored after the step i + 1
+        assert len(dyn_sched.history['x']) == len(its) + 1
+        assert np.array_equal(np.stack(dyn_sched.history['x'][1:]), np.stack([dyn.history['x'][i + 1] for i in its]))
+        
+    def test_checkpoint_resume_batched(self, dynamic, f, tmp_path):
+        '''Test if a batched run resumed from a checkpoint continues bit-identically'''
+        self.test_checkpoint_resume(f, dynamic, tmp_path, conf={'d': 3, 'M': 3, 'N': 6, 'batch_args': {'size': 4}, 
+                                                                 'track_args': {'names': ['x', 'energy']}})
+        
+    @pytest.mark.parametrize("workspace", [False, True])
+    def test_compact_runs_equal(self, dynamic, f, workspace):
+        '''Test if compaction of the active runs does not change the results'''
+        x = np.random.uniform(-1, 1, (6, 5, 3))
+        x[[1, 4], ...] *= 1e-3
+        res = []
+        for compact_runs in [False, True]:
+            dyn = dynamic(f, x=x, sigma=0., compact_runs=compact_runs, workspace=workspace,
+                          term_criteria=[energy_tol_term(1e-4), max_it_term(5)],
+                          track_args={'names': ['x', 'energy', 'update_norm', 'consensus', 'drift']})
+            dyn.step()
+            dyn.terminate()
+            dyn.set_batch_idx()
+            if compact_runs:
+                assert dyn.consensus_idx[0] == slice(0, 4)
+                assert np.all(dyn.run_ids == [0, 2, 3, 5, 1, 4])
+            dyn.optimize()
+            res.append(dyn)
+            
+        for name in ['x', 'best_particle', 'best_energy', 'num_f_eval']:
+            assert np.allclose(getattr(res[0], name), getattr(res[1], name))
+        for name in ['x', 'energy', 'update_norm']:
+            assert np.allclose(np.array(res[0].history[name]), np.array(res[1].history[name]))
+        for name in ['consensus', 'drift']: # only the active runs are stored, in the original order
+            assert len(res[0].history[name]) == len(res[1].history[name])
+            for i, h in enumerate(res[0].history[name]):
+                assert np.allclose(h, res[1].history[name][i])
+        assert res[0].term_reason[1][0] == res[1].term_reason[1][0] == 0
+        
+    def test_seed_run_split(self, dynamic, f):
+        '''Test if the runs of a seeded dynamic do not depend on the split of the runs'''
+        from cbx.utils.rng import run_generators
+        from cbx.utils.resampling import resampling
+        conf = {'d': 3, 'N': 8, 'max_it': 10, 'batch_args': {'size': 3}, 'verbosity': 0,
+                'track_args': {'names': ['x']}}
+        # resample the runs with even ids in even iterations and the runs with odd ids in odd iterations
+        def res(ids):
+            return resampling([lambda dyn: np.where((np.asarray(ids) + dyn.it) % 2 == 0)[0]], len(ids))
+        dyn = dynamic(f, M=4, seed=3, post_process=res(range(4)), **conf)
+        dyn.optimize()
+        for run_ids in [range(0, 2), range(2, 4), [1, 3]]:
+            dyn_split = dynamic(f, M=len(run_ids), seed=run_generators(3, run_ids=run_ids), post_process=res(run_ids), **conf)
+            dyn_split.optimize()
+            assert np.array_equal(dyn.x[run_ids, ...], dyn_split.x)
+            
+        np.random.seed(0)
+        dyn_other = dynamic(f, M=4, seed=4, **conf)
+        assert not np.allclose(dyn_other.x, dynamic(f, M=4, seed=3, **conf).x)
+        
+    def test_checkpoint_resume_seed(self, dynamic, f, tmp_path):
+        '''Test if a seeded run resumed from a checkpoint continues bit-identically'''
+        self.test_checkpoint_resume(f, dynamic, tmp_path, conf={'d': 3, 'M': 3, 'N': 6, 'seed': 1, 'batch_args': {'size': 4}, 
+                                                                 'track_args': {'names': ['x', 'energy']}})
+        
+    def test_checkpoint_replace(self, dynamic, f, tmp_path):
+        '''Test if a checkpoint can be replaced while it is memory mapped, and if leftovers are removed'''
+        path = str(tmp_path / 'ckpt')
+        dyn = dynamic(f, d=3, M=2, N=4, max_it=4, track_args={'names': ['x']})
+        dyn.save_checkpoint(path)
+        os.makedirs(path + '.old') # leftover of an earlier save
+        dyn.load_checkpoint(path)
+        x0 = np.array(dyn.history['x'][0])
+        dyn.optimize()
+        dyn.save_checkpoint(path)
+        assert np.array_equal(dyn.history['x'][0], x0)
+        assert sorted(os.listdir(tmp_path)) == ['ckpt']
+        
+    def test_parallel_runs_shared_x(self, dynamic, f):
+        '''Test if initial particles of a single run are used for every run, and per-run parameters are split'''
+        from cbx.dynamics import ParallelRuns
+        x = np.random.uniform(-1, 1, (4, 3))
+        alpha = np.arange(1., 5.)[:, None]
+        conf = {'max_it': 3, 'verbosity': 0, 'alpha': alpha}
+        dyn = dynamic(f, x=np.repeat(x[None, ...], 4, axis=0), seed=0, **conf)
+        dyn.optimize()
+        runs = ParallelRuns(dynamic, f, M=4, workers=1, num_chunks=2, seed=0, x=x, **conf)
+        runs.optimize()
+        assert runs.x.shape == (4, 4, 3)
+        assert np.array_equal(dyn.x, runs.x)
+        
+    def test_sharded(self, dynamic, f):
+        '''Test if a deterministic sharded dynamic equals the dynamic on all particles'''
+        from cbx.dynamics import ShardedDynamic
+        x = np.random.uniform(-1, 1, (2, 9, 3))
+        conf = {'x': x, 'sigma': 0., 'max_it': 5, 'verbosity': 0, 'track_args': {'names': ['x', 'energy']}}
+        dyn = dynamic(f, **conf)
+        dyn.optimize()
+        dyn_sharded = ShardedDynamic(dynamic, f, num_shards=3, timeout=60, **conf)
+        dyn_sharded.optimize()
+        
+        for name in ['x', 'energy', 'best_particle', 'best_energy', 'num_f_eval']:
+            assert np.allclose(getattr(dyn, name), getattr(dyn_sharded, name))
+        assert np.allclose(np.stack(dyn.history['x']), np.stack(dyn_sharded.history['x']))
+        
+        dyn_sharded = ShardedDynamic(dynamic, f, num_shards=2, seed=0, M=2, N=10, d=3, max_it=4, verbosity=0)
+        dyn_sharded.optimize()
+        assert dyn_sharded.x.shape == (2, 10, 3) and dyn_sharded.it == 4
+        
+    def test_sharded_max_eval(self, dynamic, f):
+        '''Test if uneven shards terminate at the same iteration, if the evaluations are bounded'''
+        from cbx.dynamics import ShardedDynamic
+        dyn_sharded = ShardedDynamic(dynamic, f, num_shards=3, seed=0, M=2, N=10, d=3, verbosity=0, timeout=20,
+                                     term_criteria=[max_eval_term(40)], track_args={'names': ['x']})
+        dyn_sharded.optimize()
+        # the shard of 4 particles evaluates 4 particles in check_f_dims and in each step
+        assert dyn_sharded.it == 9
+        assert np.all(dyn_sharded.num_f_eval == 10 * (1 + 9))
+        assert len(dyn_sharded.history['x']) == 10 and dyn_sharded.history['x'][-1].shape == (2, 10, 3)
+        
+    def test_sharded_single_run_x(self, dynamic, f):
+        '''Test if particles of shape (N, d) are treated as a single run'''
+        from cbx.dynamics import ShardedDynamic
+        x = np.random.uniform(-1, 1, (9, 3))
+        conf = {'sigma': 0., 'max_it': 3, 'verbosity': 0, 'timeout': 60}
+        dyn_sharded = ShardedDynamic(dynamic, f, num_shards=3, x=x, **conf)
+        dyn_sharded.optimize()
+        dyn_3d = ShardedDynamic(dynamic, f, num_shards=3, x=x[None, ...], **conf)
+        dyn_3d.optimize()
+        assert dyn_sharded.x.shape == (1, 9, 3)
+        assert np.allclose(dyn_sharded.x, dyn_3d.x)
+        
+    def test_sharded_polar(self, f):
+        '''Test if dynamics with a different consensus are rejected'''
+        from cbx.dynamics import ShardedDynamic, PolarCBO
+        with pytest.raises(ValueError, match='compute_consensus'):
+            ShardedDynamic(PolarCBO, f, num_shards=2, M=1, N=4, d=2)
+        
+    def test_sharded_error(self, dynamic):
+        '''Test if an exception in a shard is raised in the main process'''
+        from cbx.dynamics import ShardedDynamic
+        def g(x):
+            if x.shape[-2] < 5:
+                raise ValueError('Shard failed')
+            return (x**2).sum(axis=-1)
+        
+        with pytest.raises(RuntimeError, match='Shard failed'):
+            ShardedDynamic(dynamic, g, num_shards=2, f_dim='3D', M=1, N=9, d=2, max_it=2, timeout=60).optimize()
+        
+    @pytest.mark.parametrize("batch_args", [None, {'size': 5}])
+    def test_chunked_consensus(self, dynamic, f, batch_args):
+        '''Test if the chunked consensus computation equals the default one'''
+        from cbx.dynamics.pdyn import compute_consensus_chunked
+        x = np.random.uniform(-1, 1, (4, 11, 3))
+        x[1, ...] *= 1e-3 # terminates early, if the runs are not batched
+        term_criteria = [max_it_term(6)] if batch_args else [energy_tol_term(1e-4), max_it_term(6)]
+        res = []
+        for compute_consensus in [None, compute_consensus_chunked(chunk_size=3)]:
+            np.random.seed(5)
+            dyn = dynamic(f, x=x, batch_args=batch_args, compute_consensus=compute_consensus, term_criteria=term_criteria)
+            dyn.optimize()
+            res.append(dyn)
+        for name in ['x', 'energy', 'best_energy', 'num_f_eval']:
+            assert np.allclose(getattr(res[0], name), getattr(res[1], name))
+            
+    def test_chunked_consensus_memory(self, dynamic):
+        '''Test if the memory of the chunked consensus computation is bounded by the budget'''
+        import tracemalloc
+        from cbx.dynamics.pdyn import compute_consensus_chunked
+        def g(x):
+            return (x**2).sum(axis=-1)
+        dyn = dynamic(g, d=10, N=20000, f_dim='3D', compute_consensus=compute_consensus_chunked(memory_budget=2**16))
+        c_default, _ = dyn._compute_consensus.__class__(chunk_size=20000)(g(dyn.x), dyn.x, dyn.alpha)
+        tracemalloc.start()
+        c, energy = dyn.compute_consensus()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert np.allclose(c, c_default) and energy.shape == (1, 20000)
+        assert peak < dyn.x.nbytes / 4
+        
+    @pytest.mark.parametrize("noise", ['isotropic', 'anisotropic'])
+    def test_compiled(self, dynamic, f, noise):
+        '''Test if the compiled kernels give the same results as the numpy implementation'''
+        self.compare_compiled(f, dynamic, noise)
+        
+    def test_compiled_lazy_import(self):
+        '''Test if numba is only imported, if the compiled kernels are requested'''
+        import subprocess
+        import sys
+        code = ('import sys; from cbx.dynamics import CBO; CBO(lambda x: (x**2).sum(-1), f_dim="3D", d=2); '
+                'assert "numba" not in sys.modules and "cbx.utils.kernels" not in sys.modules')
+        subprocess.run([sys.executable, '-c', code], check=True)
+        
+    def test_compiled_fallback(self, dynamic, f):
+        '''Test if the numpy implementation is used, if numba is not available or the kernels are not applicable'''
+        from cbx.utils.kernels import NUMBA_AVAILABLE
+        if not NUMBA_AVAILABLE:
+            with pytest.warns(UserWarning):
+                dyn = dynamic(f, d=2, compiled=True)
+            assert not dyn.compiled
+        dyn = dynamic(f, d=2, M=3, N=6, correction='heavi_side')
+        dyn.compiled = True
+        assert not dyn.use_compiled()
+        dyn.step()
@@ -14,6 +14,12 @@ class Test_cbo_memory(test_abstract_dynamic):
         dyn.step()
         assert dyn.it == 1
         
+    def test_cache_init_eval(self, f, dynamic):
+        '''Test if the evaluations of check_f_dims and the initial evaluation are counted'''
+        dyn = dynamic(f, d=5, M=7, N=5, cache_args={'size': 1000})
+        assert dyn.f.cache.misses == dyn.f.num_eval == 2 * 7 * 5
+        assert np.all(dyn.num_f_eval == 10)
+        
     def test_update_best_cur_particle(self, f, dynamic):
         x = np.zeros((5,3,2))
         x[0, :,:] = np.array([[0.,0.], [2.,1.], [4.,5.]])
@@ -25,4 +31,9 @@ class Test_cbo_memory(test_abstract_dynamic):
         dyn.update_best_cur_particle()
         best_cur_particle = np.array([[0.,0.], [0.,1.], [0.,0.5], [0.,0.3], [0.,1.]])
         
-        assert np.allclose(dyn.best_cur_particle, best_cur_particle)
\ No newline at end of file
+        assert np.allclose(dyn.best_cur_particle, best_cur_particle)
+
+    @pytest.mark.parametrize("noise", ['isotropic', 'anisotropic'])
+    def test_compiled(self, dynamic, f, noise):
+        '''Test if the compiled kernels give the same results as the numpy implementation'''
+        self.compare_compiled(f, dynamic, noise)
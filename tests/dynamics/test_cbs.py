@@ -24,6 +24,11 @@ class Test_CBS(test_abstract_dynamic):
         dyn.run()
         assert dyn.it == 2
         
+    def test_run_low_rank(self, f, dynamic):
+        dyn = dynamic(f, d=50, M=3, N=5, max_it=3, noise='low_rank_covariance')
+        dyn.run()
+        assert dyn.it == 3 and dyn.Cov_factor.shape == (3, 5, 50)
+        
     def test_multi_dim_domain(self, f, dynamic):
         x = np.ones((5,7,2,3,1))
         def g(x):
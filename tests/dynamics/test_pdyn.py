@@ -78,6 +78,28 @@ class Test_pdyn(test_abstract_dynamic):
                       )
         dyn.optimize()
         assert dyn.x.shape == (6,5,7)
+        
+    def test_auto_probe_eval_counting(self, dynamic):
+        '''Test if the evaluations of the probe of f_dim='auto' are counted'''
+        dyn = dynamic(lambda x: np.sum(x**2), f_dim='auto', d=3, M=4, N=5, max_it=2)
+        dyn.optimize()
+        assert dyn.f.strategy == 'vectorize'
+        assert dyn.num_f_eval.sum() == dyn.f.num_eval
+        assert dyn.num_f_eval[0] == dyn.num_f_eval[1] + 12
+        
+    def test_cache_bypass_eval_counting(self, dynamic):
+        '''Test if all evaluations are counted, if the cache is bypassed for non-numpy arrays'''
+        import torch
+        
+        @cbx_objective_fh
+        def g(x):
+            return (x**2).sum(-1)
+        
+        dyn = dynamic(g, f_dim='3D', x=np.zeros((2,5,3)), max_it=1, check_f_dims=False, cache_args={'size': 100})
+        dyn.eval_f(np.zeros((2,5,3)))
+        assert np.all(dyn.num_f_eval == [1, 0]) # the second run is a cache hit
+        dyn.eval_f(torch.zeros((2,5,3)))
+        assert np.all(dyn.num_f_eval == [1 + 5, 5])
   
         
 def test_mat_sqrt():
@@ -148,3 +170,42 @@ class Test_cbx(test_abstract_dynamic):
 
     
 
+    def test_update_cov_reuse(self, f, dynamic):
+        '''Test if the square root of the covariance is only recomputed for runs, whose covariance changed enough'''
+        M, d, N = 4, 3, 10
+        dyn = dynamic(f, M=M, d=d, N=N, noise='covariance', cov_reuse_tol=0.1)
+        dyn.consensus, dyn.energy = dyn.compute_consensus()
+        dyn.drift = dyn.x - dyn.consensus
+        dyn.update_covariance()
+        Cov_sqrt = dyn.Cov_sqrt.copy()
+        
+        dyn.drift[0, ...] *= 1.01 # below the tolerance, reuse the cached root
+        dyn.drift[1, ...] *= 2. # above the tolerance, recompute the root
+        dyn.update_covariance()
+        assert np.array_equal(dyn.Cov_sqrt[[0, 2, 3], ...], Cov_sqrt[[0, 2, 3], ...])
+        assert np.allclose(dyn.Cov_sqrt[1, ...], 2 * Cov_sqrt[1, ...])
+        
+        dyn.active_runs_idx = np.array([1, 3])
+        dyn.drift = dyn.drift[[1, 3], ...]
+        dyn.energy = dyn.energy[[1, 3], ...]
+        dyn.update_covariance()
+        assert np.array_equal(dyn.Cov_sqrt, dyn.Cov_sqrt_cache[[1, 3], ...])
+        
+    def test_update_cov_low_rank(self, f, dynamic):
+        '''Test if the factor of the low rank covariance noise gives the same covariance as the dense matrix'''
+        M, d, N = 3, 20, 5
+        dyn = dynamic(f, M=M, d=d, N=N, noise='low_rank_covariance')
+        dyn.consensus, energy = dyn.compute_consensus()
+        dyn.energy = energy
+        dyn.drift = dyn.x - dyn.consensus
+        dyn.update_covariance()
+        assert dyn.Cov_factor.shape == (M, N, d) and not hasattr(dyn, 'Cov_sqrt')
+        
+        dyn_dense = dynamic(f, x=dyn.x, noise='covariance')
+        dyn_dense.consensus, dyn_dense.energy, dyn_dense.drift = dyn.consensus, dyn.energy, dyn.drift
+        dyn_dense.update_covariance()
+        assert np.allclose(dyn.Cov_factor.swapaxes(-1, -2) @ dyn.Cov_factor, dyn_dense.Cov_sqrt @ dyn_dense.Cov_sqrt)
+        
+        z = np.random.normal(size=(M, 7, N))
+        g = np.stack([np.stack([dyn.Cov_factor[m].T @ z[m, n] for n in range(7)]) for m in range(M)])
+        assert np.allclose(dyn.noise_callable.apply_cov_factor(dyn.Cov_factor, z), g)
@@ -74,4 +74,37 @@ class Test_polarcbo(test_abstract_dynamic):
         assert np.allclose(cc, c)
 
 
-    
\ No newline at end of file
+    
+    @pytest.mark.parametrize("kernel", ['Gaussian', 'Laplace', 'Constant', 'InverseQuadratic', 'Taz'])
+    @pytest.mark.parametrize("kernel_factor_mode", ['alpha', 'const'])
+    def test_blocked_consensus(self, f, dynamic, kernel, kernel_factor_mode):
+        '''Test if the blocked consensus computation equals the dense one'''
+        from cbx.dynamics.polarcbo import compute_polar_consensus_blocked
+        x = np.random.uniform(-3, 3, (3, 11, 2))
+        res = []
+        for compute_consensus in [None, compute_polar_consensus_blocked(tile_size=4)]:
+            dyn = dynamic(f, x=x, kernel=kernel, kappa=0.5, kernel_factor_mode=kernel_factor_mode, 
+                          compute_consensus=compute_consensus)
+            res.append(dyn.compute_consensus())
+        assert np.allclose(res[0][0], res[1][0])
+        assert np.allclose(res[0][1], res[1][1])
+        
+    def test_blocked_consensus_memory(self, dynamic):
+        '''Test if the memory of the blocked consensus computation is bounded by the budget'''
+        import tracemalloc
+        from cbx.dynamics.polarcbo import compute_polar_consensus_blocked
+        def g(x):
+            return (x**2).sum(axis=-1)
+        dyn = dynamic(g, d=5, N=2000, f_dim='3D', compute_consensus=compute_polar_consensus_blocked(memory_budget=2**20))
+        tracemalloc.start()
+        c, energy = dyn.compute_consensus()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert c.shape == dyn.x.shape and energy.shape == (1, 2000)
+        assert peak < 2**22 # the dense computation needs 2000 x 2000 x 5 x 8 bytes = 160 MB
+        
+    def test_blocked_step(self, f, dynamic):
+        from cbx.dynamics.polarcbo import compute_polar_consensus_blocked
+        dyn = dynamic(f, d=3, M=2, N=10, max_it=3, compute_consensus=compute_polar_consensus_blocked(tile_size=3))
+        dyn.optimize()
+        assert dyn.it == 3 and dyn.consensus.shape == (2, 10, 3)
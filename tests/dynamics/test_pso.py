@@ -11,4 +11,9 @@ class Test_pso(test_abstract_dynamic):
     def test_step_eval(self, f, dynamic):
         dyn = dynamic(f, d=5, M=7, N=5)
         dyn.step()
-        assert dyn.it == 1
\ No newline at end of file
+        assert dyn.it == 1
+
+    @pytest.mark.parametrize("noise", ['isotropic', 'anisotropic'])
+    def test_compiled(self, dynamic, f, noise):
+        '''Test if the compiled kernels give the same results as the numpy implementation'''
+        self.compare_compiled(f, dynamic, noise)
@@ -39,6 +39,13 @@ class Test_plot_dynamic_history(test_plot_dynamic):
         plotter = plot(dyn)
         assert plotter.max_it == 1
 
+    def test_plot_memmap_history(self, f, plot):
+        dyn = cbx.dynamics.CBO(f, d=2, max_it=3, track_args={'names':['x', 'consensus'], 'storage': 'memmap'})
+        dyn.optimize()
+        plotter = plot(dyn, plot_consensus=True)
+        assert plotter.max_it == 3
+        plotter.plot_at_ind(2)
+
     def test_plot_at_ind_x(self, f, plot):
         dyn = cbx.dynamics.CBO(f, d=2, track_args={'names':['x']})
         dyn.step()
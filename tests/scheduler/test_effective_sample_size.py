@@ -1,5 +1,6 @@
 import numpy as np
-from cbx.scheduler import eff_sample_size_gap, bisection_solve
+from cbx.scheduler import eff_sample_size_gap, bisection_solve, effective_sample_size
+from cbx.dynamics import CBO
 
 
 def test_alpha_to_zero():
@@ -7,4 +8,14 @@ def test_alpha_to_zero():
     energy = np.random.normal((6,5,7))
     gap = eff_sample_size_gap(energy, 1.)
     alpha = bisection_solve(gap, 0*np.ones(6,), 100*np.ones(6,), max_it = 100, thresh = 1e-6)
-    assert np.max(alpha) < 1e-1
\ No newline at end of file
+    assert np.max(alpha) < 1e-1    
+def test_float32_energy():
+    '''Test if the effective sample size scheduler keeps the dtype of single precision energies'''
+    def f(x):
+        return (x**2).sum(axis=-1)
+    dyn = CBO(f, d=3, M=4, N=10, f_dim='3D', dtype=np.float32)
+    dyn.step()
+    sched = effective_sample_size(eta=.5)
+    sched.update(dyn)
+    assert dyn.alpha.dtype == np.float32
+    assert dyn.alpha.shape == (4, 1)
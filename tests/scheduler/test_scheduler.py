@@ -22,3 +22,12 @@ def test_multiply_maximum():
     assert dyn.sigma == 4.7
 
 
+def test_bisection_solve():
+    '''Test if the bisection finds the roots of all runs, also if a bound is not finite'''
+    import numpy as np
+    from cbx.scheduler import bisection_solve
+    low = np.array([0., -np.inf, 0.])
+    high = np.array([4., 4., 8.])
+    roots = np.array([1., 2., 3.])
+    x = bisection_solve(lambda x: roots - x, low, high, max_it=100, thresh=1e-8)
+    assert np.allclose(x[[0, 2]], roots[[0, 2]])
@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+from cbx.dynamics import CBO, PolarCBO
+from cbx.scheduler import effective_sample_size
+from cbx.utils.backend import get_backend, numpy_backend, array_api_backend
+
+def f(x):
+    return (x**2).sum(axis=-1)
+
+def test_default_backend():
+    '''Test if numpy is the default backend'''
+    assert isinstance(get_backend(), numpy_backend)
+    dyn = CBO(f, d=2, M=2, N=5)
+    assert dyn.backend.name == 'numpy'
+
+def test_unknown_backend():
+    '''Test if exception is raised for unknown backend'''
+    with pytest.raises(ValueError):
+        get_backend('unknown')
+
+def test_numpy_logsumexp():
+    '''Test logsumexp of the numpy backend'''
+    b = numpy_backend()
+    x = np.random.uniform(size=(3,4))
+    assert np.allclose(b.logsumexp(x, axis=-1), np.log(np.exp(x).sum(axis=-1)))
+
+def test_numpy_float32_seed():
+    '''Test if the float32 samples of the numpy backend are controlled by np.random.seed before its creation'''
+    res = []
+    for _ in range(2):
+        np.random.seed(7)
+        b = numpy_backend(dtype=np.float32)
+        res.append(b.normal(size=(3, 4)))
+    assert res[0].dtype == np.float32 and np.array_equal(res[0], res[1])
+    rng = b.rng
+    b.normal(size=(2,))
+    assert b.rng is rng # the generator is not recreated for each sample
+    
+    # restoring a global state recreates the generator, restoring its own state continues it
+    np.random.seed(7)
+    b.set_rng_state(np.random.get_state())
+    assert np.array_equal(b.normal(size=(3, 4)), res[0])
+    state = b.get_rng_state()
+    z = b.normal(size=(3,))
+    b.set_rng_state(state)
+    assert np.array_equal(b.normal(size=(3,)), z)
+    b = numpy_backend(dtype=np.float32, seed=1)
+    assert np.array_equal(b.normal(size=(3,)), numpy_backend(dtype=np.float32, seed=1).normal(size=(3,)))
+
+def test_array_api_backend():
+    '''Test if the array API backend can be used for CBO'''
+    b = array_api_backend(np, rng=np.random.default_rng(0))
+    x = np.random.uniform(size=(3,4))
+    assert np.allclose(b.logsumexp(x, axis=-1), numpy_backend().logsumexp(x, axis=-1))
+    dyn = CBO(f, d=2, M=3, N=5, max_it=5, backend=b)
+    dyn.optimize()
+    assert dyn.it == 5
+    assert isinstance(dyn.x, np.ndarray)
+
+def test_torch_backend():
+    '''Test if the torch backend keeps all particle arrays as tensors'''
+    torch = pytest.importorskip('torch')
+    dyn = CBO(f, d=2, M=3, N=5, max_it=5, f_dim='3D', backend='torch', noise='anisotropic')
+    dyn.optimize(sched=effective_sample_size())
+    assert dyn.it == 5
+    for name in ['x', 'x_old', 'energy', 'consensus', 'alpha']:
+        assert isinstance(getattr(dyn, name), torch.Tensor)
+    assert dyn.best_particle.shape == (3, 2)
+
+def test_torch_backend_from_x():
+    '''Test if the torch backend is inferred from the initial particles'''
+    torch = pytest.importorskip('torch')
+    x = torch.zeros((3, 5, 2))
+    dyn = PolarCBO(f, x=x, max_it=2, f_dim='3D', kernel='Laplace')
+    assert dyn.backend.name == 'torch'
+    dyn.optimize()
+    assert isinstance(dyn.x, torch.Tensor)
+
+def test_torch_checkpoint(tmp_path):
+    '''Test if a checkpoint of the torch backend restores tensors and the random state'''
+    torch = pytest.importorskip('torch')
+    path = str(tmp_path / 'checkpoint')
+    dyn = CBO(f, d=2, M=3, N=5, max_it=2, f_dim='3D', backend='torch', track_args={'names': ['x']})
+    dyn.optimize(checkpoint_int=2, checkpoint_path=path)
+    noise = dyn.backend.normal(size=(3,))
+    dyn_resumed = CBO(f, d=2, M=3, N=5, max_it=2, f_dim='3D', backend='torch')
+    dyn_resumed.load_checkpoint(path)
+    assert isinstance(dyn_resumed.x, torch.Tensor) and torch.equal(dyn.x, dyn_resumed.x)
+    assert isinstance(dyn_resumed.history['x'][0], torch.Tensor)
+    assert torch.equal(noise, dyn_resumed.backend.normal(size=(3,)))
@@ -0,0 +1,44 @@
+import numpy as np
+import os
+from cbx.utils.history import memmap_history, ring_history, array_history
+
+def test_memmap_history(tmp_path):
+    '''Test if the memory mapped history behaves like a list of its entries'''
+    path = str(tmp_path / 'x.npy')
+    h = memmap_history(path, capacity=2)
+    x = np.random.uniform(size=(5, 3, 2, 4))
+    for xi in x:
+        h.append(xi)
+    assert len(h) == 5
+    assert h.data.shape[0] == 8 # the file was enlarged twice
+    assert np.array_equal(h[3], x[3]) and np.array_equal(h[-1], x[-1])
+    assert np.array_equal(h[1:4], x[1:4])
+    assert np.array_equal(np.stack(list(h)), x)
+    h.flush()
+    assert np.array_equal(np.load(path, mmap_mode='r')[:5], x)
+    
+def test_memmap_history_non_arrays(tmp_path):
+    '''Test if entries, that are not arrays, are kept in memory'''
+    h = memmap_history(str(tmp_path / 'idx.npy'))
+    h.append(Ellipsis)
+    h.append((slice(0, 2), Ellipsis))
+    assert len(h) == 2 and h[0] is Ellipsis
+    assert not os.path.exists(str(tmp_path / 'idx.npy'))
+
+def test_ring_history():
+    '''Test if the ring buffer keeps the last entries in order'''
+    h = ring_history(3, dtype='float16')
+    x = np.random.uniform(size=(7, 2, 4))
+    for xi in x:
+        h.append(xi)
+    assert len(h) == 3 and h.num_appended == 7
+    assert h.data.dtype == np.float16 and h.data.shape[0] == 3
+    assert np.allclose(h.as_array(), x[-3:], atol=1e-3)
+    assert np.allclose(h[0], x[-3], atol=1e-3) and np.allclose(h[-1], x[-1], atol=1e-3)
+    assert np.allclose(np.stack(list(h)), x[-3:], atol=1e-3)
+    
+def test_array_history_dtype():
+    '''Test if only floating point entries are cast to the given dtype'''
+    h = array_history(dtype='float32')
+    h.append(np.arange(3))
+    assert h[0].dtype == np.arange(3).dtype
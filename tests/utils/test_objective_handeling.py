@@ -1,6 +1,12 @@
 import pytest
 import numpy as np
-from cbx.utils.objective_handling import _promote_objective
+import time
+import os
+import json
+import asyncio
+import threading
+from functools import partial
+from cbx.utils.objective_handling import _promote_objective, cbx_objective_f1D_async
 
 def test_f_dim_1D_handeling():
     '''Test if f_dim is correctly handeled for 1D'''
@@ -22,6 +28,25 @@ def test_f_dim_2D_handeling():
 
     assert np.all(f_promote(x) == res)
 
+@pytest.mark.parametrize("f, strategy, num_probe_eval", [
+    (lambda x: np.sum(x**2, axis=-1), 'broadcast', 8),
+    (lambda x: np.sum(x**2), 'vectorize', 12),
+    (lambda x: float(np.sum(x**2)), 'vectorize', 12),
+    (lambda x: np.sum(x**2, keepdims=True), 'loop', 12),
+])
+def test_f_dim_auto_handeling(f, strategy, num_probe_eval):
+    '''Test if f_dim='auto' picks the correct strategy and counts the evaluations of the probe'''
+    f_promote = _promote_objective(f, 'auto')
+    x = np.random.uniform(-1,1,(6,5,7))
+    res = np.array([np.sum(x[i,j,:]**2) for i in range(6) for j in range(5)]).reshape(6,5)
+    
+    assert np.allclose(f_promote(x), res)
+    assert f_promote.strategy == strategy
+    assert f_promote.num_eval == 30 + num_probe_eval
+    f_promote(x)
+    assert f_promote.num_eval == 60 + num_probe_eval
+    assert f_promote.last_num_probe_eval == 0
+    
 def test_f_dim_unknown():
     '''Test if f_dim raises error for unknown f_dim'''
     def f(x): return np.sum(x**2)
@@ -29,3 +54,204 @@ def test_f_dim_unknown():
 
     with pytest.raises(ValueError):
         _promote_objective(f, f_dim)
+    
+@pytest.mark.parametrize("chunksize", [None, 1, 7, 100])
+def test_f_dim_1D_threads_handeling(chunksize):
+    '''Test if the threaded evaluation gives the same result as 1D'''
+    def f(x): return np.sum(x**2)
+    f_promote = _promote_objective(f, '1D-threads', f_args={'workers': 3, 'chunksize': chunksize})
+    x = np.random.uniform(-1,1,(6,5,7))
+    res = np.array([f(x[i,j,:]) for i in range(6) for j in range(5)]).reshape(6,5)
+
+    assert np.all(f_promote(x) == res)
+    assert f_promote.num_eval == 30
+    f_promote.close()
+    
+def test_f_dim_1D_threads_exception():
+    '''Test if exceptions in the threads are raised'''
+    def f(x): raise RuntimeError('Error in objective')
+    f_promote = _promote_objective(f, '1D-threads', f_args={'workers': 2})
+    with pytest.raises(RuntimeError):
+        f_promote(np.zeros((2,3,4)))
+        
+def test_f_dim_1D_threads_concurrent():
+    '''Test if the particles are evaluated concurrently, for objectives that release the GIL'''
+    def f(x): 
+        time.sleep(0.02)
+        return np.sum(x)
+    f_promote = _promote_objective(f, '1D-threads', f_args={'workers': 10})
+    t = time.perf_counter()
+    f_promote(np.zeros((2,10,3)))
+    assert time.perf_counter() - t < 0.2
+    
+def sum_of_squares(x):
+    return np.sum(x**2)
+
+def crash_once(path, x):
+    if os.path.exists(path):
+        os.remove(path)
+        os._exit(1)
+    return np.sum(x**2)
+
+def test_f_dim_1D_processes_handeling():
+    '''Test if the evaluation on processes gives the same result as 1D'''
+    f_promote = _promote_objective(sum_of_squares, '1D-processes', f_args={'workers': 2, 'chunksize': 4})
+    for shape in [(6,5,7), (2,3,7), (8,5,2)]:
+        x = np.random.uniform(-1,1,shape)
+        res = np.array([sum_of_squares(x[i,j,:]) for i in range(shape[0]) for j in range(shape[1])]).reshape(shape[:2])
+        assert np.allclose(f_promote(x), res)
+    assert f_promote.num_eval == 30 + 6 + 40
+    f_promote.close()
+
+def test_f_dim_1D_processes_restart(tmp_path):
+    '''Test if dead workers are restarted and their particles are evaluated again'''
+    path = str(tmp_path / 'crash')
+    open(path, 'w').close()
+    f_promote = _promote_objective(partial(crash_once, path), '1D-processes', f_args={'workers': 2})
+    x = np.random.uniform(-1,1,(3,4,5))
+    assert np.allclose(f_promote(x), np.sum(x**2, axis=-1))
+    assert not os.path.exists(path)
+    f_promote.close()
+    
+def test_f_dim_1D_processes_exception():
+    '''Test if exceptions in the workers are raised'''
+    f_promote = _promote_objective(np.linalg.cholesky, '1D-processes', f_args={'workers': 2})
+    with pytest.raises(RuntimeError):
+        f_promote(np.zeros((2,3,4)))
+        
+def test_f_dim_1D_processes_unavailable(monkeypatch):
+    '''Test if a clear error is raised, if shared memory is not available'''
+    import sys
+    monkeypatch.setitem(sys.modules, 'multiprocessing.shared_memory', None)
+    with pytest.raises(ImportError, match='Python >= 3.8'):
+        _promote_objective(sum_of_squares, '1D-processes')
+
+class stand_in_server:
+    '''Local server in a background thread, that returns the sum of squares of the received particles'''
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, '127.0.0.1', 0), self.loop).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+        
+    async def handle(self, reader, writer):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        x = np.array(json.loads(await reader.readline()))
+        await asyncio.sleep(self.delay)
+        writer.write((json.dumps(float(np.sum(x**2))) + '\n').encode())
+        await writer.drain()
+        writer.close()
+        self.active -= 1
+        
+    async def query(self, x):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write((json.dumps(x.tolist()) + '\n').encode())
+        await writer.drain()
+        res = json.loads(await reader.readline())
+        writer.close()
+        return res
+        
+    def close(self):
+        self.server.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        
+@pytest.fixture
+def server():
+    s = stand_in_server()
+    yield s
+    s.close()
+    
+def test_f_dim_1D_async_handeling(server):
+    '''Test if async objectives are evaluated concurrently with bounded concurrency'''
+    f_promote = _promote_objective(server.query, '1D', f_args={'max_concurrency': 4})
+    assert isinstance(f_promote, cbx_objective_f1D_async)
+    x = np.random.uniform(-1,1,(3,5,7))
+    assert np.allclose(f_promote(x), np.sum(x**2, axis=-1))
+    assert f_promote.num_eval == 15
+    assert 1 < server.max_active <= 4
+    
+def test_f_dim_async_unsupported():
+    '''Test if async objectives raise an error for f_dim other than 1D'''
+    async def f(x): return np.sum(x**2, axis=-1)
+    with pytest.raises(ValueError):
+        _promote_objective(f, '2D')
+    
+def test_f_dim_1D_async_retries():
+    '''Test if failed and timed out evaluations are retried'''
+    calls = {}
+    async def f(x): 
+        key = x.tobytes()
+        calls[key] = calls.get(key, 0) + 1
+        if calls[key] == 1:
+            raise RuntimeError('Error in objective')
+        elif calls[key] == 2:
+            await asyncio.sleep(10)
+        return np.sum(x**2)
+    
+    x = np.random.uniform(-1,1,(2,3,4))
+    f_promote = _promote_objective(f, '1D', f_args={'timeout': 0.05, 'retries': 2})
+    assert np.allclose(f_promote(x), np.sum(x**2, axis=-1))
+    
+    calls.clear()
+    f_promote = _promote_objective(f, '1D', f_args={'timeout': 0.05, 'retries': 1})
+    with pytest.raises(asyncio.TimeoutError):
+        f_promote(x)
+        
+def test_optimize_async(server):
+    '''Test if optimize_async evaluates the objective on the running event loop'''
+    from cbx.dynamics import CBO
+    loop_of_eval = []
+    async def f(x):
+        loop_of_eval.append(asyncio.get_running_loop())
+        return await server.query(x)
+    
+    async def main():
+        dyn = CBO(f, d=2, M=2, N=5, max_it=3, check_f_dims=False, f_args={'max_concurrency': 3})
+        best = await dyn.optimize_async()
+        return dyn, best, asyncio.get_running_loop()
+    
+    dyn, best, loop = asyncio.run(main())
+    assert dyn.it == 3
+    assert best.shape == (2, 2)
+    assert np.all(dyn.num_f_eval == 3 * 5)
+    assert all(eval_loop is loop for eval_loop in loop_of_eval)
+    assert dyn.f.loop is None
+
+def test_cache():
+    '''Test if the cache only evaluates new particles'''
+    calls = []
+    def f(x): 
+        calls.append(x.shape)
+        return np.sum(x**2, axis=-1)
+    f_promote = _promote_objective(f, '2D')
+    f_promote.set_cache(size=100)
+    x = np.random.uniform(-1,1,(2,5,3))
+    x[1, 3, :] = x[0, 1, :] # duplicate within one call
+    assert np.allclose(f_promote(x), np.sum(x**2, axis=-1))
+    assert f_promote.num_eval == 9 and len(calls) == 1
+    assert np.all(f_promote.cache.last_num_eval == np.array([5, 4]))
+    
+    x[0, 0, :] = 2.
+    assert np.allclose(f_promote(x), np.sum(x**2, axis=-1))
+    assert f_promote.num_eval == 10
+    assert f_promote.cache.hits == 1 + 9 and f_promote.cache.misses == 10
+    assert np.all(f_promote.cache.last_num_eval == np.array([1, 0]))
+    
+def test_cache_lru():
+    '''Test if the least recently used particles are evicted'''
+    f_promote = _promote_objective(lambda x: np.sum(x**2), '1D')
+    f_promote.set_cache(size=2, decimals=3)
+    a, b, c = np.zeros((1,1,2)), np.ones((1,1,2)), 2 * np.ones((1,1,2))
+    for x in [a, b, a, c, a + 1e-5]:
+        f_promote(x)
+    assert f_promote.num_eval == 3 # b is evicted, a + 1e-5 is rounded to a
+    assert list(f_promote.cache.data.keys()) == f_promote.cache.keys(np.concatenate([c, a])[:, 0, :])
+    f_promote.reset()
+    assert len(f_promote.cache.data) == 0
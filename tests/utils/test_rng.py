@@ -0,0 +1,107 @@
+import pytest
+import numpy as np
+from cbx.utils.rng import run_generators, normal_buffer, global_seed
+from cbx.dynamics import CBO
+
+def test_run_generators_subset():
+    '''Test if the streams of a run only depend on its id'''
+    for bit_generator in ['PCG64', 'Philox']:
+        rng = run_generators(0, M=4, bit_generator=bit_generator)
+        rng_sub = run_generators(0, run_ids=[3, 1], bit_generator=bit_generator)
+        z = rng.normal(range(4), 'noise', (5, 2))
+        assert np.array_equal(z[[3, 1], ...], rng_sub.normal(range(2), 'noise', (5, 2)))
+        assert not np.allclose(rng.normal([0], 'noise', (5,)), rng.normal([0], 'resample', (5,)))
+
+def test_run_generators_state():
+    '''Test if the state of the streams can be restored'''
+    rng = run_generators(np.random.SeedSequence(5), M=2)
+    rng.uniform(range(2), 'init', (3,))
+    state = rng.get_state()
+    z = rng.permuted(range(2), 'batch', np.repeat(np.arange(6)[None, :], 2, axis=0))
+    rng.set_state(state)
+    assert np.array_equal(z, rng.permuted(range(2), 'batch', np.repeat(np.arange(6)[None, :], 2, axis=0)))
+
+def test_run_generators_float32():
+    '''Test if the streams sample directly in single precision'''
+    z = run_generators(0, M=2).normal(range(2), 'noise', (5, 3), dtype=np.float32)
+    assert z.dtype == np.float32 and z.shape == (2, 5, 3)
+    def f(x):
+        return (x**2).sum(axis=-1)
+    dyn = CBO(f, d=2, M=2, N=5, max_it=2, seed=0, dtype=np.float32)
+    dyn.optimize()
+    assert dyn.x.dtype == np.float32
+
+def test_unknown_bit_generator():
+    '''Test if exception is raised for unknown bit generator'''
+    with pytest.raises(ValueError):
+        run_generators(0, bit_generator='unknown')
+
+@pytest.mark.parametrize("background", [False, True])
+def test_normal_buffer_sequence(background):
+    '''Test if the buffer returns the same numbers as sampling in every call'''
+    rng = np.random.default_rng(3)
+    sampler = normal_buffer(rng=np.random.default_rng(3), num_steps=4, background=background)
+    for _ in range(10):
+        assert np.array_equal(sampler(size=(2, 3)), rng.standard_normal(size=(2, 3)))
+    z = sampler(1., 2., size=(20, 3))
+    assert z.shape == (20, 3) and np.isscalar(sampler())
+    sampler.close()
+
+def test_normal_buffer_dynamic():
+    '''Test if a dynamic with a noise buffer equals the dynamic with a generator, also in the workspace mode'''
+    def f(x):
+        return (x**2).sum(axis=-1)
+    x = np.random.uniform(-1, 1, (3, 5, 2))
+    rng = np.random.default_rng(1)
+    res = [CBO(f, x=x, max_it=10, normal=lambda loc, scale, size: rng.normal(loc, scale, size=size))]
+    for workspace in [False, True]:
+        res.append(CBO(f, x=x, max_it=10, workspace=workspace,
+                       normal=normal_buffer(rng=np.random.default_rng(1), num_steps=3, background=workspace)))
+    for dyn in res:
+        dyn.optimize()
+        assert np.allclose(dyn.x, res[0].x)
+
+def test_global_seed():
+    '''Test if the seed is drawn as uint64 from the global random state'''
+    from cbx.utils.workspace import workspace
+    np.random.seed(0)
+    seed = global_seed()
+    assert seed.dtype == np.uint64 and seed.shape == (4,)
+    np.random.seed(0)
+    assert np.array_equal(workspace().rng.random(3), np.random.default_rng(seed).random(3))
+
+def test_normal_buffer_seed():
+    '''Test if the default generator of the buffer is seeded from the global random state'''
+    res = []
+    for _ in range(2):
+        np.random.seed(4)
+        res.append(normal_buffer(num_steps=2)(size=(3,)))
+    assert np.array_equal(res[0], res[1])
+    
+def test_normal_buffer_views():
+    '''Test if the views of a block stay valid, while the next blocks are generated in the background'''
+    buffer = normal_buffer(rng=np.random.default_rng(0), num_steps=1, background=True)
+    views = [buffer(size=(4,)) for _ in range(4)]
+    copies = [v.copy() for v in views]
+    buffer(size=(4,))
+    buffer.close()
+    for i, v in enumerate(views):
+        assert np.array_equal(v, copies[i])
+    
+@pytest.mark.parametrize("background", [False, True])
+def test_normal_buffer_checkpoint(tmp_path, background):
+    '''Test if a dynamic with a noise buffer resumes from a checkpoint bit-identically'''
+    def f(x):
+        return (x**2).sum(axis=-1)
+    x = np.random.uniform(-1, 1, (3, 5, 2))
+    path = str(tmp_path / 'checkpoint')
+    def buffer():
+        return normal_buffer(rng=np.random.default_rng(1), num_steps=3, background=background)
+    dyn = CBO(f, x=x, max_it=10, normal=buffer())
+    dyn.optimize()
+    dyn_first = CBO(f, x=x, max_it=4, normal=buffer())
+    dyn_first.optimize(checkpoint_int=2, checkpoint_path=path)
+    dyn_resumed = CBO(f, x=x, max_it=10, normal=buffer())
+    dyn_resumed.load_checkpoint(path)
+    dyn_resumed.optimize()
+    assert np.array_equal(dyn.x, dyn_resumed.x)
@@ -0,0 +1,40 @@
+import pytest
+import queue
+import threading
+import numpy as np
+from cbx.dynamics.pdyn import compute_consensus_default
+from cbx.utils.sharding import compute_consensus_sharded, merge_consensus, queue_communicator
+
+def test_merge_consensus():
+    '''Test if the merged consensus of the shards equals the consensus of all particles'''
+    x = np.random.uniform(-1, 1, (3, 10, 2))
+    energy = 50 * np.random.uniform(size=(3, 10))
+    alpha = np.full((3, 1), 10.)
+    c, _ = compute_consensus_default()(energy, x, alpha)
+    cs = compute_consensus_sharded()
+    triples = [cs.local_triple(energy[:, idx], x[:, idx, :], alpha) for idx in [slice(0, 3), slice(3, 4), slice(4, 10)]]
+    assert np.allclose(merge_consensus(triples), c)
+    assert np.allclose(cs(energy, x, alpha)[0], c)
+
+def test_queue_communicator():
+    '''Test if the rounds of the allgather are not mixed, if a rank is faster'''
+    queues = [queue.Queue() for _ in range(3)]
+    res = [[] for _ in range(3)]
+    def run(rank):
+        comm = queue_communicator(rank, queues, timeout=5)
+        for i in range(5):
+            res[rank].append(comm.allgather((i, rank)))
+    threads = [threading.Thread(target=run, args=(rank,)) for rank in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for rank in range(3):
+        assert res[rank] == [[(i, r) for r in range(3)] for i in range(5)]
+
+def test_queue_communicator_abort():
+    '''Test if the other ranks do not wait for an aborted rank'''
+    queues = [queue.Queue() for _ in range(2)]
+    queue_communicator(1, queues).abort()
+    with pytest.raises(RuntimeError):
+        queue_communicator(0, queues, timeout=5).allgather(0)
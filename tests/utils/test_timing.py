@@ -0,0 +1,59 @@
+import numpy as np
+import time
+from cbx.dynamics import CBO
+from cbx.utils.timing import timer
+from cbx.utils.objective_handling import cbx_objective_fh
+
+@cbx_objective_fh
+def f(x):
+    return (x**2).sum(axis=-1)
+
+def test_timing_disabled():
+    '''Test if no timing wrappers are installed by default'''
+    dyn = CBO(f, d=2, M=2, N=5, max_it=2, f_dim='3D')
+    assert dyn.timer is None
+    assert 'step' not in vars(dyn)
+
+def test_timing_phases():
+    '''Test if the phases of each step are recorded'''
+    f.reset()
+    dyn = CBO(f, d=2, M=2, N=5, max_it=4, f_dim='3D', timing=True)
+    dyn.optimize()
+    summary = dyn.timer.summary()
+    for phase in ['eval_f', 'consensus', 'noise', 'correction', 'post_process', 'track', 'terminate', 'step']:
+        assert phase in summary
+    assert summary['step']['calls'] == 4
+    assert summary['consensus']['calls'] == 4
+    assert dyn.f.num_eval == dyn.num_f_eval.sum()
+    
+    arr = dyn.timer.as_array()
+    assert arr.shape == (4,)
+    assert np.all(arr['eval_f'] > 0)
+    assert np.isclose(arr['eval_f'].sum(), summary['eval_f']['total'])
+
+def test_timing_workspace():
+    '''Test if the noise is timed in the workspace mode'''
+    dyn = CBO(f, d=2, M=2, N=5, max_it=3, f_dim='3D', timing=True, workspace=True)
+    dyn.optimize()
+    assert dyn.timer.summary()['noise']['calls'] == 3
+
+def test_nested_phases():
+    '''Test if nested phases are recorded exclusively'''
+    t = timer()
+    inner = t.wrap('inner', lambda: time.sleep(0.01))
+    outer = t.wrap('step', lambda: inner())
+    outer()
+    outer()
+    s = t.summary()
+    assert s['inner']['calls'] == s['step']['calls'] == 2
+    assert len(t.step_times) == 2
+    assert s['inner']['total'] >= 0.02
+    assert s['step']['total'] < 0.01
+
+def test_timing_workspace_noise_fallback():
+    '''Test if a noise model without fill method is timed once per step in the workspace mode'''
+    def noise(dyn):
+        return np.zeros_like(dyn.drift)
+    dyn = CBO(f, d=2, M=2, N=5, max_it=3, f_dim='3D', timing=True, workspace=True, noise=noise)
+    dyn.optimize()
+    assert dyn.timer.summary()['noise']['calls'] == 3